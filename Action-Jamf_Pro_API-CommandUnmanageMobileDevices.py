@@ -4,6 +4,11 @@
 This script will take the JSS ID from a static group of Mobile Devices, grab the ID of each device and store it in a Python list. 
 Then it will iterate through that list, then issue an MDM command to the devices to unmanage themselves.
 
+The command is sent in chunks of --chunk-size devices (default 250), several chunks at once, so large groups don't
+hit URL length limits or time out. Chunks that fail are retried, and the devices the command couldn't be sent to
+are listed at the end. With --wait MINUTES the script then checks the mobile device list every --poll-interval
+seconds until every device reports as unmanaged, and lists the devices still pending.
+
 This is different from Action-Jamf_Pro_API-UnmanageMobileDevices.py
 It will not set the Managed: field in Jamf to Unmanaged
 The device must process the MDM Unmanage command to report as Unmanaged
@@ -22,27 +27,26 @@ Jennifer Johnson
 04/05/24
 """
 
-from jps_api_wrapper.classic import Classic
-from jps_api_wrapper.pro import Pro
+from jamf_helpers.cli import parse_command_args
+from jamf_helpers.commands import send_in_chunks, wait_until_unmanaged
+from jamf_helpers.listing import iter_mobile_device_group
+from jamf_helpers.metrics import write_reports
+from jamf_helpers.profiling import write_profile
+from jamf_helpers.session import connect
+from jamf_helpers.shard import shard_ids
 import logging
 import os
-import requests
 
 # create logger
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 logformat = logging.Formatter("%(asctime)s:%(levelname)s:%(message)s")
 
-# file log handler
-file = logging.FileHandler("output.log",mode='w')
-file.setFormatter(logformat)
-
 # console log handler
 console = logging.StreamHandler()
 console.setFormatter(logformat)
 
 # add handlers
-logger.addHandler(file)
 logger.addHandler(console)
 
 # Get the Jamf URL and crendentials
@@ -55,24 +59,55 @@ port="8443"
 # Set the Static Group ID we're going to be updating
 Static_Group_ID = os.environ.get("JSS_MOBILE_STATIC_GROUP_ID")
 
+# Name used for the metrics files
+SCRIPT = os.path.basename(__file__)
+
 def main():
-    classic = Classic(JSS_URL, CLIENT_ID, CLIENT_SECRET, client=True)
+    args = parse_command_args(__doc__)
+    classic, _ = connect(JSS_URL, CLIENT_ID, CLIENT_SECRET)
 
     # Retrieves all the mobile device ids from the static group
-    mobile_devices = classic.get_mobile_device_group(id=Static_Group_ID)
-    mobile_device_ids = [ 
-        mobile_device["id"]
-        for mobile_device in mobile_devices["mobile_device_group"]["mobile_devices"]
+    mobile_device_ids = [
+        mobile_device.id
+        for mobile_device in iter_mobile_device_group(classic, Static_Group_ID)
     ]
-
-    try:
-        print(f"Unmanaged JSS IDs: {mobile_device_ids}")
-        classic.create_mobile_device_command("UnmanageDevice", mobile_device_ids)
-
-        # Jamf Pro API may throw an exception or error, try to handle it here
-    except requests.exceptions.HTTPError as err:
-        print(f"HTTP Error for ID: {mobile_device_ids}")
-        print(err.args[0])
+    # With --shard, only send the command to the devices in this shard
+    mobile_device_ids = shard_ids(mobile_device_ids)
+
+    # Send the command a chunk of devices at a time, printing the result of each chunk in order
+    sent = []
+    failed = []
+    for chunk, result, err in send_in_chunks(classic, "UnmanageDevice", mobile_device_ids, args.chunk_size):
+        if err is not None:
+            # Jamf Pro API may throw an exception or error, try to handle it here
+            print(f"Error for IDs: {chunk['ids']}")
+            print(err)
+            failed += chunk["ids"]
+            continue
+        chunk_sent, chunk_failed, errors = result
+        if chunk_sent:
+            print(f"Unmanaged JSS IDs: {chunk_sent}")
+        for error in errors:
+            print(error)
+        sent += chunk_sent
+        failed += chunk_failed
+    print(f"Sent UnmanageDevice to {len(sent)} of {len(mobile_device_ids)} devices")
+    if failed:
+        print(f"Could not send UnmanageDevice to JSS IDs: {failed}")
+
+    # Optionally wait for the devices to act on the command
+    if args.wait > 0 and sent:
+        pending = wait_until_unmanaged(classic, sent, args.wait * 60, args.poll_interval)
+        if pending:
+            print(f"Still managed after {args.wait:g} minutes, JSS IDs: {pending}")
+        else:
+            print("Every device reports as unmanaged")
 
 if __name__ == '__main__':
-    main()
+    try:
+        main()
+    finally:
+        # Write the per-endpoint Jamf API metrics for this run, see jamf_helpers/metrics.py
+        write_reports(SCRIPT)
+        # With --profile, report where the time and memory went, see jamf_helpers/profiling.py
+        write_profile(SCRIPT)
@@ -6,6 +6,14 @@ from a saved search results page via mass actions.
 
 This script will take the JSS ID from a static group, grab the ID of each device and store it in a Python list. 
 Then it will iterate through that list and send Classic API commands to remove the management account.
+Computers are worked on concurrently, set JAMF_WORKERS to change how many are worked on at once.
+
+Run with "plan" to only read from Jamf and write the changes that would be made to a plan file (--plan-file),
+then run with "apply" to make those changes without reading the static group again.
+The Unmanaged Date is stamped when the computer is actually unmanaged, so in apply mode it is the time of the apply.
+Run with --resume to skip devices already finished in an earlier, interrupted run (see jamf_helpers/journal.py).
+Set JAMF_SNAPSHOT_DB to the path of a SQLite file to remember which devices are already unmanaged, then later runs
+skip them and only read group members that are new, or whose state is older than JAMF_SNAPSHOT_MAX_AGE_HOURS.
 
 You must provide the ID of the advanced computer search, "Static_Group_ID"
 
@@ -18,9 +26,18 @@ https://gist.github.com/t-lark/0c1dc014a22035e61bd073fa48dd82f9
 
 """
 
-from jps_api_wrapper.classic import Classic
-from jps_api_wrapper.pro import Pro
+from jamf_helpers.cli import parse_args
+from jamf_helpers.coalesce import PendingUpdate
+from jamf_helpers.listing import iter_computer_group
+from jamf_helpers.plan import Change, extension_attribute_field, extension_attribute_id, info_field, is_info, run
+from jamf_helpers.records import from_classic
+from jamf_helpers.metrics import write_reports
+from jamf_helpers.profiling import write_profile
+from jamf_helpers.session import connect
+from jamf_helpers.snapshot import InventorySnapshot, without_known
+from jamf_helpers.workers import DeviceResult
 from datetime import datetime, timezone
+from functools import partial
 import logging
 import os
 import requests
@@ -30,16 +47,11 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 logformat = logging.Formatter("%(asctime)s:%(levelname)s:%(message)s")
 
-# file log handler
-file = logging.FileHandler("output.log",mode='w')
-file.setFormatter(logformat)
-
 # console log handler
 console = logging.StreamHandler()
 console.setFormatter(logformat)
 
 # add handlers
-logger.addHandler(file)
 logger.addHandler(console)
 
 # Get the Jamf URL and crendentials
@@ -58,52 +70,107 @@ xEA_Previous_Date_id = os.environ.get("JAMF_xEA_ID_2")
 # Set the Static Group ID we're going to be updating
 Static_Group_ID = os.environ.get("JAMF_STATIC_GROUP_ID")
 
+# Remember which devices are already unmanaged between runs
+SNAPSHOT_DB = os.environ.get("JAMF_SNAPSHOT_DB")
+
+# Name used to check a change plan was made by this script
+SCRIPT = os.path.basename(__file__)
+
+def unmanaged_date():
+    # The current date and time, formatted to match what Jamf reports for last inventory date
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+def plan_computer(classic, snapshot, computer):
+    # Get the JSS ID and Computer Name
+    device_id = computer.id
+    # Get the computer name
+    computer_name = computer.name
+    # Get details from the General subset about the Computer ID
+    current = from_classic(classic.get_computer(id=device_id,subsets=["General"])["computer"])
+    # Get the management status
+    managed_status = current.managed
+    # Remember what Jamf said, so a known unmanaged device isn't read again next run
+    if snapshot is not None:
+        snapshot.save_state("computer", device_id, managed_status, current.report_date)
+
+    # Get the previous last inventory date
+    last_inventory_date = current.report_date
+
+    # Only update the computer record if the Mac is currently managed, saving on API calls
+    if managed_status != True:
+        return []
+    # Unmanage, Set xEA - Unmananged Date, Set xEA - Previous Inventory Date
+    # The Unmanaged Date is only a placeholder until apply_changes() stamps it, the site is kept for the output
+    return [
+        Change(device_id, computer_name, "managed", True, False),
+        Change(device_id, computer_name, extension_attribute_field(xEA_Unmanage_Date_id), None, None),
+        Change(device_id, computer_name, extension_attribute_field(xEA_Previous_Date_id), None, last_inventory_date),
+        Change(device_id, computer_name, info_field("site"), None, current.site),
+    ]
+
+def apply_changes(classic, snapshot, device_id, changes):
+    # Returns what happened to this computer, so output stays in order when computers are worked on concurrently
+    result = DeviceResult(device_id)
+    if not changes:
+        return result
+    computer_name = changes[0].name
+    values = {change.field: change.new for change in changes}
+    # Stamp the Unmanaged Date now, when the computer is actually unmanaged, not when the plan was made
+    formatted_datetime = unmanaged_date()
+    values[extension_attribute_field(xEA_Unmanage_Date_id)] = formatted_datetime
+    site_name = values.get(info_field("site"))
+    last_inventory_date = values.get(extension_attribute_field(xEA_Previous_Date_id))
+    # Format the XML data to update the computer record, all the changes are sent together in a single PUT
+    update = PendingUpdate("computer")
+    for change in changes:
+        if is_info(change.field):
+            continue
+        if change.field == "managed":
+            # Set the Managed by to blank
+            update.set("general/remote_management/managed", change.new)
+        else:
+            # Set the value for xEA - Unmanaged Date and xEA - Previous Last Inventory Date
+            update.set_extension_attribute(extension_attribute_id(change.field), values[change.field])
+    try:
+        update.send(classic, device_id)
+        if snapshot is not None:
+            snapshot.save_state("computer", device_id, False)
+        result.updated(f"Unmanaged - JSS ID: {device_id}, Computer Name: {computer_name}, Site Name: {site_name}")
+        result.updated(f"JSS ID: {device_id}, Computer Name: {computer_name}, Unmanaged Date: {formatted_datetime}, Previous Inventory Date: {last_inventory_date}")
+
+    # Jamf Pro API may throw an exception or error, try to handle it here
+    except requests.exceptions.HTTPError as err:
+        result.error(f"HTTP Error for ID: {device_id}", err.args[0])
+    return result
+
 def main():
-    classic = Classic(JSS_URL, CLIENT_ID, CLIENT_SECRET, client=True)
-
-    # Retrieves all the computer ids and computer names
-    all_computers = classic.get_computer_group(id=Static_Group_ID)["computer_group"]["computers"]
-    # For every computer ID found do the following
-    for computer in all_computers:
-        # Get the JSS ID and Computer Name
-        device_id = computer["id"]
-        # Get the computer name
-        computer_name = computer["name"]
-        # Get details from the General subset about the Computer ID
-        current = classic.get_computer(id=device_id,subsets=["General"])
-        # Get the site name
-        site_name = current["computer"]["general"]["site"]["name"]
-        # Get the management status
-        managed_status = current["computer"]["general"]["remote_management"]["managed"]
-
-        # Get the previous last inventory date and the current date and time
-        last_inventory_date = current["computer"]["general"]["report_date"]
-        current_datetime = datetime.now(timezone.utc)
-        # Format the current date and time to match what Jamf reports for last inventory date
-        formatted_datetime = current_datetime.strftime("%Y-%m-%d %H:%M:%S")
-
-        # Only update the computer record if the Mac is currently managed, saving on API calls
-        if managed_status == True:
-            # Format the XML data to update the computer record: Unmanage, Set xEA - Unmananged Date, Set xEA - Previous Inventory Date
-            try:
-                # Set the Managed by to blank
-                print(f"Unmanaged - JSS ID: {device_id}, Computer Name: {computer_name}, Site Name: {site_name}")
-                payload = f'<computer><general><remote_management><managed>false</managed></remote_management></general></computer>'
-                classic.update_computer(id=device_id, data=payload)
-
-                # Set the value for xEA - Unmanaged Date
-                payload_xEA = f'<computer><extension_attributes><extension_attribute><id>{xEA_Unmanage_Date_id}</id><value>{formatted_datetime}</value></extension_attribute></extension_attributes></computer>'
-                classic.update_computer(id=device_id, data=payload_xEA)
-
-                # Set the value for xEA - Previous Last Inventory Date
-                print(f"JSS ID: {device_id}, Computer Name: {computer_name}, Unmanaged Date: {formatted_datetime}, Previous Inventory Date: {last_inventory_date}")
-                payload_xEA = f'<computer><extension_attributes><extension_attribute><id>{xEA_Previous_Date_id}</id><value>{last_inventory_date}</value></extension_attribute></extension_attributes></computer>'
-                classic.update_computer(id=device_id, data=payload_xEA)
-
-            # Jamf Pro API may throw an exception or error, try to handle it here
-            except requests.exceptions.HTTPError as err:
-                print(f"HTTP Error for ID: {device_id}")
-                print(err.args[0])
+    args = parse_args(__doc__)
+    classic, _ = connect(JSS_URL, CLIENT_ID, CLIENT_SECRET)
+    snapshot = InventorySnapshot(SNAPSHOT_DB) if SNAPSHOT_DB else None
+
+    if args.mode == "apply":
+        # Everything needed is in the plan file, don't read the static group
+        run(args, SCRIPT, [], None, partial(apply_changes, classic, snapshot))
+    else:
+        # Retrieves all the computer ids and computer names
+        all_computers = iter_computer_group(classic, Static_Group_ID)
+        # Leave out computers already known to be unmanaged
+        skipped = []
+        if snapshot is not None:
+            all_computers = without_known(all_computers, snapshot.known_unmanaged("computer"), skipped)
+        # For every computer ID found, unmanage it if it is still managed
+        run(args, SCRIPT, all_computers, partial(plan_computer, classic, snapshot), partial(apply_changes, classic, snapshot))
+        if skipped:
+            print(f"Skipped {len(skipped)} computers already known to be unmanaged")
+
+    if snapshot is not None:
+        snapshot.close()
 
 if __name__ == '__main__':
-    main()
+    try:
+        main()
+    finally:
+        # Write the per-endpoint Jamf API metrics for this run, see jamf_helpers/metrics.py
+        write_reports(SCRIPT)
+        # With --profile, report where the time and memory went, see jamf_helpers/profiling.py
+        write_profile(SCRIPT)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+"""
+Updates every computed computer Extension Attribute (xEA) in one pass over the fleet.
+
+Instead of running Action-Jamf_Pro_API-Update_xEA-Jamf-Site.py and Action-Jamf_Pro_API-Update_xEA-macOS_Latest_Supported.py
+one after the other, each reading every computer, this script reads the inventory once with the sections every
+enabled rule needs, works out every xEA for each computer, and sends one update per computer with every xEA that changed.
+
+The rules are in jamf_helpers/rules.py. Enable a rule by setting its Extension Attribute ID and name:
+- JAMF_xEA_ID_SITE and JAMF_xEA_NAME_SITE for the Jamf Site
+- JAMF_xEA_ID_MACOS_LATEST_SUPPORTED and JAMF_xEA_NAME_MACOS_LATEST_SUPPORTED for the latest supported macOS
+
+The computer inventory is read in bulk, a page of computers per request (see JAMF_PAGE_SIZE).
+Computers are updated concurrently, set JAMF_WORKERS to change how many are worked on at once.
+Set JAMF_SNAPSHOT_DB to the path of a SQLite file to keep a local inventory snapshot between runs,
+then only computers that reported inventory since the last run are read from Jamf.
+
+Run with "plan" to only read from Jamf and write the changes that would be made to a plan file (--plan-file),
+then run with "apply" to make those changes without reading the inventory again.
+Run with --resume to skip devices already finished in an earlier, interrupted run (see jamf_helpers/journal.py).
+
+This is expected to be run in a CI environment (GitHub Actions) so certain secret values can be passed from the CI
+This requires the installation of the JPS-API-Wrapper: https://gitlab.com/cvtc/appleatcvtc/jps-api-wrapper
+
+"""
+
+from jamf_helpers.cli import parse_args
+from jamf_helpers.inventory import DEFAULT_PAGE_SIZE
+from jamf_helpers.plan import run
+from jamf_helpers.records import iter_computer_records
+from jamf_helpers.metrics import write_reports
+from jamf_helpers.profiling import write_profile
+from jamf_helpers.rules import apply_changes, configured_rules, fields_for, plan_rules
+from jamf_helpers.session import connect
+from jamf_helpers.snapshot import InventorySnapshot, sync_computers
+from functools import partial
+import logging
+import os
+import sys
+
+# create logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logformat = logging.Formatter("%(asctime)s:%(levelname)s:%(message)s")
+
+# console log handler
+console = logging.StreamHandler()
+console.setFormatter(logformat)
+
+# add handlers
+logger.addHandler(console)
+
+# Get the Jamf URL and crendentials
+JSS_URL = os.environ.get("JAMF_URL")
+CLIENT_ID = os.environ.get("JAMF_CLIENT_ID")
+CLIENT_SECRET = os.environ.get("JAMF_CLIENT_SECRET")
+
+# The xEA rules enabled with JAMF_xEA_ID_<RULE>
+RULES = configured_rules()
+# The Extension Attribute IDs the rules set
+xEA_ids = [rule.definition_id for rule in RULES]
+
+# Name used to check a change plan was made by this script
+SCRIPT = os.path.basename(__file__)
+
+PAGE_SIZE = int(os.environ.get("JAMF_PAGE_SIZE", DEFAULT_PAGE_SIZE))
+# Keep a local inventory snapshot and only read computers that changed since the last run
+SNAPSHOT_DB = os.environ.get("JAMF_SNAPSHOT_DB")
+
+def main():
+    args = parse_args(__doc__)
+    if not RULES and args.mode != "apply":
+        sys.exit("No xEA rules enabled, set JAMF_xEA_ID_<RULE> for at least one rule in jamf_helpers/rules.py")
+    logger.info(f"xEA rules: {', '.join(f'{rule.name} ({rule.label})' for rule in RULES)}")
+
+    # Classic and Pro share one token and one connection pool
+    classic, pro = connect(JSS_URL, CLIENT_ID, CLIENT_SECRET)
+    snapshot = InventorySnapshot(SNAPSHOT_DB) if SNAPSHOT_DB else None
+    apply_computer = partial(apply_changes, pro, snapshot, RULES)
+    plan_computer = partial(plan_rules, RULES)
+
+    if args.mode == "apply":
+        # Everything needed is in the plan file, don't read any inventory
+        run(args, SCRIPT, [], None, apply_computer)
+    elif snapshot is not None:
+        # Refresh the snapshot with the computers that reported inventory since the last run
+        changed = sync_computers(snapshot, pro, classic, page_size=PAGE_SIZE)
+        logger.info(f"Read {changed} computers from Jamf into the inventory snapshot")
+        # Work out the changes from the snapshot, only calling Jamf for real updates
+        run(args, SCRIPT, snapshot.devices("computer"), plan_computer, apply_computer, xEA_ids, prioritize=True)
+    else:
+        # Retrieves only the sections the rules need, for a whole page of computers per request
+        fields, xEA_sections = fields_for(RULES)
+        all_computers = iter_computer_records(pro, fields, xEA_sections, page_size=PAGE_SIZE)
+        run(args, SCRIPT, all_computers, plan_computer, apply_computer, xEA_ids, prioritize=True)
+
+    if snapshot is not None:
+        snapshot.close()
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        # Write the per-endpoint Jamf API metrics for this run, see jamf_helpers/metrics.py
+        write_reports(SCRIPT)
+        # With --profile, report where the time and memory went, see jamf_helpers/profiling.py
+        write_profile(SCRIPT)
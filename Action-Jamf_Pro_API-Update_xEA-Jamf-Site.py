@@ -8,32 +8,46 @@ This script gets all the JSS IDs from the entire JSS, then iterates through the
 After it has the site name, it only updates each Computer ID's record and updates the Extension Attribute with the site name if
 the site name has changed or is blank.
 
+By default the computer inventory is read in bulk, a page of computers per request (see JAMF_PAGE_SIZE).
+Set JAMF_BULK_READ to false to read each computer's inventory with its own request instead.
+Computers are updated concurrently, set JAMF_WORKERS to change how many are worked on at once.
+Set JAMF_SNAPSHOT_DB to the path of a SQLite file to keep a local inventory snapshot between runs,
+then only computers that reported inventory since the last run are read from Jamf.
+
+Run with "plan" to only read from Jamf and write the changes that would be made to a plan file (--plan-file),
+then run with "apply" to make those changes without reading the inventory again.
+Run with --resume to skip devices already finished in an earlier, interrupted run (see jamf_helpers/journal.py).
+
 This is expected to be run in a CI environment (GitHub Actions) so certain secret values can be passed from the CI
 This requires the installation of the JPS-API-Wrapper: https://gitlab.com/cvtc/appleatcvtc/jps-api-wrapper
 
 """
 
-from jps_api_wrapper.classic import Classic
-from jps_api_wrapper.pro import Pro
+from jamf_helpers.advanced_search import search_results
+from jamf_helpers.cli import parse_args
+from jamf_helpers.inventory import DEFAULT_PAGE_SIZE
+from jamf_helpers.listing import iter_computers
+from jamf_helpers.plan import run
+from jamf_helpers.records import get_computer, iter_computer_records
+from jamf_helpers.metrics import write_reports
+from jamf_helpers.profiling import write_profile
+from jamf_helpers.rules import apply_changes, fields_for, plan_rules, single_rule
+from jamf_helpers.session import connect
+from jamf_helpers.snapshot import InventorySnapshot, sync_computers
+from functools import partial
 import logging
 import os
-import requests
 
 # create logger
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 logformat = logging.Formatter("%(asctime)s:%(levelname)s:%(message)s")
 
-# file log handler
-file = logging.FileHandler("output.log",mode='w')
-file.setFormatter(logformat)
-
 # console log handler
 console = logging.StreamHandler()
 console.setFormatter(logformat)
 
 # add handlers
-logger.addHandler(file)
 logger.addHandler(console)
 
 # Get the Jamf URL and crendentials
@@ -47,52 +61,73 @@ port="8443"
 xEA_name = os.environ.get("JAMF_xEA_NAME")
 xEA_id = os.environ.get("JAMF_xEA_ID")
 
+# The Jamf Site rule in jamf_helpers/rules.py, for this Extension Attribute
+RULE = single_rule("SITE", xEA_id, xEA_name)
+# The computer fields the rule reads, and the inventory section xEA - Jamf Site is displayed in
+FIELDS, xEA_SECTIONS = fields_for([RULE])
+
+# Name used to check a change plan was made by this script
+SCRIPT = os.path.basename(__file__)
+
+# Read inventory a page of computers at a time instead of one request per computer
+BULK_READ = os.environ.get("JAMF_BULK_READ", "true").lower() != "false"
+PAGE_SIZE = int(os.environ.get("JAMF_PAGE_SIZE", DEFAULT_PAGE_SIZE))
+# Keep a local inventory snapshot and only read computers that changed since the last run
+SNAPSHOT_DB = os.environ.get("JAMF_SNAPSHOT_DB")
+# Read every computer's site and xEA - Jamf Site with one Classic advanced search, created with this name if needed
+ADVANCED_SEARCH = os.environ.get("JAMF_ADVANCED_SEARCH")
+
+def plan_record(device):
+    # Whichever way the computer was read (bulk inventory, snapshot, advanced search), it is a DeviceRecord by now
+    # Only update xEA - Jamf Site if the site name has changed
+    return plan_rules([RULE], device)
+
+def plan_computer(pro, computer):
+    # Get details from the General section about the Computer ID
+    device = get_computer(pro, computer.id, FIELDS, xEA_SECTIONS)
+    # If for some reason the Jamf Computer ID exists but the record is inaccessible, don't try to update
+    if device is None:
+        return []
+    return plan_record(device)
+
 def main():
-    classic = Classic(JSS_URL, CLIENT_ID, CLIENT_SECRET, client=True)
-    pro = Pro(JSS_URL, CLIENT_ID, CLIENT_SECRET, client=True)
-
-    # Retrieves all the computer ids and computer names
-    all_computers = classic.get_computers()["computers"]
-    # For every computer ID found do the following
-    for computer in all_computers:
-        # Get the JSS ID and Computer Name
-        device_id = computer["id"]
-        computer_name = computer["name"]
-        # Get details from the General subset about the Computer ID
-        current = pro.get_computer_inventory(id=device_id,section=["GENERAL"])
-        # Get the Jamf Site Name for this computer 
-        site_name = current["general"]["site"]["name"]     
-            
-        # Get the current value of xEA - Jamf Site for this computer
-        # Since its a list of dictionary values, we have to look for the right extension attribute to get its value
-        for extensionAttributes in current["general"]["extensionAttributes"]:
-            if xEA_id in extensionAttributes["definitionId"]:
-                current_xEA_site_name = str(extensionAttributes["values"])
-                # Do some text formatting to get rid of extra brackets and quotes
-                current_xEA_site_name = current_xEA_site_name[2:-2]
-            
-        # Only update xEA - Jamf Site Name if the site name has changed
-        if site_name != current_xEA_site_name:
-            # Set the JSON payload to be uploaded to Jamf, e.g. set the xEA - Jamf Site value
-            try:
-                message = f"{site_name}"
-                pro.update_computer_inventory(
-                    { 
-                        "extensionAttributes": [
-                            {
-                                "definitionId": xEA_id, 
-                                "values": [message],
-                            }
-                        ]
-                    }, device_id)
-                # Format a text string of the results
-                site_output=f"JSS ID: {device_id}, Computer Name: {computer_name}, Extension Attribute: {xEA_name}, Value: {site_name}, {xEA_name} Previous Value: {current_xEA_site_name}"
-                # Export the results to GitHub environment so it can be added to the summary page
-                print(f"{site_output}")
-            # Jamf Pro API may throw an exception or error, try to handle it here
-            except requests.exceptions.HTTPError as err:
-                print(f"HTTP Error for ID: {device_id}")
-                print(err.args[0])
+    args = parse_args(__doc__)
+    # Classic and Pro share one token and one connection pool
+    classic, pro = connect(JSS_URL, CLIENT_ID, CLIENT_SECRET)
+    snapshot = InventorySnapshot(SNAPSHOT_DB) if SNAPSHOT_DB else None
+    apply_computer = partial(apply_changes, pro, snapshot, [RULE])
+
+    if args.mode == "apply":
+        # Everything needed is in the plan file, don't read any inventory
+        run(args, SCRIPT, [], None, apply_computer)
+    elif ADVANCED_SEARCH:
+        # Retrieves the site and xEA - Jamf Site value for every computer in one request
+        all_computers = search_results(classic, "computer", ADVANCED_SEARCH, {xEA_id: xEA_name})
+        run(args, SCRIPT, all_computers, plan_record, apply_computer, [xEA_id], prioritize=True)
+    elif snapshot is not None:
+        # Refresh the snapshot with the computers that reported inventory since the last run
+        changed = sync_computers(snapshot, pro, classic, page_size=PAGE_SIZE)
+        logger.info(f"Read {changed} computers from Jamf into the inventory snapshot")
+        # Work out the changes from the snapshot, only calling Jamf for real updates
+        run(args, SCRIPT, snapshot.devices("computer"), plan_record, apply_computer, [xEA_id], prioritize=True)
+    elif BULK_READ:
+        # Retrieves the General section for a whole page of computers per request
+        all_computers = iter_computer_records(pro, FIELDS, xEA_SECTIONS, page_size=PAGE_SIZE)
+        run(args, SCRIPT, all_computers, plan_record, apply_computer, [xEA_id], prioritize=True)
+    else:
+        # Retrieves all the computer ids and computer names
+        all_computers = iter_computers(classic)
+        # For every computer ID found, get its inventory and update it
+        run(args, SCRIPT, all_computers, partial(plan_computer, pro), apply_computer, [xEA_id])
+
+    if snapshot is not None:
+        snapshot.close()
 
 if __name__ == '__main__':
-    main()
+    try:
+        main()
+    finally:
+        # Write the per-endpoint Jamf API metrics for this run, see jamf_helpers/metrics.py
+        write_reports(SCRIPT)
+        # With --profile, report where the time and memory went, see jamf_helpers/profiling.py
+        write_profile(SCRIPT)
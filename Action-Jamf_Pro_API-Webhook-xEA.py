@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+
+"""
+Keeps the computed Extension Attributes (xEAs) up to date as devices report in, instead of waiting for the next sweep.
+
+This is a long-running receiver for Jamf Pro webhooks. Point these webhooks (Settings > Global > Webhooks, content
+type JSON) at it:
+- ComputerAdded and ComputerInventoryCompleted, to update the computer xEA rules in jamf_helpers/rules.py
+- MobileDeviceEnrolled and MobileDeviceInventoryCompleted, to update the mobile device xEA - Jamf Site
+
+For every event it only reads and updates the device the event is about, with the same rules as
+Action-Jamf_Pro_API-Update_xEA-Computers.py and Action-Jamf_Pro_API_Update_Mobile_xEA-Jamf-Site.py. Events are
+debounced per device (see jamf_helpers/webhooks.py): a burst of events for one device becomes one read and at most
+one update, once the device has been quiet for --debounce seconds. The scheduled sweeps are still worth running
+now and then, to catch any event Jamf didn't deliver.
+
+Enable the computer rules as for Action-Jamf_Pro_API-Update_xEA-Computers.py:
+- JAMF_xEA_ID_SITE and JAMF_xEA_NAME_SITE for the Jamf Site
+- JAMF_xEA_ID_MACOS_LATEST_SUPPORTED and JAMF_xEA_NAME_MACOS_LATEST_SUPPORTED for the latest supported macOS
+Enable the mobile device xEA - Jamf Site with JAMF_MOBILE_xEA_ID_SITE and JAMF_MOBILE_xEA_NAME_SITE, the Jamf Pro
+API updates mobile device Extension Attributes by name so both are needed.
+
+It listens on 127.0.0.1 unless --host (or JAMF_WEBHOOK_HOST) says otherwise. Set JAMF_WEBHOOK_USERNAME and
+JAMF_WEBHOOK_PASSWORD to only accept webhooks sent with that Basic authentication (the webhook's Authentication Type
+in Jamf Pro), they are required to listen on any other address, since anyone who can reach the port could otherwise
+make it read and update any device. Try it out locally by posting one of the sample payloads:
+    curl -X POST -H 'Content-Type: application/json' --data @samples/webhooks/ComputerInventoryCompleted.json http://localhost:8080/
+
+Stop it with Ctrl-C or a SIGTERM, the devices still waiting are updated before it exits.
+
+This requires the installation of the JPS-API-Wrapper: https://gitlab.com/cvtc/appleatcvtc/jps-api-wrapper
+
+"""
+
+from jps_api_wrapper.request_builder import ClientError
+from jamf_helpers.cli import parse_webhook_args
+from jamf_helpers.metrics import write_reports
+from jamf_helpers.plan import extension_attribute_id
+from jamf_helpers.profiling import write_profile
+from jamf_helpers.records import from_mobile_device_detail, get_computer
+from jamf_helpers.results import report_results, result_sink
+from jamf_helpers.rules import computer_update, configured_rules, fields_for, plan_rules
+from jamf_helpers.schedule import stop_on_sigterm
+from jamf_helpers.session import connect
+from jamf_helpers.webhooks import DEBOUNCE_SECONDS, MAX_DELAY_SECONDS, Debouncer, device_from_event
+from jamf_helpers.workers import DeviceResult, run_concurrently
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import base64
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import requests
+import sys
+
+# create logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logformat = logging.Formatter("%(asctime)s:%(levelname)s:%(message)s")
+
+# console log handler
+console = logging.StreamHandler()
+console.setFormatter(logformat)
+
+# add handlers
+logger.addHandler(console)
+
+# Get the Jamf URL and crendentials
+JSS_URL = os.environ.get("JAMF_URL")
+CLIENT_ID = os.environ.get("JAMF_CLIENT_ID")
+CLIENT_SECRET = os.environ.get("JAMF_CLIENT_SECRET")
+
+# Basic authentication Jamf Pro sends with the webhooks, only optional when listening on a loopback address
+WEBHOOK_USERNAME = os.environ.get("JAMF_WEBHOOK_USERNAME")
+WEBHOOK_PASSWORD = os.environ.get("JAMF_WEBHOOK_PASSWORD")
+
+# The computer xEA rules enabled with JAMF_xEA_ID_<RULE>
+COMPUTER_RULES = configured_rules()
+# Mobile devices only have a Jamf Site xEA, enabled with JAMF_MOBILE_xEA_ID_SITE and JAMF_MOBILE_xEA_NAME_SITE
+MOBILE_RULES = [rule for rule in configured_rules(prefix="JAMF_MOBILE_xEA") if rule.name == "SITE"]
+# Names of the Extension Attributes by ID, for the output
+xEA_names = {rule.definition_id: rule.label for rule in COMPUTER_RULES + MOBILE_RULES}
+
+# Name used for the results and metrics files
+SCRIPT = os.path.basename(__file__)
+
+# Largest webhook body accepted, Jamf's payloads are well under this
+MAX_BODY_BYTES = 64 * 1024
+
+def update_computer(pro, device_id):
+    # Read only the sections the rules need for this one computer and send one update with every xEA that changed
+    result = DeviceResult(device_id)
+    fields, xEA_sections = fields_for(COMPUTER_RULES)
+    try:
+        computer = get_computer(pro, device_id, fields, xEA_sections)
+        if computer is None:
+            result.error(f"No inventory for computer ID: {device_id}")
+            return result
+        changes = plan_rules(COMPUTER_RULES, computer)
+        if not changes:
+            return result
+        pro.update_computer_inventory(computer_update(changes), device_id)
+        for change in changes:
+            # Format a text string of the results
+            xEA_name = xEA_names.get(extension_attribute_id(change.field))
+            output=f"JSS ID: {device_id}, Computer Name: {change.name}, Extension Attribute: {xEA_name}, Value: {change.new}, {xEA_name} Previous Value: {change.old}"
+            result.updated(f"{output}")
+    # Jamf Pro API may throw an exception or error, try to handle it here
+    except requests.exceptions.HTTPError as err:
+        result.error(f"HTTP Error for ID: {device_id}", err.args[0])
+    return result
+
+def update_mobile_device(pro, device_id):
+    # Read the mobile device's details and update its xEA - Jamf Site by name if the site has changed
+    result = DeviceResult(device_id)
+    try:
+        device = from_mobile_device_detail(pro.get_mobile_device_detail(id=device_id))
+        changes = plan_rules(MOBILE_RULES, device)
+        if not changes:
+            return result
+        pro.update_mobile_device(
+            {
+                "updatedExtensionAttributes": [
+                    {
+                        "name": xEA_names[extension_attribute_id(change.field)],
+                        "value": [f"{change.new}"],
+                    }
+                    for change in changes
+                ]
+            }, device_id)
+        for change in changes:
+            # Format a text string of the results
+            xEA_name = xEA_names[extension_attribute_id(change.field)]
+            output=f"JSS ID: {device_id}, Mobile Device Name: {change.name}, Extension Attribute: {xEA_name}, Value: {change.new}, {xEA_name} Previous Value: {change.old}"
+            result.updated(f"{output}")
+
+    except ClientError as err:
+        result.error(f"Client Error for ID: {device_id}", err,
+                     summary=f"❌ Skipped device `{device_id}` – `{err}`")
+
+    except requests.exceptions.HTTPError as err:
+        result.error(f"HTTP Error for ID: {device_id}", err,
+                     summary=f"🔥 Unexpected error on device `{device_id}` – `{err}`")
+    return result
+
+def update_batch(updaters, sink, batch):
+    # Update every device in a debounced batch concurrently, each one with the updater for its kind of device
+    def update(item):
+        kind, device_id = item["device"]
+        return updaters[kind](device_id)
+    logger.info(f"Updating {len(batch)} devices: {', '.join(f'{kind} {device_id}' for kind, device_id in batch)}")
+    items = [{"id": device_id, "device": (kind, device_id)} for kind, device_id in batch]
+    report_results(run_concurrently(update, items), sink)
+
+def loopback(host):
+    # True if only this machine can reach an address
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def authorized(header):
+    # Check the Basic authentication of a webhook, in constant time so the password can't be guessed a byte at a time
+    if not WEBHOOK_USERNAME:
+        return True
+    expected = base64.b64encode(f"{WEBHOOK_USERNAME}:{WEBHOOK_PASSWORD or ''}".encode()).decode()
+    return hmac.compare_digest((header or "").encode(), f"Basic {expected}".encode())
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    # Answers every webhook straight away and leaves the Jamf calls to the debouncer, so Jamf never waits on them
+    debouncer = None
+    kinds = ()
+
+    def do_POST(self):
+        if not authorized(self.headers.get("Authorization")):
+            self.send_error(401)
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.send_error(413)
+            return
+        try:
+            device = device_from_event(json.loads(self.rfile.read(length)))
+        except ValueError as err:
+            self.send_error(400, str(err))
+            return
+        if device is None or device[0] not in self.kinds:
+            # An event this receiver doesn't update anything for, accept it so Jamf doesn't retry it
+            self.send_response(204)
+            self.end_headers()
+            return
+        self.debouncer.add(device)
+        self.send_response(202)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+def main():
+    args = parse_webhook_args(__doc__)
+    if WEBHOOK_USERNAME and not WEBHOOK_PASSWORD:
+        sys.exit("JAMF_WEBHOOK_USERNAME is set without JAMF_WEBHOOK_PASSWORD")
+    if not WEBHOOK_USERNAME and not loopback(args.host):
+        sys.exit(f"Refusing to listen on {args.host} without JAMF_WEBHOOK_USERNAME and JAMF_WEBHOOK_PASSWORD, "
+                 "anyone who can reach it could trigger reads and updates of any device")
+    # Only accept events for the kinds of device that have xEA rules enabled
+    updaters = {}
+    if COMPUTER_RULES:
+        logger.info(f"Computer xEA rules: {', '.join(f'{rule.name} ({rule.label})' for rule in COMPUTER_RULES)}")
+    if MOBILE_RULES:
+        logger.info(f"Mobile device xEA rules: {', '.join(f'{rule.name} ({rule.label})' for rule in MOBILE_RULES)}")
+    if not COMPUTER_RULES and not MOBILE_RULES:
+        sys.exit("No xEA rules enabled, set JAMF_xEA_ID_<RULE> or JAMF_MOBILE_xEA_ID_SITE and JAMF_MOBILE_xEA_NAME_SITE")
+
+    # Classic and Pro share one token and one connection pool, the token is refreshed as it expires
+    classic, pro = connect(JSS_URL, CLIENT_ID, CLIENT_SECRET)
+    if COMPUTER_RULES:
+        updaters["computer"] = partial(update_computer, pro)
+    if MOBILE_RULES:
+        updaters["mobile_device"] = partial(update_mobile_device, pro)
+
+    sink = result_sink(SCRIPT)
+    debouncer = Debouncer(
+        partial(update_batch, updaters, sink),
+        delay=DEBOUNCE_SECONDS if args.debounce is None else args.debounce,
+        max_delay=MAX_DELAY_SECONDS if args.max_delay is None else args.max_delay,
+    )
+    WebhookHandler.debouncer = debouncer
+    WebhookHandler.kinds = tuple(updaters)
+    server = ThreadingHTTPServer((args.host, args.port), WebhookHandler)
+    # A SIGTERM stops the server the same way Ctrl-C does
+    stop_on_sigterm()
+    logger.info(f"Listening for Jamf Pro webhooks on {args.host}:{args.port}, updating devices after {debouncer.delay:g}s without a new event")
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("Stopping, updating the devices still waiting")
+    finally:
+        server.server_close()
+        # Update every device still waiting, then write out the results
+        debouncer.close()
+        sink.close()
+        logger.info(f"Received {debouncer.events} events, updated {debouncer.handed_on} devices")
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        # Write the per-endpoint Jamf API metrics for this run, see jamf_helpers/metrics.py
+        write_reports(SCRIPT)
+        # With --profile, report where the time and memory went, see jamf_helpers/profiling.py
+        write_profile(SCRIPT)
@@ -7,6 +7,11 @@ To get this information we use Custom Extension Attributes.
 This script gets all the JSS IDs from the entire JSS, then iterates through the list, gathering each ID's site name.
 After it has the site name, it only updates each Mobile Device ID's record and updates the Extension Attribute with the site name if
 the site name has changed or is blank.
+Mobile devices are updated concurrently, set JAMF_WORKERS to change how many are worked on at once.
+
+Run with "plan" to only read from Jamf and write the changes that would be made to a plan file (--plan-file),
+then run with "apply" to make those changes without reading the inventory again.
+Run with --resume to skip devices already finished in an earlier, interrupted run (see jamf_helpers/journal.py).
 
 This is expected to be run in a CI environment (GitHub Actions) so certain secret values can be passed from the CI
 This requires the installation of the JPS-API-Wrapper: https://gitlab.com/cvtc/appleatcvtc/jps-api-wrapper
@@ -16,9 +21,17 @@ Jennifer Johnson
 03/26/25
 """
 
-from jps_api_wrapper.classic import Classic
-from jps_api_wrapper.pro import Pro
 from jps_api_wrapper.request_builder import ClientError 
+from jamf_helpers.advanced_search import search_results
+from jamf_helpers.cli import parse_args
+from jamf_helpers.listing import iter_mobile_devices
+from jamf_helpers.plan import Change, extension_attribute_field, run
+from jamf_helpers.records import from_mobile_device_detail
+from jamf_helpers.metrics import write_reports
+from jamf_helpers.profiling import write_profile
+from jamf_helpers.session import connect
+from jamf_helpers.workers import DeviceResult
+from functools import partial
 import logging
 import os
 import requests
@@ -28,16 +41,11 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 logformat = logging.Formatter("%(asctime)s:%(levelname)s:%(message)s")
 
-# file log handler
-file = logging.FileHandler("output.log",mode='w')
-file.setFormatter(logformat)
-
 # console log handler
 console = logging.StreamHandler()
 console.setFormatter(logformat)
 
 # add handlers
-logger.addHandler(file)
 logger.addHandler(console)
 
 # Get the Jamf URL and crendentials
@@ -51,67 +59,87 @@ port="8443"
 xEA_name = os.environ.get("JAMF_xEA_NAME")
 xEA_id = os.environ.get("JAMF_xEA_ID")
 
-# Handle logging to GitHub Actions as a summary
-def log_to_github_summary(message):
-    summary_file = os.getenv("GITHUB_STEP_SUMMARY")
-    if summary_file:
-        with open(summary_file, "a") as f:
-            f.write(f"{message}\n")
+# Name used to check a change plan was made by this script
+SCRIPT = os.path.basename(__file__)
+
+# Read every mobile device's site and xEA - Jamf Site with one Classic advanced search, created with this name if needed
+ADVANCED_SEARCH = os.environ.get("JAMF_ADVANCED_SEARCH")
+
+def plan_record(device):
+    # Whichever way the mobile device was read (device detail or advanced search), it is a DeviceRecord by now
+    # Get the current value of xEA - Jamf Site for this mobile device
+    current_xEA_site_name = device.extension_attribute(xEA_id)
+
+    # Only update xEA - Jamf Site Name if the site name has changed
+    if device.site == current_xEA_site_name:
+        return []
+    return [Change(device.id, device.name, extension_attribute_field(xEA_id), current_xEA_site_name, device.site)]
+
+def plan_device(pro, device):
+    # Get details about the mobile device ID, including its site and extension attributes
+    current = pro.get_mobile_device_detail(id=device.id)
+    return plan_record(from_mobile_device_detail(current))
+
+def apply_changes(pro, device_id, changes):
+    # Returns what happened to this mobile device, including the lines for the GitHub summary (see jamf_helpers/results.py),
+    # so output stays in order when mobile devices are updated concurrently
+    result = DeviceResult(device_id)
+    if not changes:
+        return result
+    # Set the JSON payload to be uploaded to Jamf, e.g. set the xEA - Jamf Site value  
+    # The Jamf Pro API updates mobile device extension attributes by name
+    try:
+        pro.update_mobile_device(
+            { 
+                "updatedExtensionAttributes": [
+                    {
+                        "name": xEA_name, 
+                        "value": [f"{change.new}"],
+                    }
+                    for change in changes
+                ]
+            }, device_id)
+        for change in changes:
+            # Format a text string of the results
+            site_output=f"JSS ID: {device_id}, Mobile Device Name: {change.name}, Extension Attribute: {xEA_name}, Value: {change.new}, {xEA_name} Previous Value: {change.old}"
+            # Export the results to GitHub environment so it can be added to the summary page
+            result.updated(f"{site_output}")
+    
+    except ClientError as err:
+        result.error(f"Client Error for ID: {device_id}", err,  # Optionally: print(err.response.json()) if you want exact error
+                     summary=f"❌ Skipped device `{device_id}` – `{err}`")
+
+    except requests.exceptions.HTTPError as err:
+        result.error(f"HTTP Error for ID: {device_id}", err,
+                     summary=f"🔥 Unexpected error on device `{device_id}` – `{err}`")
+    return result
 
 def main():
-    classic = Classic(JSS_URL, CLIENT_ID, CLIENT_SECRET, client=True)
-    pro = Pro(JSS_URL, CLIENT_ID, CLIENT_SECRET, client=True)
+    args = parse_args(__doc__)
+    # Classic and Pro share one token and one connection pool
+    classic, pro = connect(JSS_URL, CLIENT_ID, CLIENT_SECRET)
+
+    if args.mode == "apply":
+        # Everything needed is in the plan file, don't read any inventory
+        run(args, SCRIPT, [], None, partial(apply_changes, pro))
+        return
+
+    if ADVANCED_SEARCH:
+        # Retrieves the site and xEA - Jamf Site value for every mobile device in one request
+        all_devices = search_results(classic, "mobile_device", ADVANCED_SEARCH, {xEA_id: xEA_name})
+        run(args, SCRIPT, all_devices, plan_record, partial(apply_changes, pro), [xEA_id], prioritize=True)
+        return
 
     # Retrieves all the mobile device ids and mobile device names
-    all_devices = classic.get_mobile_devices()["mobile_devices"]
-    # For every mobile device ID found do the following
-    for device in all_devices:
-        # Get the JSS ID and mobile device Name
-        device_id = device["id"]
-        device_name = device["name"]
-        # Get details from the General subset about the mobile device ID
-        current = pro.get_mobile_device_detail(id=device_id)
-        # Get the Jamf Site Name for this mobile device 
-        site_name = current["site"]["name"]
-        
-        # Get the current value of xEA - Jamf Site for this mobile device
-        # Since its a list of dictionary values, we have to look for the right extension attribute to get its value
-        for extensionAttributes in current["extensionAttributes"]:
-            if xEA_id in extensionAttributes["id"]:
-                 current_xEA_site_name = str(extensionAttributes["value"])
-                # Do some text formatting to get rid of extra brackets and quotes
-                 current_xEA_site_name = current_xEA_site_name[2:-2]
-
-        # Only update xEA - Jamf Site Name if the site name has changed
-        if site_name != current_xEA_site_name:
-            # Set the JSON payload to be uploaded to Jamf, e.g. set the xEA - Jamf Site value  
-            try:
-                message = f"{site_name}"
-                pro.update_mobile_device(
-                    { 
-                        "updatedExtensionAttributes": [
-                            {
-                                "name": xEA_name, 
-                                "value": [message],
-                            }
-                        ]
-                    }, device_id)
-                # Format a text string of the results
-                site_output=f"JSS ID: {device_id}, Mobile Device Name: {device_name}, Extension Attribute: {xEA_name}, Value: {site_name}, {xEA_name} Previous Value: {current_xEA_site_name}"
-                # Export the results to GitHub environment so it can be added to the summary page
-                print(f"{site_output}")
-            
-            except ClientError as err:
-                print(f"Client Error for ID: {device_id}")
-                print(err)  # Optionally: print(err.response.json()) if you want exact error
-                msg = f"❌ Skipped device `{device_id}` – `{err}`"
-                log_to_github_summary(msg)
-
-            except requests.exceptions.HTTPError as err:
-                print(f"HTTP Error for ID: {device_id}")
-                print(err)
-                msg = f"🔥 Unexpected error on device `{device_id}` – `{err}`"
-                log_to_github_summary(msg)
+    all_devices = iter_mobile_devices(classic)
+    # For every mobile device ID found, get its site and update it, printing the results in order
+    run(args, SCRIPT, all_devices, partial(plan_device, pro), partial(apply_changes, pro), [xEA_id])
 
 if __name__ == '__main__':
-    main()
+    try:
+        main()
+    finally:
+        # Write the per-endpoint Jamf API metrics for this run, see jamf_helpers/metrics.py
+        write_reports(SCRIPT)
+        # With --profile, report where the time and memory went, see jamf_helpers/profiling.py
+        write_profile(SCRIPT)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+"""
+Micro-benchmark for the macOS Latest Supported classifier.
+
+Compares the original macOSCompatibility() from Action-Jamf_Pro_API-Update_xEA-macOS_Latest_Supported.py
+(kept below as legacy_macOSCompatibility, it compiles every regex on every call) with
+jamf_helpers.compatibility.latest_supported_macos (regexes compiled once, results cached per Model Identifier).
+
+The workload is 100,000 Macs drawn from a few hundred Model Identifiers, weighted so a handful of current models
+make up most of the fleet, like a real Jamf instance. Both classifiers must agree on every Mac.
+
+Run from the root of the repository:
+    python3 benchmarks/bench_macos_compatibility.py [number of Macs]
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from jamf_helpers.compatibility import latest_supported_macos
+
+
+def legacy_macOSCompatibility(model):
+    # Copy of the original implementation, used as the baseline and to check the results match
+    macOS_compatible = ""
+    while not macOS_compatible:
+        if model is None:
+            macOS_compatible = "Model Identifier Not Found"
+            return macOS_compatible
+
+        macOS_Sequoia_Regex = re.compile(r'(^(Mac(1[3-9]|BookPro1[5-8]|BookAir(9|10)|Pro[7-9])|iMac(Pro\d+|(19|[2-9]\d))|Macmini[89]),\d+$)')
+        macOS_Sequoia = macOS_Sequoia_Regex.search(model)
+        if macOS_Sequoia:
+            macOS_compatible = "macOS 15 Sequoia"
+            return macOS_compatible
+
+        macOS_Sonoma_Regex = re.compile(r'(^(Mac(1[345]|BookPro1[5-8]|BookAir([89]|10)|Pro7)|iMac(Pro1|(19|2[01]))|Macmini[89]),\d+$)')
+        macOS_Sonoma = macOS_Sonoma_Regex.search(model)
+        if macOS_Sonoma:
+            macOS_compatible = "macOS 14 Sonoma"
+            return macOS_compatible
+
+        macOS_Ventura_Regex = re.compile(r'(^(Mac(1[34]|BookPro1[4-8]|BookAir([89]|10)|Pro7|Book10)|iMac(Pro1|(1[89]|2[01]))|Macmini[89]),\d+$)')
+        macOS_Ventura = macOS_Ventura_Regex.search(model)
+        if macOS_Ventura:
+            macOS_compatible = "macOS 13 Ventura"
+            return macOS_compatible
+
+        macOS_Monterey_Regex = re.compile(r'(^Mac1[34]|MacBook(10|9)|MacBookAir(10|[7-9])|Macmini[7-9]|MacPro[6-7]|iMacPro1|iMac(1[6-9]|2[0-2])),\d|MacBookPro1(1,[45]|[2-8],\d)')
+        macOS_Monterey = macOS_Monterey_Regex.search(model)
+        if macOS_Monterey:
+            macOS_compatible = "macOS 12 Monterey"
+            return macOS_compatible
+
+        macOS_BigSur_Regex = re.compile(r'(MacBook(10|9|8)|MacBookAir(10|[6-9])|MacBookPro1[1-7]|Macmini[7-9]|MacPro[6-7]|iMacPro1),\d|iMac(14,4|1[5-9],\d|2[01],\d)')
+        macOS_BigSur = macOS_BigSur_Regex.search(model)
+        if macOS_BigSur:
+            macOS_compatible = "macOS 11 Big Sur"
+            return macOS_compatible
+
+        macOS_Virtual_Regex = re.compile(r'(VirtualMac2,1|Parallels1[3-5],1|VMware\d{1,2},\d{1})')
+        macOS_Virtual = macOS_Virtual_Regex.search(model)
+        if macOS_Virtual:
+            macOS_compatible = "Virtual Mac"
+            return macOS_compatible
+
+        if not all((macOS_Sequoia, macOS_Sonoma, macOS_Ventura, macOS_Monterey, macOS_BigSur, macOS_Virtual)):
+            macOS_compatible = "macOS 10.15 Catalina or older"
+            return macOS_compatible
+
+
+def model_identifiers():
+    # A few hundred Model Identifiers covering Apple silicon, Intel, very old Macs and virtual machines
+    models = []
+    models += [f"Mac{major},{minor}" for major in range(13, 17) for minor in range(1, 15)]
+    models += [f"MacBookPro{major},{minor}" for major in range(8, 19) for minor in range(1, 5)]
+    models += [f"MacBookAir{major},{minor}" for major in range(5, 11) for minor in range(1, 3)]
+    models += [f"iMac{major},{minor}" for major in range(12, 25) for minor in range(1, 5)]
+    models += [f"Macmini{major},1" for major in range(5, 10)]
+    models += [f"MacPro{major},1" for major in range(5, 8)]
+    models += [f"MacBook{major},1" for major in range(8, 11)]
+    models += ["iMacPro1,1", "VirtualMac2,1", "Parallels14,1", "VMware7,1", None]
+    return models
+
+
+def workload(size, seed=0):
+    # Zipf-like weights so the first few (newest) models dominate the fleet
+    models = model_identifiers()
+    models.sort(key=lambda model: (model is None, model), reverse=True)
+    weights = [1 / (rank + 1) for rank in range(len(models))]
+    return random.Random(seed).choices(models, weights=weights, k=size)
+
+
+def bench(name, func, macs):
+    start = time.perf_counter()
+    results = [func(model) for model in macs]
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed:8.3f} s {len(macs) / elapsed:14,.0f} Macs/s")
+    return elapsed, results
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    macs = workload(size)
+    print(f"{size:,} Macs, {len(set(macs))} distinct Model Identifiers")
+
+    legacy_time, legacy_results = bench("legacy macOSCompatibility", legacy_macOSCompatibility, macs)
+    latest_supported_macos.cache_clear()
+    current_time, current_results = bench("latest_supported_macos", latest_supported_macos, macs)
+
+    if legacy_results != current_results:
+        mismatches = {model for model, old, new in zip(macs, legacy_results, current_results) if old != new}
+        print(f"Results differ for: {sorted(mismatches, key=str)}")
+        sys.exit(1)
+    print(f"Results match, speedup {legacy_time / current_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+"""
+End-to-end benchmark of the Action scripts against the mock Jamf server in mock_jamf.py.
+
+Each scenario runs one Action script as its own process against a freshly reset mock fleet, and reports:
+- requests: API requests the script sent (including token requests)
+- req/device: requests divided by the number of devices the script works on
+- wall: seconds from starting the script to it exiting
+- peak MB: the script's peak resident memory
+- errors: responses that weren't 2xx
+
+Use it as a regression gate for performance changes: save a baseline with --json, then compare later runs with
+--baseline. The run fails if requests per device grow by more than --tolerance, or wall time by more than
+--time-tolerance. Request counts are exact, wall time depends on the machine so its tolerance is looser.
+
+Run from the root of the repository:
+    python3 benchmarks/bench_scripts.py --computers 10000 --json baseline.json
+    python3 benchmarks/bench_scripts.py --computers 10000 --baseline baseline.json
+    python3 benchmarks/bench_scripts.py --scenario site-bulk --scenario macos --computers 200000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from mock_jamf import EA_MACOS, EA_NAMES, EA_PREVIOUS_DATE, EA_SITE, EA_UNMANAGED_DATE, add_arguments, from_arguments
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# name: (script, devices it works on, extra environment variables)
+SCENARIOS = {
+    "site-bulk": ("Action-Jamf_Pro_API-Update_xEA-Jamf-Site.py", "computers", {}),
+    "site-per-device": ("Action-Jamf_Pro_API-Update_xEA-Jamf-Site.py", "computers", {"JAMF_BULK_READ": "false"}),
+    "macos": ("Action-Jamf_Pro_API-Update_xEA-macOS_Latest_Supported.py", "computers", {}),
+    "computers-all-rules": ("Action-Jamf_Pro_API-Update_xEA-Computers.py", "computers", {}),
+    "site-advanced-search": ("Action-Jamf_Pro_API-Update_xEA-Jamf-Site.py", "computers", {"JAMF_ADVANCED_SEARCH": "Benchmark Jamf Site"}),
+    "mobile-site": ("Action-Jamf_Pro_API_Update_Mobile_xEA-Jamf-Site.py", "mobile_devices", {}),
+    "mobile-site-advanced-search": ("Action-Jamf_Pro_API_Update_Mobile_xEA-Jamf-Site.py", "mobile_devices", {"JAMF_ADVANCED_SEARCH": "Benchmark Jamf Site"}),
+    "unmanage-computers": ("Action-Jamf_Pro_API-UnmanageComputers.py", "computer_group", {}),
+    "unmanage-mobile": ("Action-Jamf_Pro_API-UnmanageMobileDevices.py", "mobile_device_group", {}),
+    "command-unmanage-mobile": ("Action-Jamf_Pro_API-CommandUnmanageMobileDevices.py", "mobile_device_group", {}),
+}
+
+
+def script_environment(url, workdir):
+    # Point every script at the mock server, each script reads a slightly different set of variables
+    env = dict(os.environ)
+    for prefix in ("JAMF", "JSS"):
+        env.update({
+            f"{prefix}_URL": url,
+            f"{prefix}_CLIENT_ID": "mock-client",
+            f"{prefix}_CLIENT_SECRET": "mock-secret",
+        })
+    env.update({
+        "JAMF_xEA_NAME": EA_NAMES[EA_SITE],
+        "JAMF_xEA_ID": EA_SITE,
+        "JSS_xEA_NAME": EA_NAMES[EA_MACOS],
+        "JSS_xEA_ID": EA_MACOS,
+        "JAMF_STATIC_GROUP_ID": "1",
+        "JSS_MOBILE_STATIC_GROUP_ID": "1",
+        "JSS_MOBILE_xEA_NAME": EA_NAMES[EA_UNMANAGED_DATE],
+        "JSS_MOBILE_xEA_ID": EA_UNMANAGED_DATE,
+        "JAMF_xEA_NAME_1": EA_NAMES[EA_UNMANAGED_DATE],
+        "JAMF_xEA_ID_1": EA_UNMANAGED_DATE,
+        "JAMF_xEA_NAME_2": EA_NAMES[EA_PREVIOUS_DATE],
+        "JAMF_xEA_ID_2": EA_PREVIOUS_DATE,
+        "JAMF_xEA_NAME_SITE": EA_NAMES[EA_SITE],
+        "JAMF_xEA_ID_SITE": EA_SITE,
+        "JAMF_xEA_NAME_MACOS_LATEST_SUPPORTED": EA_NAMES[EA_MACOS],
+        "JAMF_xEA_ID_MACOS_LATEST_SUPPORTED": EA_MACOS,
+        "JAMF_JOURNAL": os.path.join(workdir, "journal.jsonl"),
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    # Don't let settings from the calling shell change what is measured
+    for name in ("JAMF_SNAPSHOT_DB", "JAMF_ADVANCED_SEARCH", "JAMF_TOKEN_CACHE", "JAMF_PLAN_FILE", "GITHUB_STEP_SUMMARY"):
+        env.pop(name, None)
+    return env
+
+
+def run_script(script, env, workdir, timeout):
+    # Run a script and return (exit code, wall seconds, peak resident memory in MB)
+    log_path = os.path.join(workdir, f"{os.path.splitext(script)[0]}.log")
+    with open(log_path, "w") as log:
+        start = time.monotonic()
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, script)], cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+        deadline = start + timeout
+        while True:
+            pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                break
+            if time.monotonic() > deadline:
+                process.kill()
+                pid, status, usage = os.wait4(process.pid, 0)
+                break
+            time.sleep(0.01)
+        wall = time.monotonic() - start
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return os.waitstatus_to_exitcode(status), wall, peak, log_path
+
+
+def run_scenarios(mock, names, timeout):
+    device_counts = {
+        "computers": mock.fleet.computers,
+        "mobile_devices": mock.fleet.mobile_devices,
+        "computer_group": min(mock.fleet.group_size, mock.fleet.computers),
+        "mobile_device_group": min(mock.fleet.group_size, mock.fleet.mobile_devices),
+    }
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="jamf-bench-") as workdir:
+        env = script_environment(mock.url, workdir)
+        for name in names:
+            script, devices_key, extra_env = SCENARIOS[name]
+            mock.fleet.reset()
+            mock.reset_stats()
+            exit_code, wall, peak, log_path = run_script(script, {**env, **extra_env}, workdir, timeout)
+            stats = mock.stats()
+            devices = device_counts[devices_key]
+            errors = sum(count for status, count in stats["by_status"].items() if not status.startswith("2"))
+            results[name] = {
+                "script": script,
+                "exit_code": exit_code,
+                "devices": devices,
+                "requests": stats["requests"],
+                "requests_per_device": stats["requests"] / devices if devices else 0,
+                "wall_seconds": wall,
+                "peak_memory_mb": peak,
+                "errors": errors,
+                "bytes_sent": stats["bytes_sent"],
+                "by_endpoint": stats["by_endpoint"],
+            }
+            print_row(name, results[name])
+            if exit_code != 0:
+                with open(log_path) as log:
+                    print(f"  {script} exited with {exit_code}, last output:")
+                    for line in log.readlines()[-10:]:
+                        print(f"    {line.rstrip()}")
+    return results
+
+
+def print_header():
+    print(f"{'scenario':<30}{'devices':>9}{'requests':>10}{'req/device':>12}{'wall s':>9}{'peak MB':>9}{'errors':>8}")
+
+
+def print_row(name, result):
+    print(
+        f"{name:<30}{result['devices']:>9}{result['requests']:>10}{result['requests_per_device']:>12.3f}"
+        f"{result['wall_seconds']:>9.2f}{result['peak_memory_mb']:>9.1f}{result['errors']:>8}"
+    )
+
+
+def compare(results, baseline, tolerance, time_tolerance):
+    # Returns a list of regressions compared to a baseline run
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            continue
+        if result["exit_code"] != 0:
+            regressions.append(f"{name}: exited with {result['exit_code']}")
+        if result["requests_per_device"] > before["requests_per_device"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: requests per device went from {before['requests_per_device']:.3f} to {result['requests_per_device']:.3f}"
+            )
+        if result["wall_seconds"] > before["wall_seconds"] * (1 + time_tolerance):
+            regressions.append(
+                f"{name}: wall time went from {before['wall_seconds']:.2f}s to {result['wall_seconds']:.2f}s"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario to run, can be repeated (default all)")
+    parser.add_argument("--timeout", type=float, default=3600, help="Seconds before a script is stopped (default 3600)")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Compare with results saved by an earlier --json run")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Allowed growth in requests per device (default 0.05)")
+    parser.add_argument("--time-tolerance", type=float, default=0.5, help="Allowed growth in wall time (default 0.5)")
+    args = parser.parse_args()
+
+    mock = from_arguments(args)
+    mock.start()
+    print(f"Mock Jamf at {mock.url}: {mock.fleet.computers} computers, {mock.fleet.mobile_devices} mobile devices, group of {mock.fleet.group_size}")
+    print_header()
+    try:
+        results = run_scenarios(mock, args.scenario or list(SCENARIOS), args.timeout)
+    finally:
+        mock.stop()
+
+    if args.json:
+        settings = {key: value for key, value in vars(args).items() if key not in ("json", "baseline", "scenario")}
+        with open(args.json, "w") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+        print(f"Wrote results to {args.json}")
+
+    failed = any(result["exit_code"] != 0 for result in results.values())
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.time_tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if not regressions:
+            print(f"No regressions compared to {args.baseline}")
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
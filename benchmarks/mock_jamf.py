@@ -0,0 +1,856 @@
+#!/usr/bin/env python3
+
+"""
+Offline stand-in for a Jamf Pro server, for load testing the Action scripts without touching production.
+
+It implements the Classic and Pro endpoints the scripts use, backed by a synthetic fleet of computers and
+mobile devices. Devices are generated from their ID on the fly, so a fleet of 200,000 devices costs no memory
+until a device is written to. Some devices start with a stale or blank Extension Attribute value (--drift),
+so the xEA scripts have real updates to make.
+
+Endpoints:
+- POST /api/oauth/token
+- GET /JSSResource/computers, /JSSResource/computers/subset/basic, /JSSResource/computers/id/{id}[/subset/...]
+- PUT /JSSResource/computers/id/{id}
+- GET /JSSResource/computergroups/id/{id}
+- GET /api/v1/computers-inventory, /api/v1/computers-inventory/{id}, /api/v1/computers-inventory-detail/{id}
+- PATCH /api/v1/computers-inventory-detail/{id}
+- GET /JSSResource/mobiledevices, /JSSResource/mobiledevices/id/{id}[/subset/...]
+- PUT /JSSResource/mobiledevices/id/{id}
+- GET /JSSResource/mobiledevicegroups/id/{id}
+- POST /JSSResource/mobiledevicecommands/command/{command}/id/{ids}
+- GET /api/v2/mobile-devices/{id}/detail, PATCH /api/v2/mobile-devices/{id}
+- GET, POST and PUT /JSSResource/advancedcomputersearches/... and /JSSResource/advancedmobiledevicesearches/...
+
+Classic endpoints answer in XML when asked for it with Accept: application/xml, and in JSON otherwise.
+
+Static group 1 holds the first --group-size computers or mobile devices. Extension Attribute 1 is Jamf Site,
+2 is macOS Latest Supported, 3 and 4 are the Unmanaged Date and Previous Inventory Date.
+
+Every response waits --latency milliseconds (plus up to --jitter more, plus --latency-per-record for each record
+in a list). With --max-concurrent, requests beyond that many at once get a 503 with Retry-After, and with
+--throttle-rate a share of requests get a 429, to exercise the rate limiter.
+
+GET /_mock/stats returns request counts by endpoint and status, bytes sent and the most requests seen at once.
+POST /_mock/reset clears the stats and every write, putting the fleet back how it started.
+
+Run it on its own:
+    python3 benchmarks/mock_jamf.py --computers 10000 --port 8080
+or start it from Python with MockJamf(...).start(), as bench_scripts.py does.
+"""
+
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import Counter
+from urllib.parse import parse_qs, unquote, urlsplit
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from jamf_helpers.compatibility import latest_supported_macos
+
+SITES = ["Main Campus", "North Campus", "South Campus", "Downtown", "Online", "None"]
+# Model Identifiers weighted towards current models, like a real fleet
+MODELS = [
+    ("MacBookAir10,1", 20), ("MacBookPro18,1", 15), ("Mac14,2", 12), ("Mac15,3", 8), ("iMac21,1", 8),
+    ("Macmini9,1", 6), ("MacBookPro16,1", 6), ("MacBookAir9,1", 5), ("MacBookPro15,2", 5), ("iMac19,1", 4),
+    ("MacBookPro14,1", 3), ("MacBookAir8,2", 3), ("iMac18,3", 2), ("MacBookAir7,2", 1), ("MacPro6,1", 1),
+]
+MOBILE_MODELS = ["iPad13,18", "iPad12,1", "iPad14,1", "iPhone15,2", "iPhone14,5", "AppleTV11,1"]
+# Report dates are spread over the 30 days before this
+BASE_DATE = datetime(2024, 9, 1, tzinfo=timezone.utc)
+EA_SITE, EA_MACOS, EA_UNMANAGED_DATE, EA_PREVIOUS_DATE = "1", "2", "3", "4"
+EA_NAMES = {
+    EA_SITE: "Jamf Site",
+    EA_MACOS: "macOS Latest Supported",
+    EA_UNMANAGED_DATE: "Unmanaged Date",
+    EA_PREVIOUS_DATE: "Previous Inventory Date",
+}
+# Most web servers reject URLs longer than this
+MAX_URL_LENGTH = 8192
+
+
+def _hash(device_id, salt):
+    # Cheap deterministic hash so every device always gets the same generated values
+    return ((device_id * 2654435761) ^ (salt * 40503)) & 0xFFFFFFFF
+
+
+def _pick_model(device_id):
+    total = sum(weight for _, weight in MODELS)
+    n = _hash(device_id, 1) % total
+    for model, weight in MODELS:
+        if n < weight:
+            return model
+        n -= weight
+    return MODELS[-1][0]
+
+
+class Fleet:
+    """
+    Synthetic fleet of computers and mobile devices, generated from each device's ID.
+    Writes are kept as overrides on top of the generated values.
+
+    :param computers: Number of computers, IDs 1 to computers
+    :param mobile_devices: Number of mobile devices, IDs 1 to mobile_devices
+    :param group_size: Number of devices in static group 1
+    :param drift: Share of devices whose Extension Attributes start out stale
+    """
+
+    def __init__(self, computers=10000, mobile_devices=10000, group_size=1000, drift=0.1):
+        self.computers = computers
+        self.mobile_devices = mobile_devices
+        self.group_size = group_size
+        self.drift = drift
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.overrides = {}
+            # Mobile devices sent an UnmanageDevice command, and when they will act on it
+            self.pending_unmanage = {}
+            # Advanced searches by kind and name, as {"id", "name", "display_fields"}
+            self.searches = {}
+
+    def _override(self, kind, device_id):
+        return self.overrides.setdefault((kind, device_id), {"extension_attributes": {}})
+
+    def exists(self, kind, device_id):
+        count = self.computers if kind == "computer" else self.mobile_devices
+        return 1 <= device_id <= count
+
+    def device(self, kind, device_id):
+        # Returns the current state of a device as a flat dictionary
+        site = SITES[_hash(device_id, 2) % len(SITES)]
+        stale = _hash(device_id, 3) % 1000 < self.drift * 1000
+        report_date = BASE_DATE - timedelta(seconds=_hash(device_id, 4) % (30 * 24 * 3600))
+        if kind == "computer":
+            model = _pick_model(device_id)
+            device = {
+                "id": device_id,
+                "name": f"MAC-{device_id:06d}",
+                "model": model,
+                "serial": f"C02{device_id:08d}",
+                "extension_attributes": {
+                    EA_SITE: "" if stale else site,
+                    EA_MACOS: "" if stale else latest_supported_macos(model),
+                },
+            }
+        else:
+            device = {
+                "id": device_id,
+                "name": f"IPAD-{device_id:06d}",
+                "model": MOBILE_MODELS[_hash(device_id, 5) % len(MOBILE_MODELS)],
+                "serial": f"DMP{device_id:08d}",
+                "extension_attributes": {EA_SITE: "" if stale else site},
+            }
+        device.update({"site": site, "managed": True, "report_date": report_date})
+        with self.lock:
+            if kind == "mobile_device":
+                due = self.pending_unmanage.get(device_id)
+                if due is not None and time.monotonic() >= due:
+                    self._override(kind, device_id)["managed"] = False
+                    del self.pending_unmanage[device_id]
+            override = self.overrides.get((kind, device_id))
+            if override:
+                extension_attributes = dict(device["extension_attributes"])
+                extension_attributes.update(override["extension_attributes"])
+                device.update({key: value for key, value in override.items() if key != "extension_attributes"})
+                device["extension_attributes"] = extension_attributes
+        return device
+
+    def update(self, kind, device_id, managed=None, extension_attributes=None, touch_report_date=False):
+        with self.lock:
+            override = self._override(kind, device_id)
+            if managed is not None:
+                override["managed"] = managed
+            if extension_attributes:
+                override["extension_attributes"].update(extension_attributes)
+            if touch_report_date:
+                # The Classic API updates the report date on every PUT, a known Jamf issue
+                override["report_date"] = datetime.now(timezone.utc).replace(microsecond=0)
+
+    def unmanage_later(self, device_id, delay):
+        with self.lock:
+            self.pending_unmanage[device_id] = time.monotonic() + delay
+
+
+def _pro_date(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _classic_date(value):
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _pro_extension_attribute(definition_id, value):
+    return {
+        "definitionId": definition_id,
+        "name": EA_NAMES[definition_id],
+        "enabled": True,
+        "multiValue": False,
+        "values": [value] if value else [],
+        "dataType": "STRING",
+        "inputType": "TEXT",
+    }
+
+
+# Inventory detail includes every section, these are the bulky ones that make it hundreds of KB in a real Jamf
+DETAIL_SECTIONS = [
+    "GENERAL", "HARDWARE", "OPERATING_SYSTEM", "EXTENSION_ATTRIBUTES", "APPLICATIONS", "FONTS", "CERTIFICATES",
+]
+APPLICATIONS_PER_COMPUTER = 150
+FONTS_PER_COMPUTER = 300
+CERTIFICATES_PER_COMPUTER = 40
+
+
+def pro_computer(device, sections=None):
+    # Computer in the shape the Jamf Pro computers-inventory endpoints return
+    sections = set(sections or DETAIL_SECTIONS)
+    extension_attributes = device["extension_attributes"]
+    record = {"id": str(device["id"]), "udid": f"UDID-{device['id']:08d}"}
+    if "GENERAL" in sections:
+        record["general"] = {
+            "name": device["name"],
+            "reportDate": _pro_date(device["report_date"]),
+            "lastContactTime": _pro_date(device["report_date"]),
+            "platform": "Mac",
+            "site": {"id": str(SITES.index(device["site"]) + 1), "name": device["site"]},
+            "remoteManagement": {"managed": device["managed"], "managementUsername": "jamfadmin"},
+            "supervised": True,
+            "extensionAttributes": [_pro_extension_attribute(EA_SITE, extension_attributes.get(EA_SITE, ""))],
+        }
+    if "HARDWARE" in sections:
+        record["hardware"] = {
+            "make": "Apple",
+            "model": device["model"],
+            "modelIdentifier": device["model"],
+            "serialNumber": device["serial"],
+            "extensionAttributes": [],
+        }
+    if "OPERATING_SYSTEM" in sections:
+        record["operatingSystem"] = {
+            "name": "macOS",
+            "version": "14.6.1",
+            "build": "23G93",
+            "extensionAttributes": [_pro_extension_attribute(EA_MACOS, extension_attributes.get(EA_MACOS, ""))],
+        }
+    if "EXTENSION_ATTRIBUTES" in sections:
+        record["extensionAttributes"] = [
+            _pro_extension_attribute(definition_id, extension_attributes.get(definition_id, ""))
+            for definition_id in (EA_UNMANAGED_DATE, EA_PREVIOUS_DATE)
+        ]
+    if "APPLICATIONS" in sections:
+        record["applications"] = [
+            {
+                "name": f"Application {number}.app",
+                "path": f"/Applications/Application {number}.app",
+                "version": f"{number % 20}.{device['id'] % 10}.0",
+                "macAppStore": number % 3 == 0,
+                "sizeMegabytes": number * 7 % 900,
+                "bundleId": f"com.example.application{number}",
+                "updateAvailable": False,
+                "externalVersionId": "0",
+            }
+            for number in range(APPLICATIONS_PER_COMPUTER)
+        ]
+    if "FONTS" in sections:
+        record["fonts"] = [
+            {"name": f"Font {number}", "version": "1.0", "path": f"/Library/Fonts/Font {number}.ttf"}
+            for number in range(FONTS_PER_COMPUTER)
+        ]
+    if "CERTIFICATES" in sections:
+        record["certificates"] = [
+            {
+                "commonName": f"Certificate {number}",
+                "identity": number % 5 == 0,
+                "expirationDate": "2030-01-01T00:00:00Z",
+                "username": "",
+                "lifecycleStatus": "ACTIVE",
+                "certificateStatus": "ISSUED",
+                "subjectName": f"CN=Certificate {number}, O=Example",
+                "serialNumber": f"{device['id']:08x}{number:04x}",
+                "sha1Fingerprint": f"{device['id'] * 7919 + number:040x}",
+                "issuedDate": "2024-01-01T00:00:00Z",
+            }
+            for number in range(CERTIFICATES_PER_COMPUTER)
+        ]
+    return record
+
+
+def classic_computer(device):
+    return {
+        "computer": {
+            "general": {
+                "id": device["id"],
+                "name": device["name"],
+                "serial_number": device["serial"],
+                "remote_management": {"managed": device["managed"], "management_username": "jamfadmin"},
+                "report_date": _classic_date(device["report_date"]),
+                "report_date_utc": device["report_date"].isoformat(),
+                "site": {"id": SITES.index(device["site"]) + 1, "name": device["site"]},
+            },
+            "extension_attributes": [
+                {"id": int(definition_id), "name": EA_NAMES[definition_id], "type": "String", "value": value}
+                for definition_id, value in device["extension_attributes"].items()
+            ],
+        }
+    }
+
+
+def classic_mobile_device(device):
+    return {
+        "mobile_device": {
+            "general": {
+                "id": device["id"],
+                "name": device["name"],
+                "device_name": device["name"],
+                "serial_number": device["serial"],
+                "model_identifier": device["model"],
+                "managed": device["managed"],
+                "supervised": True,
+                "last_inventory_update": _classic_date(device["report_date"]),
+                "site": {"id": SITES.index(device["site"]) + 1, "name": device["site"]},
+            },
+            "extension_attributes": [
+                {"id": int(definition_id), "name": EA_NAMES[definition_id], "type": "String", "value": value}
+                for definition_id, value in device["extension_attributes"].items()
+            ],
+        }
+    }
+
+
+def pro_mobile_device(device):
+    # Mobile device in the shape the Jamf Pro v2 mobile-devices detail endpoint returns
+    return {
+        "id": str(device["id"]),
+        "name": device["name"],
+        "serialNumber": device["serial"],
+        "managed": device["managed"],
+        "supervised": True,
+        "site": {"id": str(SITES.index(device["site"]) + 1), "name": device["site"]},
+        "lastInventoryUpdateTimestamp": _pro_date(device["report_date"]),
+        "extensionAttributes": [
+            {
+                "id": definition_id,
+                "name": EA_NAMES[definition_id],
+                "type": "STRING",
+                "value": [value] if value else [],
+                "extensionAttributeCollectionAllowed": False,
+                "inventoryDisplay": "General",
+            }
+            for definition_id, value in device["extension_attributes"].items()
+        ],
+    }
+
+
+def _xml_updates(body):
+    # Pull the managed state and Extension Attribute values out of a Classic API PUT body
+    root = ET.fromstring(body)
+    managed = root.findtext("general/remote_management/managed") or root.findtext("general/managed")
+    extension_attributes = {
+        element.findtext("id"): element.findtext("value") or ""
+        for element in root.iterfind("extension_attributes/extension_attribute")
+    }
+    return None if managed is None else managed == "true", extension_attributes
+
+
+def _xml_element(parent, tag, value):
+    # Add value to parent the way the Classic API writes it as XML, lists get a <size> and one element per item
+    element = ET.SubElement(parent, tag)
+    if isinstance(value, dict):
+        for key, child in value.items():
+            _xml_element(element, key, child)
+    elif isinstance(value, list):
+        ET.SubElement(element, "size").text = str(len(value))
+        item_tag = tag[:-1] if tag.endswith("s") else tag
+        for item in value:
+            _xml_element(element, item_tag, item)
+    elif isinstance(value, bool):
+        element.text = "true" if value else "false"
+    elif value is not None:
+        element.text = str(value)
+    return element
+
+
+def classic_xml(body):
+    # Classic API XML for a response body with a single root key, e.g. {"computers": [...]}
+    (tag, value), = body.items()
+    root = ET.Element("root")
+    _xml_element(root, tag, value)
+    return b'<?xml version="1.0" encoding="UTF-8"?>' + ET.tostring(root[0])
+
+
+class MockJamf:
+    """
+    The mock Jamf server. Runs in a background thread once started.
+
+    :param fleet: Fleet of devices to serve
+    :param port: Port to listen on, 0 picks a free port
+    :param latency: Milliseconds added to every response
+    :param jitter: Up to this many extra milliseconds added at random to every response
+    :param latency_per_record: Milliseconds added for each record in a list response
+    :param max_concurrent: Answer 503 to requests beyond this many at once, 0 for no limit
+    :param throttle_rate: Share of requests answered with 429 at random
+    :param token_lifetime: Seconds an API token is valid for
+    :param command_delay: Seconds before a mobile device acts on an UnmanageDevice command
+    """
+
+    def __init__(
+        self,
+        fleet,
+        port=0,
+        latency=0.0,
+        jitter=0.0,
+        latency_per_record=0.0,
+        max_concurrent=0,
+        throttle_rate=0.0,
+        token_lifetime=1200,
+        command_delay=0.0,
+    ):
+        self.fleet = fleet
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        self.latency_per_record = latency_per_record / 1000
+        self.max_concurrent = max_concurrent
+        self.throttle_rate = throttle_rate
+        self.token_lifetime = token_lifetime
+        self.command_delay = command_delay
+        self.tokens = {}
+        self.lock = threading.Lock()
+        self.reset_stats()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), _handler(self))
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.routes = [
+            ("POST", r"/api/oauth/token", "oauth token", self.token),
+            ("GET", r"/JSSResource/computers", "classic computers", self.classic_computers),
+            ("GET", r"/JSSResource/computers/subset/basic", "classic computers basic", self.classic_computers),
+            ("GET", r"/JSSResource/computers/id/(\d+)(?:/subset/.*)?", "classic computer", self.classic_computer),
+            ("PUT", r"/JSSResource/computers/id/(\d+)", "classic update computer", self.classic_update_computer),
+            ("GET", r"/JSSResource/computergroups/id/(\d+)", "classic computer group", self.classic_computer_group),
+            ("GET", r"/api/v1/computers-inventory", "pro computers inventory", self.pro_inventory),
+            ("GET", r"/api/v1/computers-inventory/(\d+)", "pro computer inventory", self.pro_computer),
+            ("GET", r"/api/v1/computers-inventory-detail/(\d+)", "pro computer detail", self.pro_computer),
+            ("PATCH", r"/api/v1/computers-inventory-detail/(\d+)", "pro update computer", self.pro_update_computer),
+            ("GET", r"/JSSResource/mobiledevices", "classic mobile devices", self.classic_mobile_devices),
+            ("GET", r"/JSSResource/mobiledevices/id/(\d+)(?:/subset/.*)?", "classic mobile device", self.classic_mobile_device),
+            ("PUT", r"/JSSResource/mobiledevices/id/(\d+)", "classic update mobile device", self.classic_update_mobile_device),
+            ("GET", r"/JSSResource/mobiledevicegroups/id/(\d+)", "classic mobile device group", self.classic_mobile_device_group),
+            ("POST", r"/JSSResource/mobiledevicecommands/command/(\w+)/id/([\d,]+)", "classic mobile device command", self.classic_mobile_device_command),
+            ("GET", r"/api/v2/mobile-devices/(\d+)/detail", "pro mobile device detail", self.pro_mobile_device),
+            ("PATCH", r"/api/v2/mobile-devices/(\d+)", "pro update mobile device", self.pro_update_mobile_device),
+            ("GET", r"/JSSResource/advanced(computer|mobiledevice)searches/(id|name)/([^/]+)", "classic advanced search", self.classic_advanced_search),
+            ("POST", r"/JSSResource/advanced(computer|mobiledevice)searches/id/(\d+)", "classic create advanced search", self.classic_save_advanced_search),
+            ("PUT", r"/JSSResource/advanced(computer|mobiledevice)searches/id/(\d+)", "classic update advanced search", self.classic_save_advanced_search),
+        ]
+        self.routes = [(method, re.compile(pattern + "$"), name, func) for method, pattern, name, func in self.routes]
+
+    def start(self):
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        return self.url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests = Counter()
+            self.statuses = Counter()
+            self.bytes_sent = 0
+            self.in_flight = 0
+            self.peak_in_flight = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": sum(self.requests.values()),
+                "by_endpoint": dict(self.requests),
+                "by_status": {str(status): count for status, count in self.statuses.items()},
+                "bytes_sent": self.bytes_sent,
+                "peak_in_flight": self.peak_in_flight,
+            }
+
+    # Route handlers return (status, body, record count), body is a dict for JSON or a str for XML
+
+    def token(self, request):
+        token = f"mock-{random.getrandbits(64):016x}"
+        with self.lock:
+            self.tokens[token] = time.monotonic() + self.token_lifetime
+        return 200, {"access_token": token, "scope": "api-role:1", "token_type": "Bearer", "expires_in": self.token_lifetime}, 0
+
+    def classic_computers(self, request):
+        basic = request.path.endswith("/subset/basic")
+        computers = []
+        for device_id in range(1, self.fleet.computers + 1):
+            if basic:
+                device = self.fleet.device("computer", device_id)
+                computers.append({
+                    "id": device_id,
+                    "name": device["name"],
+                    "managed": device["managed"],
+                    "username": "",
+                    "model": device["model"],
+                    "serial_number": device["serial"],
+                    "report_date_utc": device["report_date"].isoformat(),
+                    "report_date_epoch": int(device["report_date"].timestamp() * 1000),
+                })
+            else:
+                computers.append({"id": device_id, "name": f"MAC-{device_id:06d}"})
+        return 200, {"computers": computers}, len(computers)
+
+    def classic_computer(self, request, device_id):
+        return self._device(classic_computer, "computer", int(device_id))
+
+    def classic_update_computer(self, request, device_id):
+        return self._classic_update("computer", int(device_id), request.body)
+
+    def classic_computer_group(self, request, group_id):
+        computers = [
+            {"id": device_id, "name": f"MAC-{device_id:06d}"}
+            for device_id in range(1, min(self.fleet.group_size, self.fleet.computers) + 1)
+        ] if group_id == "1" else None
+        if computers is None:
+            return 404, "Not Found", 0
+        group = {"id": 1, "name": "Mock Static Group", "is_smart": False, "computers": computers}
+        return 200, {"computer_group": group}, len(computers)
+
+    def pro_inventory(self, request):
+        params = request.params
+        page = int(params.get("page", ["0"])[0])
+        page_size = int(params.get("page-size", ["100"])[0])
+        sections = params.get("section") or ["GENERAL"]
+        filter = params.get("filter", [""])[0]
+        newer_than = None
+        if filter:
+            match = re.fullmatch(r'general\.reportDate>="?([^"]+)"?', filter)
+            if not match:
+                return 400, {"httpStatus": 400, "errors": [{"description": f"Unsupported filter {filter}"}]}, 0
+            newer_than = match.group(1)
+        if newer_than is None:
+            total = self.fleet.computers
+            ids = range(page * page_size + 1, min(total, (page + 1) * page_size) + 1)
+            results = [pro_computer(self.fleet.device("computer", device_id), sections) for device_id in ids]
+        else:
+            # Filtering has to look at every device, like a database scan would
+            matching = [
+                device_id
+                for device_id in range(1, self.fleet.computers + 1)
+                if _pro_date(self.fleet.device("computer", device_id)["report_date"]) >= newer_than
+            ]
+            total = len(matching)
+            ids = matching[page * page_size:(page + 1) * page_size]
+            results = [pro_computer(self.fleet.device("computer", device_id), sections) for device_id in ids]
+        return 200, {"totalCount": total, "results": results}, len(results)
+
+    def pro_computer(self, request, device_id):
+        sections = request.params.get("section")
+        if "detail" in request.path:
+            sections = None
+        return self._device(lambda device: pro_computer(device, sections), "computer", int(device_id))
+
+    def pro_update_computer(self, request, device_id):
+        device_id = int(device_id)
+        if not self.fleet.exists("computer", device_id):
+            return 404, {"httpStatus": 404, "errors": []}, 0
+        data = json.loads(request.body or "{}")
+        extension_attributes = {
+            str(extension_attribute["definitionId"]): ", ".join(extension_attribute.get("values") or [])
+            for extension_attribute in data.get("extensionAttributes", [])
+        }
+        self.fleet.update("computer", device_id, extension_attributes=extension_attributes)
+        return 200, pro_computer(self.fleet.device("computer", device_id)), 1
+
+    def classic_mobile_devices(self, request):
+        mobile_devices = []
+        for device_id in range(1, self.fleet.mobile_devices + 1):
+            device = self.fleet.device("mobile_device", device_id)
+            mobile_devices.append({
+                "id": device_id,
+                "name": device["name"],
+                "device_name": device["name"],
+                "serial_number": device["serial"],
+                "managed": device["managed"],
+                "supervised": True,
+                "model_identifier": device["model"],
+                "username": "",
+            })
+        return 200, {"mobile_devices": mobile_devices}, len(mobile_devices)
+
+    def classic_mobile_device(self, request, device_id):
+        return self._device(classic_mobile_device, "mobile_device", int(device_id))
+
+    def classic_update_mobile_device(self, request, device_id):
+        return self._classic_update("mobile_device", int(device_id), request.body)
+
+    def classic_mobile_device_group(self, request, group_id):
+        if group_id != "1":
+            return 404, "Not Found", 0
+        mobile_devices = [
+            {"id": device_id, "name": f"IPAD-{device_id:06d}"}
+            for device_id in range(1, min(self.fleet.group_size, self.fleet.mobile_devices) + 1)
+        ]
+        group = {"id": 1, "name": "Mock Static Group", "is_smart": False, "mobile_devices": mobile_devices}
+        return 200, {"mobile_device_group": group}, len(mobile_devices)
+
+    def classic_mobile_device_command(self, request, command, ids):
+        ids = [int(device_id) for device_id in ids.split(",")]
+        if command == "UnmanageDevice":
+            for device_id in ids:
+                self.fleet.unmanage_later(device_id, self.command_delay)
+        body = "<?xml version=\"1.0\" encoding=\"UTF-8\"?><mobile_device_command><command>{}</command>{}</mobile_device_command>".format(
+            command, "".join(f"<mobile_device><id>{device_id}</id></mobile_device>" for device_id in ids)
+        )
+        return 201, body, len(ids)
+
+    def pro_mobile_device(self, request, device_id):
+        return self._device(pro_mobile_device, "mobile_device", int(device_id))
+
+    def pro_update_mobile_device(self, request, device_id):
+        device_id = int(device_id)
+        if not self.fleet.exists("mobile_device", device_id):
+            return 404, {"httpStatus": 404, "errors": []}, 0
+        data = json.loads(request.body or "{}")
+        ids_by_name = {name: definition_id for definition_id, name in EA_NAMES.items()}
+        extension_attributes = {}
+        for extension_attribute in data.get("updatedExtensionAttributes", []):
+            definition_id = ids_by_name.get(extension_attribute["name"])
+            if definition_id is None:
+                return 400, {"httpStatus": 400, "errors": [{"description": "Unknown extension attribute"}]}, 0
+            extension_attributes[definition_id] = ", ".join(extension_attribute.get("value") or [])
+        self.fleet.update("mobile_device", device_id, extension_attributes=extension_attributes)
+        return 200, pro_mobile_device(self.fleet.device("mobile_device", device_id)), 1
+
+    def classic_advanced_search(self, request, kind, identification, value):
+        kind = "computer" if kind == "computer" else "mobile_device"
+        with self.fleet.lock:
+            searches = [search for (search_kind, _), search in self.fleet.searches.items() if search_kind == kind]
+        search = next((search for search in searches if str(search[identification]) == value), None)
+        if search is None:
+            return 404, "Not Found", 0
+        count = self.fleet.computers if kind == "computer" else self.fleet.mobile_devices
+        ids_by_name = {name: definition_id for definition_id, name in EA_NAMES.items()}
+        results = []
+        for device_id in range(1, count + 1):
+            device = self.fleet.device(kind, device_id)
+            result = {"id": device_id, "name": device["name"]}
+            for field in search["display_fields"]:
+                if field == "Site":
+                    value = device["site"]
+                else:
+                    value = device["extension_attributes"].get(ids_by_name.get(field), "")
+                result[field.replace(" ", "_")] = value
+            results.append(result)
+        root = f"advanced_{kind}_search"
+        body = {
+            "id": search["id"],
+            "name": search["name"],
+            "view_as": "Standard Web Page",
+            "criteria": [],
+            "display_fields": [{"name": field} for field in search["display_fields"]],
+            "computers" if kind == "computer" else "mobile_devices": results,
+        }
+        return 200, {root: body}, len(results)
+
+    def classic_save_advanced_search(self, request, kind, search_id):
+        kind = "computer" if kind == "computer" else "mobile_device"
+        try:
+            root = ET.fromstring(request.body)
+        except ET.ParseError:
+            return 409, "Conflict: malformed XML", 0
+        name = root.findtext("name")
+        display_fields = [field.findtext("name") for field in root.iterfind("display_fields/display_field")]
+        with self.fleet.lock:
+            existing = [search for (search_kind, _), search in self.fleet.searches.items() if search_kind == kind]
+            if request.method == "POST":
+                if any(search["name"] == name for search in existing):
+                    return 409, "Conflict: duplicate name", 0
+                search_id = max([search["id"] for search in existing] + [0]) + 1
+            else:
+                search_id = int(search_id)
+                match = [key for key, search in self.fleet.searches.items() if key[0] == kind and search["id"] == search_id]
+                if not match:
+                    return 404, "Not Found", 0
+                del self.fleet.searches[match[0]]
+            self.fleet.searches[(kind, name)] = {"id": search_id, "name": name, "display_fields": display_fields}
+        tag = f"advanced_{kind}_search"
+        return 201, f"<?xml version=\"1.0\" encoding=\"UTF-8\"?><{tag}><id>{search_id}</id></{tag}>", 0
+
+    def _device(self, shape, kind, device_id):
+        if not self.fleet.exists(kind, device_id):
+            return 404, "Not Found", 0
+        return 200, shape(self.fleet.device(kind, device_id)), 1
+
+    def _classic_update(self, kind, device_id, body):
+        if not self.fleet.exists(kind, device_id):
+            return 404, "Not Found", 0
+        try:
+            managed, extension_attributes = _xml_updates(body)
+        except ET.ParseError:
+            return 409, "Conflict: malformed XML", 0
+        self.fleet.update(kind, device_id, managed, extension_attributes, touch_report_date=True)
+        tag = "computer" if kind == "computer" else "mobile_device"
+        return 201, f"<?xml version=\"1.0\" encoding=\"UTF-8\"?><{tag}><id>{device_id}</id></{tag}>", 1
+
+    def handle(self, request):
+        # Returns (status, headers, body bytes) for a request
+        if request.path == "/_mock/stats":
+            return 200, {}, json.dumps(self.stats()).encode()
+        if request.path == "/_mock/reset":
+            self.fleet.reset()
+            self.reset_stats()
+            return 200, {}, b"{}"
+
+        for method, pattern, name, func in self.routes:
+            match = pattern.match(request.path)
+            if match and method == request.method:
+                break
+        else:
+            name, func, match = f"unknown {request.method} {request.path}", None, None
+
+        with self.lock:
+            self.requests[name] += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            in_flight = self.in_flight
+        try:
+            status, headers, body, records = self._respond(request, func, match, in_flight)
+            time.sleep(self.latency + random.uniform(0, self.jitter) + self.latency_per_record * records)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+        with self.lock:
+            self.statuses[status] += 1
+            self.bytes_sent += len(body)
+        return status, headers, body
+
+    def _respond(self, request, func, match, in_flight):
+        if len(request.raw_path) > MAX_URL_LENGTH:
+            return 414, {}, b"URI Too Long", 0
+        if func is None:
+            return 404, {}, b"Not Found", 0
+        if self.max_concurrent and in_flight > self.max_concurrent:
+            return 503, {"Retry-After": "1"}, b"Service Unavailable", 0
+        if self.throttle_rate and random.random() < self.throttle_rate:
+            return 429, {"Retry-After": "1"}, b"Too Many Requests", 0
+        if func != self.token and not self._authorized(request):
+            return 401, {}, b'{"httpStatus":401,"errors":[]}', 0
+        status, body, records = func(request, *match.groups())
+        if isinstance(body, str):
+            return status, {"Content-Type": "text/xml"}, body.encode(), records
+        if "application/xml" in request.headers.get("Accept", "") and request.raw_path.startswith("/JSSResource/"):
+            headers, payload = {"Content-Type": "application/xml"}, classic_xml(body)
+        else:
+            headers, payload = {"Content-Type": "application/json"}, json.dumps(body).encode()
+        if request.method == "GET" and status == 200:
+            # Answer conditional requests like a server that supports them
+            headers["ETag"] = f'"{hashlib.sha1(payload).hexdigest()}"'
+            if request.headers.get("If-None-Match") == headers["ETag"]:
+                return 304, headers, b"", 0
+        return status, headers, payload, records
+
+    def _authorized(self, request):
+        token = request.headers.get("Authorization", "")[len("Bearer "):]
+        with self.lock:
+            expires = self.tokens.get(token)
+        return expires is not None and time.monotonic() < expires
+
+
+class _Request:
+    def __init__(self, method, raw_path, headers, body):
+        url = urlsplit(raw_path)
+        self.method = method
+        self.raw_path = raw_path
+        self.path = unquote(url.path)
+        self.params = parse_qs(url.query)
+        self.headers = headers
+        self.body = body
+
+
+def _handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Send the headers and body in one packet, otherwise Nagle's algorithm adds 40ms to keep-alive responses
+        wbufsize = 1 << 16
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _serve(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length).decode() if length else ""
+            status, headers, payload = mock.handle(_Request(self.command, self.path, self.headers, body))
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _serve
+
+    return Handler
+
+
+def add_arguments(parser):
+    # Options shared with bench_scripts.py
+    parser.add_argument("--computers", type=int, default=10000, help="Number of computers (default 10000)")
+    parser.add_argument("--mobile-devices", type=int, default=None, help="Number of mobile devices (default same as computers)")
+    parser.add_argument("--group-size", type=int, default=1000, help="Devices in static group 1 (default 1000)")
+    parser.add_argument("--drift", type=float, default=0.1, help="Share of devices with stale Extension Attributes (default 0.1)")
+    parser.add_argument("--latency", type=float, default=5, help="Milliseconds added to every response (default 5)")
+    parser.add_argument("--jitter", type=float, default=5, help="Up to this many extra milliseconds at random (default 5)")
+    parser.add_argument("--latency-per-record", type=float, default=0.05, help="Milliseconds per record in list responses (default 0.05)")
+    parser.add_argument("--max-concurrent", type=int, default=0, help="Answer 503 beyond this many requests at once (default no limit)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered with 429 (default 0)")
+    parser.add_argument("--command-delay", type=float, default=0.0, help="Seconds before a device acts on an MDM command (default 0)")
+
+
+def from_arguments(args, port=0):
+    fleet = Fleet(
+        computers=args.computers,
+        mobile_devices=args.computers if args.mobile_devices is None else args.mobile_devices,
+        group_size=args.group_size,
+        drift=args.drift,
+    )
+    return MockJamf(
+        fleet,
+        port=port,
+        latency=args.latency,
+        jitter=args.jitter,
+        latency_per_record=args.latency_per_record,
+        max_concurrent=args.max_concurrent,
+        throttle_rate=args.throttle_rate,
+        command_delay=args.command_delay,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on (default 8080)")
+    args = parser.parse_args()
+    mock = from_arguments(args, port=args.port)
+    print(f"Mock Jamf serving {mock.fleet.computers} computers and {mock.fleet.mobile_devices} mobile devices at {mock.url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
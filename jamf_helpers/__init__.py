@@ -0,0 +1,6 @@
+"""
+Shared helpers for the Action-Jamf_Pro_API scripts in this repository.
+
+The Action scripts are run directly (python3 Action-Jamf_Pro_API-....py) from the root of the repository,
+so this package is importable without being installed.
+"""
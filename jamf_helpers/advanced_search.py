@@ -0,0 +1,105 @@
+"""
+Reads a few fields for every device with one Classic API advanced search, instead of one request per device.
+
+search_results() creates a Classic advanced computer or mobile device search with the display fields a script
+needs (e.g. Site and the Jamf Site Extension Attribute), or reuses it if it already exists, then reads the whole
+result set back with one request. Jamf works out the results on the server, so the read phase is a handful of
+requests however big the fleet is. The search has no criteria, so it returns every device.
+
+Jamf names each display field in the results after the field, with spaces replaced by underscores, e.g.
+"Jamf Site" comes back as "Jamf_Site", and other punctuation replaced too on some versions, so the keys are matched
+against the ones in the results. The results themselves are the one list in the search besides its criteria and
+display fields. Results are returned as DeviceRecords with the site and the Extension Attribute values filled in.
+"""
+
+from jamf_helpers.records import from_search_result
+from jps_api_wrapper.request_builder import NotFound
+import re
+import xml.etree.ElementTree as ET
+
+KINDS = {
+    "computer": {
+        "root": "advanced_computer_search",
+        "results": "computers",
+        "get": "get_advanced_computer_search",
+        "create": "create_advanced_computer_search",
+        "update": "update_advanced_computer_search",
+    },
+    "mobile_device": {
+        "root": "advanced_mobile_device_search",
+        "results": "mobile_devices",
+        "get": "get_advanced_mobile_device_search",
+        "create": "create_advanced_mobile_device_search",
+        "update": "update_advanced_mobile_device_search",
+    },
+}
+SITE_FIELD = "Site"
+# Lists in a search that aren't its results
+SEARCH_LISTS = {"criteria", "display_fields"}
+
+
+def search_xml(kind, name, display_fields):
+    # XML for an advanced search with no criteria, so it matches every device, showing the given fields
+    root = ET.Element(KINDS[kind]["root"])
+    ET.SubElement(root, "name").text = name
+    ET.SubElement(root, "view_as").text = "Standard Web Page"
+    ET.SubElement(ET.SubElement(root, "criteria"), "size").text = "0"
+    fields = ET.SubElement(root, "display_fields")
+    for display_field in display_fields:
+        ET.SubElement(ET.SubElement(fields, "display_field"), "name").text = display_field
+    return ET.tostring(root, encoding="unicode")
+
+
+def result_key(display_field, keys=()):
+    # The key Jamf uses for a display field in the results, out of the keys a result actually has
+    key = display_field.replace(" ", "_")
+    if key in keys:
+        return key
+    normalized = _normalized(display_field)
+    return next((existing for existing in keys if _normalized(existing) == normalized), key)
+
+
+def _normalized(name):
+    return re.sub(r"[\W_]+", "_", name).strip("_").lower()
+
+
+def search_devices(search, kind):
+    # The results of an advanced search, the only list in it besides the criteria and display fields
+    lists = [key for key, value in search.items() if isinstance(value, list) and key not in SEARCH_LISTS]
+    if len(lists) == 1:
+        return search[lists[0]]
+    return search.get(KINDS[kind]["results"]) or []
+
+
+def _has_fields(search, display_fields):
+    existing = {field["name"] for field in search.get("display_fields") or []}
+    return set(display_fields) <= existing
+
+
+def ensure_search(classic, kind, name, display_fields):
+    # Get the advanced search with its results, creating it or adding missing display fields first
+    # Returns the search as the Classic API returns it
+    methods = KINDS[kind]
+    try:
+        search = getattr(classic, methods["get"])(name=name)[methods["root"]]
+    except NotFound:
+        getattr(classic, methods["create"])(search_xml(kind, name, display_fields), id=0)
+        return getattr(classic, methods["get"])(name=name)[methods["root"]]
+    if not _has_fields(search, display_fields):
+        getattr(classic, methods["update"])(search_xml(kind, name, display_fields), id=search["id"])
+        search = getattr(classic, methods["get"])(name=name)[methods["root"]]
+    return search
+
+
+def search_results(classic, kind, name, extension_attributes):
+    # Every device in the advanced search as a DeviceRecord with its site and Extension Attribute values
+    # extension_attributes maps each Extension Attribute's definition ID to its name, which is its display field
+    display_fields = [SITE_FIELD] + list(extension_attributes.values())
+    search = ensure_search(classic, kind, name, display_fields)
+    results = search_devices(search, kind)
+    if not results:
+        return []
+    existing = list(results[0])
+    site_key = result_key(SITE_FIELD, existing)
+    keys = {definition_id: result_key(field, existing) for definition_id, field in extension_attributes.items()}
+    return [from_search_result(result, site_key, keys) for result in results]
@@ -0,0 +1,147 @@
+"""
+Command line options shared by the Action scripts.
+
+Every option has a default that matches how the scripts have always run, so running a script with no arguments
+(as the GitHub Actions workflows do) behaves the same as before.
+"""
+
+from jamf_helpers import profiling
+from jamf_helpers.shard import activate, parse_shard, sharded_path
+import argparse
+import os
+
+
+def add_shard_argument(parser):
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=parse_shard(os.environ["JAMF_SHARD"]) if os.environ.get("JAMF_SHARD") else None,
+        help="Only work on shard I of N of the devices, e.g. 3/8 (default: JAMF_SHARD or every device)",
+    )
+
+
+def add_profile_arguments(parser):
+    profile = os.environ.get("JAMF_PROFILE", "").lower()
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="all",
+        choices=["all", "time"],
+        default="all" if profile in ("1", "true", "yes", "all") else "time" if profile == "time" else None,
+        help="Report the wall time, CPU time and allocated memory of each phase of the run. "
+        "--profile time leaves out memory, which slows the run down (default: JAMF_PROFILE)",
+    )
+    parser.add_argument(
+        "--profile-dump",
+        metavar="DIRECTORY",
+        default=os.environ.get("JAMF_PROFILE_DUMP"),
+        help="Also write cProfile and tracemalloc dumps to this directory, implies --profile (default: JAMF_PROFILE_DUMP)",
+    )
+
+
+def _configure(args):
+    # Every file a shard writes gets the shard in its name, see jamf_helpers/shard.py
+    activate(args.shard)
+    if getattr(args, "plan_file", None):
+        args.plan_file = sharded_path(args.plan_file)
+    # Start profiling before anything talks to Jamf, see jamf_helpers/profiling.py
+    if args.profile or args.profile_dump:
+        profiling.enable(args.profile_dump, memory=args.profile != "time")
+    return args
+
+
+def parse_args(description=None, argv=None):
+    parser = argparse.ArgumentParser(description=description, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "mode",
+        nargs="?",
+        choices=["run", "plan", "apply"],
+        default="run",
+        help="run: read and update in one pass (default). "
+        "plan: only read from Jamf and write the changes that would be made to the plan file. "
+        "apply: make the changes in the plan file without reading inventory again.",
+    )
+    parser.add_argument(
+        "--plan-file",
+        default=os.environ.get("JAMF_PLAN_FILE", "change_plan.jsonl"),
+        help="Change plan file written by plan and read by apply (default: change_plan.jsonl)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip devices already finished earlier in this sweep, as recorded in the journal",
+    )
+    parser.add_argument(
+        "--journal",
+        default=None,
+        help="Journal file recording each finished device (default: JAMF_JOURNAL or <script name>.journal.jsonl)",
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        default=float(os.environ["JAMF_TIME_BUDGET_MINUTES"]) if os.environ.get("JAMF_TIME_BUDGET_MINUTES") else None,
+        help="Minutes the script may run for, the devices most likely to need a change are done first and the sweep "
+        "stops cleanly before the time is up (default: JAMF_TIME_BUDGET_MINUTES or no limit)",
+    )
+    add_shard_argument(parser)
+    add_profile_arguments(parser)
+    return _configure(parser.parse_args(argv))
+
+
+def parse_command_args(description=None, argv=None):
+    # Options for the scripts that send MDM commands
+    parser = argparse.ArgumentParser(description=description, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=int(os.environ.get("JAMF_COMMAND_CHUNK_SIZE", 250)),
+        help="Devices per command request (default: JAMF_COMMAND_CHUNK_SIZE or 250)",
+    )
+    parser.add_argument(
+        "--wait",
+        type=float,
+        default=float(os.environ.get("JAMF_COMMAND_WAIT_MINUTES", 0)),
+        help="Minutes to wait for devices to act on the command, 0 to not wait (default: JAMF_COMMAND_WAIT_MINUTES or 0)",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=float(os.environ.get("JAMF_COMMAND_POLL_SECONDS", 60)),
+        help="Seconds between checks while waiting (default: JAMF_COMMAND_POLL_SECONDS or 60)",
+    )
+    add_shard_argument(parser)
+    add_profile_arguments(parser)
+    return _configure(parser.parse_args(argv))
+
+
+def parse_webhook_args(description=None, argv=None):
+    # Options for the script that receives Jamf Pro webhooks
+    parser = argparse.ArgumentParser(description=description, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--host",
+        default=os.environ.get("JAMF_WEBHOOK_HOST", "127.0.0.1"),
+        help="Address to listen on, any other than a loopback address needs JAMF_WEBHOOK_USERNAME and "
+        "JAMF_WEBHOOK_PASSWORD (default: JAMF_WEBHOOK_HOST or 127.0.0.1)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=int(os.environ.get("JAMF_WEBHOOK_PORT", 8080)),
+        help="Port to listen on (default: JAMF_WEBHOOK_PORT or 8080)",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=None,
+        help="Seconds without a new event before a device is updated (default: JAMF_WEBHOOK_DEBOUNCE_SECONDS or 30)",
+    )
+    parser.add_argument(
+        "--max-delay",
+        type=float,
+        default=None,
+        help="Most seconds a device waits after its first event (default: JAMF_WEBHOOK_MAX_DELAY_SECONDS or 300)",
+    )
+    add_profile_arguments(parser)
+    # A webhook is about one device, so the receiver never runs as a shard
+    parser.set_defaults(shard=None)
+    return _configure(parser.parse_args(argv))
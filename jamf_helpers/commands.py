@@ -0,0 +1,82 @@
+"""
+Sends Classic API MDM commands to many mobile devices in chunks, and waits for them to take effect.
+
+The Classic API puts the device IDs of a command in the URL, e.g. /mobiledevicecommands/command/UnmanageDevice/id/1,2,3,
+so a command for a few thousand devices is rejected for being too long, or times out. send_in_chunks() splits the IDs
+into chunks of JAMF_COMMAND_CHUNK_SIZE (default 250) and sends them in parallel. A chunk that Jamf throttles or fails
+with a server error is retried with backoff, and a chunk rejected for its URL length is split in half and sent again.
+It reports which devices the command was sent to and which it wasn't.
+
+wait_until_unmanaged() then polls the Classic mobile device list, one request for the whole fleet each time, until
+every device reports as unmanaged or the time runs out, and returns the devices still pending.
+"""
+
+from jamf_helpers.listing import iter_mobile_devices
+from jamf_helpers.ratelimit import backoff, retry_after, status_code, THROTTLE_STATUSES
+from jamf_helpers.workers import run_concurrently
+from jps_api_wrapper.request_builder import RequestTimedOut
+import logging
+import os
+import requests
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 250
+MAX_RETRIES = 5
+# Jamf, or the proxy in front of it, rejected the URL for being too long
+URL_TOO_LONG = 414
+
+
+def chunked(ids, size):
+    return [ids[start:start + size] for start in range(0, len(ids), size)]
+
+
+def send_chunk(classic, command, ids, retries=MAX_RETRIES):
+    # Send a command to one chunk of devices, returns (IDs sent, IDs failed, error messages)
+    attempt = 0
+    while True:
+        try:
+            classic.create_mobile_device_command(command, ids)
+            return ids, [], []
+        # The wrapper raises RequestTimedOut for a 502, status_code() reports it as one
+        except (requests.exceptions.HTTPError, requests.exceptions.ConnectionError, requests.exceptions.Timeout, RequestTimedOut) as err:
+            status = status_code(err)
+            if status == URL_TOO_LONG and len(ids) > 1:
+                # Split the chunk and send each half on its own
+                middle = len(ids) // 2
+                logger.info(f"{command} URL too long for {len(ids)} devices, splitting the chunk")
+                first = send_chunk(classic, command, ids[:middle], retries)
+                second = send_chunk(classic, command, ids[middle:], retries)
+                return first[0] + second[0], first[1] + second[1], first[2] + second[2]
+            retryable = status is None or status in THROTTLE_STATUSES or status >= 500
+            if not retryable or attempt >= retries:
+                return [], ids, [f"{command} failed for IDs {ids[0]}-{ids[-1]}: {err}"]
+            delay = backoff(attempt, retry_after(err))
+            logger.info(f"{command} got {status or type(err).__name__} for IDs {ids[0]}-{ids[-1]}, retrying in {delay:.1f} seconds")
+            time.sleep(delay)
+            attempt += 1
+
+
+def send_in_chunks(classic, command, ids, chunk_size=None, workers=None):
+    # Send a command to every device, a chunk at a time with chunks sent in parallel
+    # Yields (chunk, (IDs sent, IDs failed, error messages), unexpected error) for each chunk in order
+    chunk_size = chunk_size or int(os.environ.get("JAMF_COMMAND_CHUNK_SIZE", DEFAULT_CHUNK_SIZE))
+    chunks = [{"id": f"{chunk[0]}-{chunk[-1]}", "ids": chunk} for chunk in chunked(list(ids), chunk_size)]
+    return run_concurrently(lambda chunk: send_chunk(classic, command, chunk["ids"]), chunks, workers)
+
+
+def wait_until_unmanaged(classic, ids, timeout, interval=60):
+    # Poll until every device reports as unmanaged, or timeout seconds have passed
+    # Returns the IDs still reporting as managed
+    pending = {int(device_id) for device_id in ids}
+    deadline = time.monotonic() + timeout
+    while pending:
+        # Always ask Jamf, a listing from the response cache would still show the devices as managed
+        managed = {device.id for device in iter_mobile_devices(classic, fresh=True) if device.managed}
+        pending &= managed
+        print(f"{len(ids) - len(pending)} of {len(ids)} devices report as unmanaged")
+        if not pending or time.monotonic() + interval > deadline:
+            break
+        time.sleep(interval)
+    return sorted(pending)
@@ -0,0 +1,49 @@
+"""
+Works out the latest macOS a Mac supports from its Model Identifier.
+
+The rules live in data/macos_compatibility.json, newest macOS first, so supporting a new macOS release is a
+change to that file and not to the code. Bump "version" in the file whenever the rules change.
+The regexes are compiled once when the rules are loaded, and results are cached per Model Identifier,
+since a fleet only has a few hundred different models.
+
+The regex for each macOS has been helpfully compiled and updated by TalkingMoose: https://gist.github.com/talkingmoose
+"""
+
+from jamf_helpers.profiling import profiled
+from functools import lru_cache
+import json
+import os
+import re
+
+# Set JAMF_MACOS_RULES to the path of another rules file to use it instead of the one shipped here
+RULES_FILE = os.environ.get(
+    "JAMF_MACOS_RULES", os.path.join(os.path.dirname(__file__), "data", "macos_compatibility.json")
+)
+# Only a few hundred Model Identifiers exist, so this is plenty to cache all of them
+CACHE_SIZE = 1024
+
+
+def load_rules(path=RULES_FILE):
+    # Load the rules file and compile each regex once
+    # Returns the rules version, the list of (name, compiled regex), the value for a missing model and the fallback value
+    with open(path) as f:
+        data = json.load(f)
+    rules = [(rule["name"], re.compile(rule["pattern"])) for rule in data["rules"]]
+    return data["version"], rules, data["missing"], data["fallback"]
+
+
+RULES_VERSION, RULES, MISSING, FALLBACK = load_rules()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+@profiled("classify")
+def latest_supported_macos(model):
+    # Get the latest supported version of macOS for a Model Identifier, e.g. "MacBookPro18,1"
+    # Jamf reports modelIdentifier as "null" if it is blank
+    if model is None:
+        return MISSING
+    # The rules are ordered newest macOS first, so the first match is the latest supported macOS
+    for name, regex in RULES:
+        if regex.search(model):
+            return name
+    return FALLBACK
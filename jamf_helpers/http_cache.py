@@ -0,0 +1,274 @@
+"""
+Disk-backed cache for the slowly changing Jamf data that several scripts in one job read again and again.
+
+The scripts in a workflow job each read the same static group membership, device listings, sites and Extension
+Attribute definitions. Set JAMF_HTTP_CACHE to the path of a SQLite file (e.g. in $RUNNER_TEMP) and the shared
+session (see session.py) serves repeated GETs of those endpoints from the file instead of asking Jamf again.
+
+Only GETs of the endpoints in TTLS are cached, each for its own time to live. Once an entry is older than its TTL
+it is revalidated with If-None-Match / If-Modified-Since when Jamf sent an ETag or Last-Modified header, so an
+unchanged response costs a 304 instead of the whole body, and is fetched again otherwise. A successful PUT, POST,
+PATCH or DELETE drops every cached response from the same collection, e.g. updating /JSSResource/computers/id/5
+drops the cached /JSSResource/computers listing, so a script never reads back its own stale data. Sending an MDM
+command also drops the device listings and groups, since the command changes what they report.
+
+A request sent with a "Cache-Control: no-cache" header, like the polling in commands.wait_until_unmanaged(), always
+goes to Jamf, and its response replaces the cached one. Cached responses are keyed by the Jamf URL and API client
+as well as the request, so clients with different privileges never see each other's responses.
+
+The file is kept under JAMF_HTTP_CACHE_MAX_MB (default 200) by dropping the least recently used responses first.
+Set JAMF_HTTP_CACHE_TTL_SECONDS to use one TTL for every cached endpoint, 0 to always revalidate.
+Responses served from the cache aren't counted in the run metrics, since they never reached Jamf.
+
+Responses are stored without the Authorization header, but they hold inventory data, so point JAMF_HTTP_CACHE at
+a temporary path that is never cached or uploaded, like JAMF_TOKEN_CACHE.
+"""
+
+from jamf_helpers.metrics import endpoint_name
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib.parse import urlsplit
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import requests
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = os.environ.get("JAMF_HTTP_CACHE")
+MAX_BYTES = int(float(os.environ.get("JAMF_HTTP_CACHE_MAX_MB", 200)) * 1e6)
+TTL_OVERRIDE = os.environ.get("JAMF_HTTP_CACHE_TTL_SECONDS")
+
+# Endpoints worth caching and how many seconds a response stays fresh, matched against the URL path
+TTLS = [
+    # Static group membership and the device listings
+    (re.compile(r"/JSSResource/(computergroups|mobiledevicegroups)(/id/\d+)?"), 15 * 60),
+    (re.compile(r"/JSSResource/(computers|mobiledevices)(/subset/basic)?"), 15 * 60),
+    # Sites and Extension Attribute definitions hardly ever change
+    (re.compile(r"/JSSResource/sites(/id/\d+)?"), 6 * 60 * 60),
+    (re.compile(r"/api/v1/sites"), 6 * 60 * 60),
+    (re.compile(r"/JSSResource/(computerextensionattributes|mobiledeviceextensionattributes)(/id/\d+)?"), 6 * 60 * 60),
+    (re.compile(r"/api/v1/computer-extension-attributes(/\d+)?"), 6 * 60 * 60),
+]
+
+# Collections whose cached responses a write to another collection makes stale
+RELATED_COLLECTIONS = {
+    "mobiledevicecommands": ("mobiledevices", "mobiledevicegroups"),
+    "computercommands": ("computers", "computergroups"),
+}
+
+# Headers that describe the body as Jamf sent it, not the decoded body the cache stores
+_TRANSFER_HEADERS = ("content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+
+def ttl_for(url):
+    # Seconds a response from url stays fresh, None if the endpoint isn't cached
+    path = urlsplit(url).path
+    for pattern, ttl in TTLS:
+        if pattern.fullmatch(path):
+            return float(TTL_OVERRIDE) if TTL_OVERRIDE else ttl
+    return None
+
+
+def _collection(url):
+    # The collection a URL belongs to, e.g. https://jamf/JSSResource/computers for .../JSSResource/computers/id/5
+    parts = urlsplit(url)
+    segments = parts.path.split("/")
+    depth = 4 if len(segments) > 2 and segments[1] == "api" else 3
+    return f"{parts.scheme}://{parts.netloc}{'/'.join(segments[:depth])}"
+
+
+def _stale_collections(url):
+    # Every collection a successful write to url makes stale
+    collection = _collection(url)
+    parent, _, name = collection.rpartition("/")
+    return [collection] + [f"{parent}/{related}" for related in RELATED_COLLECTIONS.get(name, ())]
+
+
+class ResponseCache:
+    """
+    SQLite store of GET responses, evicting the least recently used over max_bytes. Safe to share between
+    worker threads, and between scripts run one after the other.
+
+    :param path: Path of the SQLite database file, it is created if it doesn't exist
+    :param max_bytes: Largest total size of the cached bodies
+    """
+
+    def __init__(self, path, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def get(self, key):
+        # Returns the cached entry and marks it as just used, or None
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT headers, body, expires FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row
+
+    def put(self, key, url, headers, body, expires):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, url, json.dumps(headers), body, len(body), expires, time.time()),
+            )
+            self._evict()
+
+    def refresh(self, key, expires):
+        # Jamf confirmed the cached response is still current
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE responses SET expires = ?, last_used = ? WHERE key = ?", (expires, time.time(), key))
+
+    def invalidate(self, url):
+        # Drop every cached response from the collection url belongs to, and from the collections it affects
+        with self._lock, self._conn:
+            for collection in _stale_collections(url):
+                self._conn.execute(
+                    "DELETE FROM responses WHERE url = ? OR url LIKE ? OR url LIKE ?",
+                    (collection, f"{collection}/%", f"{collection}?%"),
+                )
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _RecordingReader:
+    # Wraps a response's raw stream and hands the whole decoded body to on_complete once it has been read to the end,
+    # so a streamed listing is still streamed to the script while it is cached
+    def __init__(self, raw, on_complete):
+        self._raw = raw
+        self._on_complete = on_complete
+        self._chunks = []
+
+    def stream(self, amt=2 ** 16, decode_content=None):
+        for chunk in self._raw.stream(amt, decode_content=True):
+            self._chunks.append(chunk)
+            yield chunk
+        self._complete()
+
+    def read(self, amt=None, decode_content=None, **kwargs):
+        data = self._raw.read(amt, decode_content=True, **kwargs)
+        self._chunks.append(data)
+        if amt is None or not data:
+            self._complete()
+        return data
+
+    def _complete(self):
+        if self._chunks is not None:
+            body, self._chunks = b"".join(self._chunks), None
+            self._on_complete(body)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class CachingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that answers GETs of the endpoints in TTLS from a ResponseCache.
+
+    :param cache: ResponseCache to keep the responses in
+    :param scope: Who the responses are for, e.g. the Jamf URL and API client, part of every cache key
+    """
+
+    def __init__(self, cache, scope="", **kwargs):
+        self.cache = cache
+        self.scope = scope
+        super().__init__(**kwargs)
+
+    def send(self, request, stream=False, **kwargs):
+        ttl = ttl_for(request.url) if request.method == "GET" else None
+        if ttl is None:
+            response = super().send(request, stream=stream, **kwargs)
+            if request.method != "GET" and response.status_code < 400:
+                self.cache.invalidate(request.url)
+            return response
+
+        key = hashlib.sha256(f"{self.scope}|{request.url}|{request.headers.get('Accept', '')}".encode()).hexdigest()
+        # no-cache asks for what Jamf has right now, the response still replaces the cached one
+        entry = None if "no-cache" in request.headers.get("Cache-Control", "") else self.cache.get(key)
+        if entry is not None and entry["expires"] > time.time():
+            return self._cached(request, entry)
+        if entry is not None:
+            # Ask Jamf whether the cached response is still current
+            headers = json.loads(entry["headers"])
+            if "ETag" in headers:
+                request.headers["If-None-Match"] = headers["ETag"]
+            if "Last-Modified" in headers:
+                request.headers["If-Modified-Since"] = headers["Last-Modified"]
+
+        response = super().send(request, stream=stream, **kwargs)
+        if entry is not None and response.status_code == 304:
+            response.close()
+            self.cache.refresh(key, time.time() + ttl)
+            return self._cached(request, entry)
+        if response.status_code == 200:
+            headers = {name: value for name, value in response.headers.items() if name.lower() not in _TRANSFER_HEADERS}
+            store = lambda body: self.cache.put(key, request.url, headers, body, time.time() + ttl)
+            response.raw = _RecordingReader(response.raw, store)
+        return response
+
+    def _cached(self, request, entry):
+        # Build the response Jamf would have sent from the cache
+        logger.info(f"Served {endpoint_name(request.method, request.url)} from the response cache")
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.headers = CaseInsensitiveDict(json.loads(entry["headers"]))
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = io.BytesIO(entry["body"])
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.from_cache = True
+        return response
+
+
+def caching_adapter(path=CACHE_PATH, scope="", **kwargs):
+    # An HTTPAdapter for a session, caching responses in path, or a plain HTTPAdapter if path is None
+    if not path:
+        return HTTPAdapter(**kwargs)
+    return CachingAdapter(ResponseCache(path), scope=scope, **kwargs)
+
+
+def install(client, path=CACHE_PATH, scope=None):
+    # Cache the responses of a Classic or Pro client that wasn't made with session.connect()
+    # Pass scope, e.g. the API client ID, if clients with different privileges share the cache file
+    adapter = caching_adapter(path, scope=client.base_url if scope is None else scope)
+    client.session.mount("https://", adapter)
+    client.session.mount("http://", adapter)
+    return client
@@ -0,0 +1,62 @@
+"""
+Helpers for reading computer inventory from the Jamf Pro API in bulk.
+
+Instead of requesting one computer at a time, the computers-inventory list endpoint is read a page at a time,
+so a sweep over N computers only costs about N / page_size requests.
+"""
+
+from jamf_helpers.profiling import profiled
+
+# The largest page size the computers-inventory endpoint will accept
+DEFAULT_PAGE_SIZE = 2000
+
+
+def iter_computer_inventory_pages(pro, section=("GENERAL",), page_size=DEFAULT_PAGE_SIZE, filter=None):
+    # Yield computer inventory records one page (list of records) at a time
+    # Sort by ID so the pages don't shift underneath us while we walk through them
+    page = 0
+    while True:
+        response = pro.get_computer_inventories(
+            section=list(section), page=page, page_size=page_size, sort=["id:asc"], filter=filter
+        )
+        results = response["results"]
+        if not results:
+            return
+        yield results
+        # Stop once we've seen every record Jamf says it has
+        if (page + 1) * page_size >= response["totalCount"]:
+            return
+        page += 1
+
+
+def iter_computer_inventory(pro, section=("GENERAL",), page_size=DEFAULT_PAGE_SIZE, filter=None):
+    # Yield computer inventory records one at a time, reading them from Jamf a page at a time
+    for results in iter_computer_inventory_pages(pro, section, page_size, filter):
+        yield from results
+
+
+def extension_attribute_value(extension_attributes, definition_id, id_key="definitionId", value_key="values"):
+    # Extension attributes come back as a list of dictionaries, so look for the right one to get its value
+    # Returns a blank string if the extension attribute isn't set for this device
+    for extension_attribute in extension_attributes:
+        if str(extension_attribute[id_key]) == str(definition_id):
+            values = extension_attribute[value_key]
+            # Values are a list, e.g. ["Main Campus"], flatten it to the text shown in Jamf
+            if isinstance(values, list):
+                return ", ".join(str(value) for value in values)
+            return "" if values is None else str(values)
+    return ""
+
+
+@profiled("ea_lookup")
+def all_extension_attribute_values(record):
+    # Get every extension attribute value on a computer inventory record as {definitionId: value}
+    # Extension attributes show up in whichever section they are displayed in (general, operatingSystem, ...)
+    # or in the top level extensionAttributes list
+    values = {}
+    sections = [record] + [section for section in record.values() if isinstance(section, dict)]
+    for section in sections:
+        for extension_attribute in section.get("extensionAttributes") or []:
+            definition_id = str(extension_attribute["definitionId"])
+            values[definition_id] = extension_attribute_value([extension_attribute], definition_id)
+    return values
@@ -0,0 +1,99 @@
+"""
+Append-only progress journal so a long sweep can pick up where it left off.
+
+Every finished device is appended to the journal as soon as its result is reported, one JSON line with its ID and
+outcome (unchanged, updated or error), and the file is flushed so the line survives the job being killed at its
+timeout. Running a script with --resume reads the journal back and skips every device already finished in the
+current sweep, so a sweep over a large fleet can be spread over several job runs. Devices that ended in an error
+are tried again. Running without --resume starts a new sweep with an empty journal.
+
+In GitHub Actions, keep the journal between job runs with actions/cache or an artifact.
+"""
+
+from datetime import datetime, timezone
+import json
+import os
+
+JOURNAL_VERSION = 1
+
+
+def journal_path(script):
+    # Default journal file for a script, e.g. Action-Jamf_Pro_API-UnmanageComputers.journal.jsonl
+    return os.environ.get("JAMF_JOURNAL") or f"{os.path.splitext(os.path.basename(script))[0]}.journal.jsonl"
+
+
+def read_journal(path):
+    # Read a journal back, returns (header, {device ID: last outcome}), or (None, {}) if it isn't a journal
+    outcomes = {}
+    with open(path) as f:
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            return None, outcomes
+        if header.get("journal") != JOURNAL_VERSION:
+            return None, outcomes
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # The last line may be cut off if the job was killed while writing it
+                continue
+            outcomes[str(entry["id"])] = entry["outcome"]
+    return header, outcomes
+
+
+def _ends_with_newline(path):
+    # True if the file is empty or its last byte is a newline
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+class Journal:
+    """
+    Records the outcome of each device finished in the current sweep.
+
+    :param path: Path of the journal file
+    :param script: Name of the script doing the sweep, a journal from another script is never resumed
+    :param resume: Continue the sweep recorded in the journal instead of starting a new one
+    """
+
+    def __init__(self, path, script, resume=False):
+        self.path = path
+        self.outcomes = {}
+        self.sweep = None
+        if resume and os.path.exists(path):
+            self._load(script)
+        if self.sweep is None:
+            # Start a new sweep with an empty journal
+            self.sweep = datetime.now(timezone.utc).isoformat()
+            with open(path, "w") as f:
+                f.write(json.dumps({"journal": JOURNAL_VERSION, "script": script, "sweep": self.sweep}) + "\n")
+        self._file = open(path, "a")
+        if not _ends_with_newline(path):
+            # The job was killed part way through a line, end it so the next record starts on a line of its own
+            self._file.write("\n")
+            self._file.flush()
+
+    def _load(self, script):
+        header, outcomes = read_journal(self.path)
+        if header is None or header.get("script") != script:
+            return
+        self.sweep = header["sweep"]
+        self.outcomes = outcomes
+
+    def done(self, device_id):
+        # A device is done if it finished without an error earlier in this sweep
+        outcome = self.outcomes.get(str(device_id))
+        return outcome is not None and outcome != "error"
+
+    def record(self, device_id, outcome):
+        self.outcomes[str(device_id)] = outcome
+        self._file.write(json.dumps({"id": str(device_id), "outcome": outcome}) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
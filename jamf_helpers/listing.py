@@ -0,0 +1,150 @@
+"""
+Streams the Classic API device listings instead of loading them whole.
+
+classic.get_computers()["computers"] downloads the whole listing, decodes it into one big nested structure, and only
+then hands back the first device. The iter_ functions here ask for the listing as XML with a streamed response,
+parse it incrementally with XMLPullParser, and yield each device as a small dictionary as soon as its element is
+complete, so the workers can start on the first devices while the rest is still downloading.
+
+The listing request goes through the client's rate limiter and is retried when Jamf throttles it, like any other
+get_ call. The response is read on a background thread, so a short pause in the consumer doesn't stall the
+connection. Parsed devices wait in a queue of at most MAX_QUEUED_BATCHES chunks' worth, so when the workers are
+slower than the download the parser waits for them instead of holding the rest of the listing in memory. Each
+element is dropped from the XML tree once it has been turned into a dictionary.
+
+iter_classic_list() yields each entry as a dictionary. Values come back as strings, except "id" which is an int and
+true/false which are bools, matching the JSON listings. The iter_ functions for devices turn each entry into a
+DeviceRecord, see records.py.
+"""
+
+from jamf_helpers.profiling import phase
+from jamf_helpers.ratelimit import ThrottledClient
+from jamf_helpers.records import from_listing
+from jps_api_wrapper.request_builder import RequestBuilder
+import queue
+import threading
+import xml.etree.ElementTree as ET
+
+# Bytes read from the response at a time
+CHUNK_SIZE = 64 * 1024
+# Parsed chunks waiting to be used before the parser stops reading, about a MB of listing
+MAX_QUEUED_BATCHES = 16
+
+_DONE = object()
+
+
+def _value(element):
+    if len(element):
+        return {child.tag: _value(child) for child in element}
+    text = element.text or ""
+    if text in ("true", "false"):
+        return text == "true"
+    if element.tag == "id" and text.lstrip("-").isdigit():
+        return int(text)
+    return text
+
+
+def _parse(response, list_tag, item_tag, put, stop):
+    # Parse the streamed XML, calling put() with a list of the items, as dictionaries, completed by each chunk
+    # Items are the item_tag elements directly inside a list_tag element
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack = []
+    for chunk in response.iter_content(CHUNK_SIZE):
+        if stop.is_set():
+            return
+        with phase("decode"):
+            parser.feed(chunk)
+            batch = []
+            for event, element in parser.read_events():
+                if event == "start":
+                    stack.append(element)
+                    continue
+                stack.pop()
+                if element.tag == item_tag and stack and stack[-1].tag == list_tag:
+                    batch.append(_value(element))
+                    # Drop the finished element so the tree doesn't grow with the listing
+                    stack[-1].remove(element)
+        if batch:
+            put(batch)
+    parser.close()
+
+
+def _open_listing(classic, endpoint, headers):
+    # Send the listing request and check its status, the body is left to be streamed
+    response = classic.session.get(classic.base_url + endpoint, headers=headers, stream=True)
+    try:
+        RequestBuilder._raise_recognized_errors(response)
+        response.raise_for_status()
+    except Exception:
+        response.close()
+        raise
+    return response
+
+
+def iter_classic_list(classic, endpoint, list_tag, item_tag, fresh=False):
+    # Yield each item in a Classic API listing as it is parsed, e.g. every <computer> inside <computers>
+    # fresh skips the response cache (see http_cache.py), for when the listing is polled for a change
+    headers = {"Accept": "application/xml"}
+    if fresh:
+        headers["Cache-Control"] = "no-cache"
+    open_listing = _open_listing
+    if isinstance(classic, ThrottledClient):
+        # Throttled and retried like the get_ method it replaces, the limiter slot is held until the headers arrive
+        open_listing = classic.throttled("get_listing", _open_listing)
+    with phase("listing"):
+        response = open_listing(classic, endpoint, headers)
+
+    batches = queue.Queue(maxsize=MAX_QUEUED_BATCHES)
+    stop = threading.Event()
+
+    def put(batch):
+        # Wait for room in the queue, giving up if the caller stopped early
+        while not stop.is_set():
+            try:
+                batches.put(batch, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def read():
+        try:
+            with phase("listing"):
+                _parse(response, list_tag, item_tag, put, stop)
+            put(_DONE)
+        except BaseException as err:
+            put(err)
+        finally:
+            response.close()
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    try:
+        while True:
+            batch = batches.get()
+            if batch is _DONE:
+                return
+            if isinstance(batch, BaseException):
+                raise batch
+            yield from batch
+    finally:
+        # Stop reading if the caller stopped early
+        stop.set()
+
+
+def iter_computers(classic):
+    return map(from_listing, iter_classic_list(classic, "/JSSResource/computers", "computers", "computer"))
+
+
+def iter_mobile_devices(classic, fresh=False):
+    endpoint = "/JSSResource/mobiledevices"
+    return map(from_listing, iter_classic_list(classic, endpoint, "mobile_devices", "mobile_device", fresh))
+
+
+def iter_computer_group(classic, group_id):
+    endpoint = f"/JSSResource/computergroups/id/{group_id}"
+    return map(from_listing, iter_classic_list(classic, endpoint, "computers", "computer"))
+
+
+def iter_mobile_device_group(classic, group_id):
+    endpoint = f"/JSSResource/mobiledevicegroups/id/{group_id}"
+    return map(from_listing, iter_classic_list(classic, endpoint, "mobile_devices", "mobile_device"))
@@ -0,0 +1,179 @@
+"""
+Combines the journals and metrics written by every shard of a sweep into one summary, see shard.py.
+
+Usage: python3 -m jamf_helpers.merge_shards [--metrics-json FILE] [--prom FILE] PATH...
+
+Each PATH is a journal (*.journal.jsonl), a metrics report (*.metrics.json), or a directory searched for both,
+e.g. the directory the shard artifacts were downloaded to. The summary counts the devices each script left
+unchanged, updated or in error across every shard, and adds up the Jamf API calls by endpoint. It's printed and,
+in GitHub Actions, added to the step summary. Latency percentiles are estimated from the shards' histogram
+buckets, so they are the upper bound of the bucket the percentile falls in rather than an exact value.
+"""
+
+from collections import Counter, defaultdict
+from jamf_helpers.journal import read_journal
+from jamf_helpers.metrics import BUCKETS, _write_atomically, prometheus_text_for, summary_table
+import argparse
+import json
+import os
+
+# Most error device IDs to list per script in the summary
+ERROR_IDS_SHOWN = 50
+
+
+def find_files(paths):
+    # Every journal and metrics report in paths, searching directories
+    journals, reports = [], []
+    for path in paths:
+        if os.path.isdir(path):
+            candidates = [
+                os.path.join(directory, name)
+                for directory, _, names in os.walk(path)
+                for name in sorted(names)
+            ]
+        else:
+            candidates = [path]
+        for candidate in candidates:
+            if candidate.endswith(".journal.jsonl"):
+                journals.append(candidate)
+            elif candidate.endswith(".metrics.json"):
+                reports.append(candidate)
+    return journals, reports
+
+
+def merge_journals(paths):
+    # {script: {"shards": count, "outcomes": Counter, "errors": [device IDs]}}
+    scripts = defaultdict(lambda: {"shards": 0, "outcomes": Counter(), "errors": []})
+    for path in paths:
+        header, outcomes = read_journal(path)
+        if header is None:
+            print(f"Skipping {path}, it isn't a journal")
+            continue
+        merged = scripts[header["script"]]
+        merged["shards"] += 1
+        merged["outcomes"].update(outcomes.values())
+        merged["errors"].extend(device_id for device_id, outcome in outcomes.items() if outcome == "error")
+    return scripts
+
+
+def estimated_percentile(bucket_counts, requests, fraction, maximum):
+    # Upper bound of the histogram bucket the percentile falls in, the slowest latency if it's past the last bucket
+    if not requests:
+        return 0.0
+    rank = fraction * requests
+    for bound, count in zip(BUCKETS, bucket_counts):
+        if count >= rank:
+            return min(bound, maximum)
+    return maximum
+
+
+def merge_endpoints(reports):
+    # Add up the endpoint metrics of several reports from the same script
+    endpoints, buckets = {}, {}
+    for report in reports:
+        for endpoint, data in report["endpoints"].items():
+            merged = endpoints.setdefault(endpoint, {
+                "requests": 0,
+                "statuses": Counter(),
+                "retries": 0,
+                "bytes": 0,
+                "latency_seconds": {"total": 0.0, "max": 0.0},
+            })
+            merged["requests"] += data["requests"]
+            merged["statuses"].update(data["statuses"])
+            merged["retries"] += data["retries"]
+            merged["bytes"] += data["bytes"]
+            merged["latency_seconds"]["total"] += data["latency_seconds"]["total"]
+            merged["latency_seconds"]["max"] = max(merged["latency_seconds"]["max"], data["latency_seconds"]["max"])
+            counts = report.get("buckets", {}).get(endpoint, [0] * len(BUCKETS))
+            buckets[endpoint] = [a + b for a, b in zip(buckets.get(endpoint, [0] * len(BUCKETS)), counts)]
+    for endpoint, merged in endpoints.items():
+        merged["statuses"] = {status: count for status, count in sorted(merged["statuses"].items())}
+        latency = merged["latency_seconds"]
+        for name, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+            latency[name] = estimated_percentile(buckets[endpoint], merged["requests"], fraction, latency["max"])
+    return endpoints, buckets
+
+
+def merge_reports(paths):
+    # {script: merged report}, reports from every shard of a script added together
+    by_script = defaultdict(list)
+    for path in paths:
+        with open(path) as f:
+            report = json.load(f)
+        by_script[report["script"]].append(report)
+    merged = {}
+    for script, reports in by_script.items():
+        endpoints, buckets = merge_endpoints(reports)
+        merged[script] = {
+            "script": script,
+            "shards": sorted(report.get("shard") or "1/1" for report in reports),
+            "started": min(report["started"] for report in reports),
+            # The shards run side by side, so the sweep took as long as the slowest shard
+            "wall_seconds": max(report["wall_seconds"] for report in reports),
+            "requests": sum(endpoint["requests"] for endpoint in endpoints.values()),
+            "endpoints": endpoints,
+            "buckets": buckets,
+        }
+    return merged
+
+
+def summary(journals, reports):
+    # Markdown summary of the whole sweep
+    lines = ["## Sharded sweep", ""]
+    if journals:
+        lines += [
+            "| Script | Shards | Unchanged | Updated | Errors |",
+            "| --- | ---: | ---: | ---: | ---: |",
+        ]
+        for script, merged in sorted(journals.items()):
+            outcomes = merged["outcomes"]
+            lines.append(
+                f"| {script} | {merged['shards']} | {outcomes['unchanged']} | {outcomes['updated']} | {outcomes['error']} |"
+            )
+        for script, merged in sorted(journals.items()):
+            errors = sorted(merged["errors"], key=lambda device_id: (len(device_id), device_id))
+            if errors:
+                shown = ", ".join(errors[:ERROR_IDS_SHOWN])
+                more = f" and {len(errors) - ERROR_IDS_SHOWN} more" if len(errors) > ERROR_IDS_SHOWN else ""
+                lines += ["", f"{script} errors for JSS IDs: {shown}{more}"]
+    for script, report in sorted(reports.items()):
+        lines += [
+            "",
+            f"{script}: {report['requests']} requests over {len(report['shards'])} shards, "
+            f"slowest shard took {report['wall_seconds']:.0f}s",
+        ]
+        lines.append(summary_table(report["endpoints"]))
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Combine the journals and metrics of every shard of a sweep")
+    parser.add_argument("paths", nargs="+", help="Journal or metrics files, or directories holding them")
+    parser.add_argument("--metrics-json", help="Write the merged metrics to this JSON file")
+    parser.add_argument("--prom", help="Write the merged metrics to this Prometheus textfile")
+    args = parser.parse_args(argv)
+
+    journal_files, report_files = find_files(args.paths)
+    if not journal_files and not report_files:
+        parser.exit(1, "No journals or metrics reports found\n")
+    journals = merge_journals(journal_files)
+    reports = merge_reports(report_files)
+
+    text = summary(journals, reports)
+    print(text)
+    # Add the summary to the GitHub Actions job summary
+    if os.environ.get("GITHUB_STEP_SUMMARY"):
+        with open(os.environ["GITHUB_STEP_SUMMARY"], "a") as f:
+            f.write(text)
+    if args.metrics_json:
+        with open(args.metrics_json, "w") as f:
+            json.dump(reports, f, indent=2)
+    if args.prom:
+        _write_atomically(args.prom, prometheus_text_for([
+            (script, report["endpoints"], report["buckets"]) for script, report in sorted(reports.items())
+        ]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Per-endpoint metrics for every Jamf API call, written out as run reports at the end of a script.
+
+instrument() adds a response hook to the shared session (connect() does this), so every request to Jamf is
+counted by endpoint, e.g. "GET /api/v1/computers-inventory-detail/{id}", with:
+- number of requests and a breakdown by status code
+- latency, as p50/p95/p99 and a Prometheus histogram (time until Jamf sent the response headers)
+- bytes received
+- retries, which ThrottledClient marks with set_attempt()
+
+write_reports() writes the metrics to a JSON file, a Prometheus textfile (for the node_exporter textfile
+collector), and a table of the slowest endpoints to the GitHub Actions step summary when GITHUB_STEP_SUMMARY is set.
+Set JAMF_METRICS_JSON and JAMF_METRICS_PROM to choose the file paths, or set either to an empty string to skip it.
+When the script runs as one shard of a sweep, the shard is added to both file names (see shard.py).
+"""
+
+from array import array
+from jamf_helpers.shard import active_shard, sharded_path
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+import json
+import math
+import os
+import re
+import threading
+import time
+
+# Upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Most endpoints to show in the GitHub summary table, slowest first
+SUMMARY_ROWS = 15
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+_ID_LIST_SEGMENT = re.compile(r"/\d+(,\d+)+(?=/|$)")
+
+_attempt = threading.local()
+
+
+def set_attempt(attempt):
+    # Mark the requests the current thread sends next as attempt number attempt of an API call, 0 for the first try
+    _attempt.value = attempt
+
+
+def endpoint_name(method, url):
+    # Group requests by endpoint, replacing device IDs in the path so every device counts as the same endpoint
+    path = urlsplit(url).path
+    path = _ID_LIST_SEGMENT.sub("/{ids}", path)
+    path = _ID_SEGMENT.sub("/{id}", path)
+    return f"{method} {path}"
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    # The smallest value with at least fraction of the values at or below it
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.statuses = Counter()
+        self.latencies = array("d")
+        self.bytes = 0
+        self.retries = 0
+
+    @property
+    def requests(self):
+        return sum(self.statuses.values())
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+            "retries": self.retries,
+            "bytes": self.bytes,
+            "latency_seconds": {
+                "total": sum(latencies),
+                "p50": percentile(latencies, 0.50),
+                "p95": percentile(latencies, 0.95),
+                "p99": percentile(latencies, 0.99),
+                "max": latencies[-1] if latencies else 0.0,
+            },
+        }
+
+
+class Metrics:
+    """
+    Collects request metrics by endpoint. Safe to share between worker threads.
+    """
+
+    def __init__(self):
+        self.endpoints = defaultdict(EndpointMetrics)
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def record_response(self, response, **kwargs):
+        # requests response hook, records one response
+        if getattr(response, "from_cache", False):
+            # Served from JAMF_HTTP_CACHE, it never reached Jamf
+            return response
+        endpoint = endpoint_name(response.request.method, response.request.url)
+        if kwargs.get("stream"):
+            # Reading a streamed body here would defeat streaming, and chunked listings have no Content-Length,
+            # so count the bytes as the script reads them
+            size = 0
+            response.raw = _CountingReader(response.raw, lambda count: self._add_bytes(endpoint, count))
+        else:
+            size = len(response.content)
+        retry = getattr(_attempt, "value", 0) > 0
+        with self._lock:
+            metrics = self.endpoints[endpoint]
+            metrics.statuses[response.status_code] += 1
+            metrics.latencies.append(response.elapsed.total_seconds())
+            metrics.bytes += size
+            if retry:
+                metrics.retries += 1
+        return response
+
+    def _add_bytes(self, endpoint, count):
+        with self._lock:
+            self.endpoints[endpoint].bytes += count
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {endpoint: metrics.summary() for endpoint, metrics in self.endpoints.items()}
+            buckets = {
+                endpoint: [sum(1 for latency in metrics.latencies if latency <= bound) for bound in BUCKETS]
+                for endpoint, metrics in self.endpoints.items()
+            }
+        return endpoints, buckets
+
+
+class _CountingReader:
+    # Wraps a streamed response's raw stream and reports the size of every chunk read from it
+    def __init__(self, raw, on_read):
+        self._raw = raw
+        self._on_read = on_read
+
+    def stream(self, amt=2 ** 16, decode_content=None):
+        for chunk in self._raw.stream(amt, decode_content=decode_content):
+            self._on_read(len(chunk))
+            yield chunk
+
+    def read(self, amt=None, decode_content=None, **kwargs):
+        data = self._raw.read(amt, decode_content=decode_content, **kwargs)
+        self._on_read(len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+_shared_metrics = Metrics()
+
+
+def shared_metrics():
+    # One set of metrics per script, shared by every client
+    return _shared_metrics
+
+
+def instrument(session, metrics=None):
+    # Record every response the session gets
+    session.hooks["response"].append((metrics or shared_metrics()).record_response)
+    return session
+
+
+def write_reports(script, metrics=None):
+    # Write the run's metrics to the JSON file, the Prometheus textfile and the GitHub summary
+    metrics = metrics or shared_metrics()
+    endpoints, buckets = metrics.snapshot()
+    if not endpoints:
+        return
+    stem = os.path.splitext(os.path.basename(script))[0]
+    json_path = sharded_path(os.environ.get("JAMF_METRICS_JSON", f"{stem}.metrics.json"))
+    prom_path = sharded_path(os.environ.get("JAMF_METRICS_PROM", f"{stem}.prom"))
+    shard = active_shard()
+    if json_path:
+        report = {
+            "script": script,
+            "shard": f"{shard.index}/{shard.count}" if shard else None,
+            "started": metrics.started,
+            "wall_seconds": time.time() - metrics.started,
+            "requests": sum(endpoint["requests"] for endpoint in endpoints.values()),
+            "endpoints": endpoints,
+            # Latency histogram counts for BUCKETS, so reports from several shards can be merged
+            "buckets": buckets,
+        }
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    if prom_path:
+        _write_atomically(prom_path, prometheus_text(script, endpoints, buckets))
+    summary_path = os.environ.get("GITHUB_STEP_SUMMARY")
+    if summary_path:
+        with open(summary_path, "a") as f:
+            f.write(summary_table(endpoints))
+
+
+def prometheus_text(script, endpoints, buckets):
+    # Metrics in the Prometheus text exposition format
+    return prometheus_text_for([(script, endpoints, buckets)])
+
+
+def prometheus_text_for(runs):
+    # Metrics of several scripts in one Prometheus textfile, runs is a list of (script, endpoints, buckets)
+    lines = [
+        "# HELP jamf_api_requests_total Jamf API requests by endpoint and status code.",
+        "# TYPE jamf_api_requests_total counter",
+    ]
+    for script, endpoints, buckets in runs:
+        for endpoint, data in endpoints.items():
+            for status, count in data["statuses"].items():
+                lines.append(f"jamf_api_requests_total{{{_labels(script, endpoint)},status=\"{status}\"}} {count}")
+    lines += [
+        "# HELP jamf_api_retries_total Jamf API requests that were retries of an earlier attempt.",
+        "# TYPE jamf_api_retries_total counter",
+    ]
+    for script, endpoints, buckets in runs:
+        lines += [f"jamf_api_retries_total{{{_labels(script, endpoint)}}} {data['retries']}" for endpoint, data in endpoints.items()]
+    lines += [
+        "# HELP jamf_api_response_bytes_total Bytes received from the Jamf API.",
+        "# TYPE jamf_api_response_bytes_total counter",
+    ]
+    for script, endpoints, buckets in runs:
+        lines += [f"jamf_api_response_bytes_total{{{_labels(script, endpoint)}}} {data['bytes']}" for endpoint, data in endpoints.items()]
+    lines += [
+        "# HELP jamf_api_request_duration_seconds Time until the Jamf API sent the response headers.",
+        "# TYPE jamf_api_request_duration_seconds histogram",
+    ]
+    for script, endpoints, buckets in runs:
+        for endpoint, data in endpoints.items():
+            labels = _labels(script, endpoint)
+            for bound, count in zip(BUCKETS, buckets[endpoint]):
+                lines.append(f"jamf_api_request_duration_seconds_bucket{{{labels},le=\"{bound}\"}} {count}")
+            lines.append(f"jamf_api_request_duration_seconds_bucket{{{labels},le=\"+Inf\"}} {data['requests']}")
+            lines.append(f"jamf_api_request_duration_seconds_sum{{{labels}}} {data['latency_seconds']['total']:.6f}")
+            lines.append(f"jamf_api_request_duration_seconds_count{{{labels}}} {data['requests']}")
+    return "\n".join(lines) + "\n"
+
+
+def _labels(script, endpoint):
+    def escape(value):
+        return value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'script="{escape(script)}",endpoint="{escape(endpoint)}"'
+
+
+def summary_table(endpoints):
+    # Compact Markdown table of the endpoints that took the most time in total
+    rows = sorted(endpoints.items(), key=lambda item: item[1]["latency_seconds"]["total"], reverse=True)
+    lines = [
+        "",
+        "### Jamf API calls",
+        "",
+        "| Endpoint | Requests | Non-2xx | Retries | p50 ms | p95 ms | p99 ms | Total s | MB |",
+        "| --- | ---: | ---: | ---: | ---: | ---: | ---: | ---: | ---: |",
+    ]
+    for endpoint, data in rows[:SUMMARY_ROWS]:
+        latency = data["latency_seconds"]
+        errors = sum(count for status, count in data["statuses"].items() if not status.startswith("2"))
+        lines.append(
+            f"| `{endpoint}` | {data['requests']} | {errors} | {data['retries']} | {latency['p50'] * 1000:.0f} "
+            f"| {latency['p95'] * 1000:.0f} | {latency['p99'] * 1000:.0f} | {latency['total']:.1f} | {data['bytes'] / 1e6:.1f} |"
+        )
+    if len(rows) > SUMMARY_ROWS:
+        lines.append(f"| {len(rows) - SUMMARY_ROWS} more endpoints in the metrics JSON | | | | | | | | |")
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomically(path, text):
+    # The textfile collector may read the file at any moment, so never let it see a half written file
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(text)
+    os.replace(temp_path, path)
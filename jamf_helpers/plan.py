@@ -0,0 +1,162 @@
+"""
+Two phase plan/apply support for the Action scripts.
+
+The plan phase only reads from Jamf. It works out every change that would be made and writes them to a compact
+JSON Lines plan file, one change per line (device ID, device name, field, old value, new value), so the diff can be
+reviewed. The apply phase reads the plan back and makes the changes with as many workers as allowed, without
+reading inventory again. This lets the slow read phase run off-hours and the writes run in a short window.
+
+Fields are named "managed" for the managed state or "xEA:<id>" for an Extension Attribute. Fields named
+"info:<name>", e.g. the device's site, only carry context from the read phase into the output and are never written.
+"""
+
+from collections import namedtuple
+from datetime import datetime, timezone
+from jamf_helpers.journal import Journal, journal_path
+from jamf_helpers.shard import shard_devices, sharded_path
+from jamf_helpers.results import report_results, result_sink
+from jamf_helpers.schedule import deadline_for, prioritized, stop_on_sigterm
+from jamf_helpers.workers import run_concurrently
+import json
+
+PLAN_VERSION = 1
+
+Change = namedtuple("Change", ["device_id", "name", "field", "old", "new"])
+
+
+def extension_attribute_field(definition_id):
+    return f"xEA:{definition_id}"
+
+
+def extension_attribute_id(field):
+    # Get the Extension Attribute ID back out of a field name, None if the field isn't an Extension Attribute
+    return field[len("xEA:"):] if field.startswith("xEA:") else None
+
+
+def info_field(name):
+    return f"info:{name}"
+
+
+def is_info(field):
+    # True for fields that only carry context for the output, apply never writes them
+    return field.startswith("info:")
+
+
+def write_plan(path, script, changes):
+    # Write changes to the plan file, the first line records which script made the plan and when
+    # Returns the number of changes written
+    count = 0
+    with open(path, "w") as f:
+        header = {"plan": PLAN_VERSION, "script": script, "created": datetime.now(timezone.utc).isoformat()}
+        f.write(json.dumps(header) + "\n")
+        for change in changes:
+            f.write(json.dumps(change._asdict(), separators=(",", ":")) + "\n")
+            count += 1
+    return count
+
+
+def read_plan(path, script):
+    # Read a plan file back, refusing plans made by a different script
+    with open(path) as f:
+        header = json.loads(f.readline())
+        if header.get("plan") != PLAN_VERSION or header.get("script") != script:
+            raise ValueError(f"{path} is a plan for {header.get('script')}, not {script}")
+        return [Change(**json.loads(line)) for line in f if line.strip()]
+
+
+def group_by_device(changes):
+    # Group changes by device so each device is updated once, in the order devices first appear in the plan
+    devices = {}
+    for change in changes:
+        device = devices.setdefault(str(change.device_id), {"id": change.device_id, "name": change.name, "changes": []})
+        device["changes"].append(change)
+    return list(devices.values())
+
+
+def format_change(change):
+    return f"Planned - JSS ID: {change.device_id}, Name: {change.name}, Field: {change.field}, Value: {change.new}, Previous Value: {change.old}"
+
+
+def run(args, script, devices, plan_device, apply_device, extension_attributes=(), prioritize=False):
+    # Shared driver for the run, plan and apply modes
+    # plan_device(device) returns the list of Changes for one device, only reading from Jamf
+    # apply_device(device_id, changes) makes the changes for one device and returns a DeviceResult
+    # extension_attributes are the definition IDs the script sets
+    # prioritize is True when devices were read with their Extension Attributes (bulk inventory, snapshot or
+    # advanced search), then with --time-budget the devices with them blank go first, see schedule.py
+    # Devices from a listing are left in the order they stream in
+    # With --shard, only the devices in this shard are worked on
+    devices = shard_devices(devices)
+    # With --time-budget, do the devices most likely to need a change first and stop before the time is up
+    deadline = deadline_for(args)
+    stop_on_sigterm()
+    if deadline is not None and prioritize and args.mode != "apply":
+        devices = prioritized(devices, extension_attributes)
+    if args.mode == "plan":
+        if deadline is not None:
+            devices = deadline.take(devices)
+        results = run_concurrently(plan_device, devices)
+        if deadline is not None:
+            results = deadline.track(results)
+        planned = _planned_changes(results)
+        count = write_plan(args.plan_file, script, planned)
+        print(f"Wrote {count} planned changes to {args.plan_file}")
+        if deadline is not None and deadline.stopped:
+            print(deadline.report())
+        return
+
+    # run and apply record every finished device in the journal so an interrupted sweep can be resumed
+    path = sharded_path(getattr(args, "journal", None) or journal_path(script))
+    journal = Journal(path, script, getattr(args, "resume", False))
+    # Writes each device's result to the results file, the log and the GitHub summary, see results.py
+    sink = result_sink(script)
+    skipped = []
+    try:
+        if args.mode == "apply":
+            planned = _unfinished(journal, shard_devices(group_by_device(read_plan(args.plan_file, script))), skipped)
+            if deadline is not None:
+                planned = deadline.take(planned)
+            results = run_concurrently(lambda device: apply_device(device["id"], device["changes"]), planned)
+        else:
+            devices = _unfinished(journal, devices, skipped)
+            if deadline is not None:
+                devices = deadline.take(devices)
+            results = run_concurrently(lambda device: apply_device(device["id"], plan_device(device)), devices)
+        if deadline is not None:
+            results = deadline.track(results)
+        report_results(_journaled(journal, results), sink)
+    finally:
+        sink.close()
+        journal.close()
+    if skipped:
+        print(f"Skipped {len(skipped)} devices already finished in the sweep started {journal.sweep}")
+    if deadline is not None and deadline.stopped:
+        print(deadline.report())
+
+
+def _unfinished(journal, devices, skipped):
+    # Leave out devices the journal says are already finished, counting them in skipped
+    for device in devices:
+        if journal.done(device["id"]):
+            skipped.append(device["id"])
+        else:
+            yield device
+
+
+def _journaled(journal, results):
+    # Record each device's outcome in the journal as its result is reported
+    for device, result, err in results:
+        journal.record(device["id"], "error" if err is not None else result.status)
+        yield device, result, err
+
+
+def _planned_changes(results):
+    # Print each planned change as it is found, along with any device that couldn't be read
+    for device, changes, err in results:
+        if err is not None:
+            print(f"Error for ID: {device['id']}")
+            print(err)
+            continue
+        for change in changes:
+            print(format_change(change))
+            yield change
@@ -0,0 +1,234 @@
+"""
+Breaks a run's time and memory down by pipeline phase, to tell network-bound from CPU-bound work.
+
+Run a script with --profile (or JAMF_PROFILE=true) and at the end it prints, and adds to the GitHub step summary,
+a table of the phases below with how many times each ran, the wall time and CPU time spent in it, and how much
+the allocated memory grew while it ran (negative if it freed more than it allocated):
+
+- auth: getting API tokens
+- listing: reading the Classic device and group listings
+- fetch: GET requests, including waiting for Jamf and reading the response
+- decode: decoding JSON responses and parsing XML listings
+- ea_lookup: scanning the extensionAttributes lists of inventory records
+- classify: working out the latest supported macOS for a Model Identifier (each Model Identifier once, it's cached)
+- write: PUT, PATCH and POST requests
+
+Phases can run inside each other (decode inside listing, listing inside fetch time), so each row includes the
+phases nested in it. Wall time is added up over every worker thread, so it can be more than the run took. A phase
+whose CPU time is close to its wall time is CPU-bound, one with little CPU time is waiting on the network.
+
+Allocated memory is measured with tracemalloc, which can make CPU-heavy phases take twice as long. Run with
+--profile time (or JAMF_PROFILE=time) to leave memory out and get times close to an unprofiled run. tracemalloc
+counts memory for the whole process, so with several workers a phase's figure also includes what other threads
+allocated at the same time, set JAMF_WORKERS=1 for exact figures.
+
+Add --profile-dump DIRECTORY to also write a cProfile dump of every thread (<script name>.pstats, open it with
+python3 -m pstats) and, unless memory is left out, a tracemalloc snapshot (<script name>.tracemalloc, load it
+with tracemalloc.Snapshot.load()) to that directory.
+
+When profiling is off, phase() and @profiled cost one check of a global.
+"""
+
+from collections import defaultdict
+from contextlib import nullcontext
+from functools import wraps
+import cProfile
+import os
+import pstats
+import requests
+import threading
+import time
+import tracemalloc
+
+# Phases in the order they are shown
+PHASES = ["auth", "listing", "fetch", "decode", "ea_lookup", "classify", "write"]
+# Frames kept for each allocation in the tracemalloc snapshot
+SNAPSHOT_FRAMES = 25
+
+_profile = None
+_off = nullcontext()
+
+
+def _traced_memory():
+    # Bytes allocated right now, 0 if memory isn't being traced
+    return tracemalloc.get_traced_memory()[0]
+
+
+class _Phase:
+    # Times one run of a phase in the current thread
+    __slots__ = ("profile", "name", "wall", "cpu", "memory")
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.memory = _traced_memory()
+        self.cpu = time.thread_time()
+        self.wall = time.perf_counter()
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.wall
+        cpu = time.thread_time() - self.cpu
+        allocated = _traced_memory() - self.memory
+        self.profile.add(self.name, wall, cpu, allocated)
+
+
+class Profile:
+    """
+    Per-phase calls, wall time, CPU time and allocated memory for one run. Safe to share between threads.
+
+    :param dump_dir: Directory to write the cProfile and tracemalloc dumps to, None to not write them
+    """
+
+    def __init__(self, dump_dir=None):
+        self.dump_dir = dump_dir
+        self.started = time.perf_counter()
+        self.started_cpu = time.process_time()
+        # {phase: [calls, wall seconds, CPU seconds, allocated bytes]}
+        self.phases = defaultdict(lambda: [0, 0.0, 0.0, 0])
+        self.profilers = []
+        self._lock = threading.Lock()
+
+    def add(self, name, wall, cpu, allocated):
+        with self._lock:
+            phase = self.phases[name]
+            phase[0] += 1
+            phase[1] += wall
+            phase[2] += cpu
+            phase[3] += allocated
+
+    def profile_thread(self, *args):
+        # threading.setprofile() hook, runs once at the start of each new thread and hands it its own profiler
+        profiler = cProfile.Profile()
+        with self._lock:
+            self.profilers.append(profiler)
+        profiler.enable()
+
+    def table(self):
+        # Markdown table of the phases
+        wall = time.perf_counter() - self.started
+        cpu = time.process_time() - self.started_cpu
+        memory = tracemalloc.is_tracing()
+        peak = f", peak traced memory {tracemalloc.get_traced_memory()[1] / 1e6:.1f} MB" if memory else ""
+        lines = [
+            "",
+            "### Profile",
+            "",
+            f"Run took {wall:.1f}s with {cpu:.1f}s of CPU time ({cpu / wall:.0%} of one core){peak}",
+            "",
+            "| Phase | Calls | Wall s | CPU s | CPU / wall |" + (" Memory change MB |" if memory else ""),
+            "| --- | ---: | ---: | ---: | ---: |" + (" ---: |" if memory else ""),
+        ]
+        with self._lock:
+            phases = dict(self.phases)
+        for name in PHASES + sorted(set(phases) - set(PHASES)):
+            if name not in phases:
+                continue
+            calls, phase_wall, phase_cpu, allocated = phases[name]
+            share = phase_cpu / phase_wall if phase_wall else 0
+            row = f"| {name} | {calls} | {phase_wall:.2f} | {phase_cpu:.2f} | {share:.0%} |"
+            lines.append(row + (f" {allocated / 1e6:.1f} |" if memory else ""))
+        return "\n".join(lines) + "\n"
+
+    def dump(self, stem):
+        # Write every thread's cProfile stats and a tracemalloc snapshot
+        os.makedirs(self.dump_dir, exist_ok=True)
+        threading.setprofile(None)
+        with self._lock:
+            profilers = list(self.profilers)
+        stats = pstats.Stats(profilers[0])
+        for profiler in profilers[1:]:
+            stats.add(profiler)
+        stats_path = os.path.join(self.dump_dir, f"{stem}.pstats")
+        stats.dump_stats(stats_path)
+        snapshot_path = os.path.join(self.dump_dir, f"{stem}.tracemalloc")
+        if not tracemalloc.is_tracing():
+            return stats_path, None
+        tracemalloc.take_snapshot().dump(snapshot_path)
+        return stats_path, snapshot_path
+
+
+def enable(dump_dir=None, memory=True):
+    # Start profiling this run, with cProfile too if dump_dir is given, and allocated memory unless memory is False
+    global _profile
+    _profile = Profile(dump_dir)
+    if memory:
+        tracemalloc.start(SNAPSHOT_FRAMES if dump_dir else 1)
+    _profile_json_decoding()
+    if dump_dir:
+        # The main thread gets its profiler now, every thread started from here on gets its own
+        _profile.profile_thread()
+        threading.setprofile(_profile.profile_thread)
+    return _profile
+
+
+def enabled():
+    return _profile is not None
+
+
+def phase(name):
+    # Context manager timing the code inside it as part of a phase, does nothing unless profiling
+    if _profile is None:
+        return _off
+    return _Phase(_profile, name)
+
+
+def profiled(name):
+    # Decorator timing every call of a function as part of a phase
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _profile is None:
+                return func(*args, **kwargs)
+            with _Phase(_profile, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _profile_json_decoding():
+    # The API wrapper decodes every JSON response with Response.json(), so time it there
+    decode = requests.models.Response.json
+    if getattr(decode, "profiled", False):
+        return
+
+    @wraps(decode)
+    def json(self, **kwargs):
+        with phase("decode"):
+            return decode(self, **kwargs)
+    json.profiled = True
+    requests.models.Response.json = json
+
+
+def instrument(session):
+    # Time the requests a session sends as auth, fetch or write, does nothing unless profiling
+    if _profile is None:
+        return
+    request = session.request
+
+    def profiled_request(method, url, *args, **kwargs):
+        if url.endswith("/api/oauth/token"):
+            name = "auth"
+        else:
+            name = "fetch" if method.upper() == "GET" else "write"
+        with phase(name):
+            return request(method, url, *args, **kwargs)
+    session.request = profiled_request
+
+
+def write_profile(script):
+    # Print the profile of this run and add it to the GitHub step summary, and write the dumps if asked to
+    if _profile is None:
+        return
+    text = _profile.table()
+    print(text)
+    summary_path = os.environ.get("GITHUB_STEP_SUMMARY")
+    if summary_path:
+        with open(summary_path, "a") as f:
+            f.write(text)
+    if _profile.dump_dir:
+        stem = os.path.splitext(os.path.basename(script))[0]
+        for path in _profile.dump(stem):
+            if path:
+                print(f"Wrote {path}")
@@ -0,0 +1,203 @@
+"""
+Adaptive rate limiting for the Jamf Classic and Pro clients.
+
+ThrottledClient wraps a Classic or Pro client so every API call waits for a slot from an AdaptiveLimiter.
+The limiter uses AIMD (additive increase, multiplicative decrease) to find the most calls Jamf can handle at once:
+- Every healthy response raises the limit a little, up to the number of workers
+- A throttling response (429, 503), a timeout, or latency well above normal halves the limit
+- A Retry-After header from Jamf pauses every call until that time has passed
+
+Calls that are safe to repeat (get_ and update_ methods) are retried with jittered backoff when Jamf throttles them,
+everything else (create_, delete_, ...) is only attempted once.
+"""
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from jps_api_wrapper.request_builder import RequestTimedOut
+from jamf_helpers.metrics import set_attempt
+from jamf_helpers.workers import worker_count
+import functools
+import logging
+import random
+import requests
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Jamf is overloaded or asking us to slow down
+THROTTLE_STATUSES = (429, 502, 503, 504)
+# Methods that can be sent again without changing the result
+IDEMPOTENT_PREFIXES = ("get_", "update_")
+# Start with at most this many calls at once and ramp up from there
+INITIAL_LIMIT = 4
+# Treat latency above this multiple of the normal latency as a sign Jamf is struggling,
+# as long as it is also above SLOW_LATENCY seconds so normal jitter on fast responses doesn't count
+LATENCY_FACTOR = 3
+SLOW_LATENCY = 1.0
+# Backoff settings for retries, in seconds
+BACKOFF_BASE = 1
+BACKOFF_CAP = 60
+MAX_RETRIES = 5
+
+
+class AdaptiveLimiter:
+    """
+    Limits how many Jamf API calls run at once, adjusting the limit based on how Jamf responds.
+
+    :param maximum: Most calls allowed at once, defaults to the number of workers
+    :param minimum: Fewest calls allowed at once
+    :param initial: Calls allowed at once to begin with
+    """
+
+    def __init__(self, maximum=None, minimum=1, initial=INITIAL_LIMIT):
+        self.maximum = maximum or worker_count()
+        self.minimum = minimum
+        self.limit = float(max(minimum, min(initial, self.maximum)))
+        self._in_flight = 0
+        self._baseline = None
+        self._resume_at = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        # Wait until a slot is free and any Retry-After pause has passed
+        with self._cond:
+            while True:
+                pause = self._resume_at - time.monotonic()
+                if pause > 0:
+                    self._cond.wait(pause)
+                elif self._in_flight < int(self.limit):
+                    break
+                else:
+                    self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, latency=None, throttled=False, retry_after=None):
+        # Give the slot back and adjust the limit based on how the call went
+        with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                self._decrease(now)
+                if retry_after:
+                    self._resume_at = max(self._resume_at, now + retry_after)
+            elif latency is not None:
+                if self._baseline is None or latency < self._baseline:
+                    self._baseline = latency
+                else:
+                    # Let the normal latency drift up slowly so a busy but healthy server isn't punished forever
+                    self._baseline = self._baseline * 0.99 + latency * 0.01
+                if latency > max(self._baseline * LATENCY_FACTOR, SLOW_LATENCY):
+                    self._decrease(now)
+                else:
+                    # Additive increase, about one more slot for every full window of healthy calls
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def _decrease(self, now):
+        # Multiplicative decrease, but only once per second so a burst of throttled calls only counts once
+        if now - self._last_decrease >= 1:
+            self.limit = max(self.minimum, self.limit / 2)
+            self._last_decrease = now
+            logger.warning(f"Jamf is throttling or slowing down, reducing concurrency to {int(self.limit)}")
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def shared_limiter():
+    # One limiter for every client in a script, since they all talk to the same Jamf server
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = AdaptiveLimiter()
+        return _shared_limiter
+
+
+def status_code(err):
+    # Get the HTTP status code from an exception raised by the Jamf clients, if there is one
+    if isinstance(err, RequestTimedOut):
+        return 502
+    response = getattr(err, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def retry_after(err):
+    # Get the number of seconds Jamf asked us to wait from the Retry-After header, if it sent one
+    response = getattr(err, "response", None)
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt, wait=None):
+    # Seconds to wait before the next retry, full jitter so workers don't all retry at the same moment
+    if wait is not None:
+        return wait + random.uniform(0, BACKOFF_BASE)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class ThrottledClient:
+    """
+    Wraps a Classic or Pro client so every API call goes through an AdaptiveLimiter.
+
+    :param client: Classic or Pro client to wrap
+    :param limiter: AdaptiveLimiter to use, defaults to the limiter shared by every client in the script
+    :param retries: How many times to retry an idempotent call that was throttled
+    """
+
+    def __init__(self, client, limiter=None, retries=MAX_RETRIES):
+        self._client = client
+        self._limiter = limiter or shared_limiter()
+        self._retries = retries
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        return self.throttled(name, attr)
+
+    def throttled(self, name, attr):
+        # Wrap a call to Jamf so it waits for the limiter and is retried when throttled, the same as a client method
+        # called name, e.g. a request sent straight on the session
+        retryable = name.startswith(IDEMPOTENT_PREFIXES)
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            attempt = 0
+            while True:
+                self._limiter.acquire()
+                # Lets the metrics count retries per endpoint
+                set_attempt(attempt)
+                start = time.monotonic()
+                try:
+                    result = attr(*args, **kwargs)
+                except (requests.exceptions.HTTPError, requests.exceptions.ConnectionError, requests.exceptions.Timeout, RequestTimedOut) as err:
+                    status = status_code(err)
+                    throttled = status in THROTTLE_STATUSES or status is None
+                    wait = retry_after(err)
+                    self._limiter.release(throttled=throttled, retry_after=wait)
+                    if not throttled or not retryable or attempt >= self._retries:
+                        raise
+                    delay = backoff(attempt, wait)
+                    logger.info(f"{name} got {status or type(err).__name__}, retrying in {delay:.1f} seconds")
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                except BaseException:
+                    self._limiter.release()
+                    raise
+                self._limiter.release(latency=time.monotonic() - start)
+                return result
+
+        return call
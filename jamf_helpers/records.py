@@ -0,0 +1,212 @@
+"""
+A compact record of the few fields the Action scripts use from a device, and the projections into it.
+
+The scripts only look at a device's ID, name, site, Model Identifier, managed state, report date and an
+Extension Attribute value or two, but an inventory record from the API carries every field of every section asked
+for. Holding those dictionaries for a whole fleet (a snapshot, an advanced search, a listing) costs kilobytes per
+device. DeviceRecord keeps just those fields in __slots__, shares one copy of each site name, Model Identifier and
+Extension Attribute value between devices, and keeps Extension Attribute values in a dictionary keyed by
+definition ID so looking one up doesn't scan a list.
+
+Every script turns what it reads from Jamf into a DeviceRecord with the from_ functions below, whichever API it
+read it from. Records can also be read like the dictionaries they replace, e.g. device["id"].
+
+get_computer() and iter_computer_records() read computers from the Jamf Pro API with only the inventory sections
+holding the fields a script asks for, instead of the whole inventory detail (applications, fonts, certificates
+and so on), which is most of the bytes on the wire and most of the JSON decoding.
+"""
+
+from jamf_helpers.inventory import DEFAULT_PAGE_SIZE, all_extension_attribute_values, iter_computer_inventory
+from jamf_helpers.profiling import profiled
+import sys
+
+# The Jamf Pro API inventory section each DeviceRecord field is read from
+FIELD_SECTIONS = {
+    "id": None,
+    "name": "GENERAL",
+    "site": "GENERAL",
+    "managed": "GENERAL",
+    "report_date": "GENERAL",
+    "model_identifier": "HARDWARE",
+}
+
+
+def _intern(value):
+    # Share one copy of strings that repeat across the fleet
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class DeviceRecord:
+    """
+    The fields the Action scripts use from one computer or mobile device.
+
+    :param id: JSS ID of the device
+    :param name: Device name
+    :param site: Site name, None if the device isn't in a site
+    :param model_identifier: Model Identifier, e.g. MacBookPro18,3
+    :param managed: True if the device is managed, None if not known
+    :param report_date: Date of the last inventory report, as Jamf gave it
+    :param extension_attributes: Extension Attribute values as {definition ID: value}
+    """
+
+    __slots__ = ("id", "name", "site", "model_identifier", "managed", "report_date", "extension_attributes")
+
+    def __init__(
+        self,
+        id,
+        name=None,
+        site=None,
+        model_identifier=None,
+        managed=None,
+        report_date=None,
+        extension_attributes=None,
+    ):
+        self.id = id
+        self.name = name
+        self.site = _intern(site)
+        self.model_identifier = _intern(model_identifier)
+        self.managed = managed
+        self.report_date = report_date
+        # Most devices share the same few definition IDs and values, and devices without any don't need a dictionary
+        self.extension_attributes = {
+            _intern(str(definition_id)): _intern(value) for definition_id, value in extension_attributes.items()
+        } if extension_attributes else None
+
+    def extension_attribute(self, definition_id):
+        # Returns a blank string if the extension attribute isn't set for this device
+        if not self.extension_attributes:
+            return ""
+        return self.extension_attributes.get(str(definition_id), "")
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def __repr__(self):
+        return f"DeviceRecord(id={self.id!r}, name={self.name!r}, site={self.site!r})"
+
+
+def _site_name(site):
+    return (site or {}).get("name") if isinstance(site, dict) else site
+
+
+def _text(value):
+    return "" if value is None else str(value)
+
+
+def from_inventory(record):
+    # A Jamf Pro computers-inventory or computers-inventory-detail record, with whichever sections were read
+    general = record.get("general") or {}
+    hardware = record.get("hardware") or {}
+    return DeviceRecord(
+        record["id"],
+        name=general.get("name"),
+        site=_site_name(general.get("site")),
+        model_identifier=hardware.get("modelIdentifier"),
+        managed=(general.get("remoteManagement") or {}).get("managed"),
+        report_date=general.get("reportDate"),
+        extension_attributes=all_extension_attribute_values(record),
+    )
+
+
+@profiled("ea_lookup")
+def _mobile_extension_attribute_values(detail):
+    # Mobile device detail extension attributes are {"id", "value": [...]}
+    extension_attributes = {}
+    for extension_attribute in detail.get("extensionAttributes") or []:
+        value = extension_attribute.get("value")
+        if isinstance(value, list):
+            value = ", ".join(str(item) for item in value)
+        extension_attributes[str(extension_attribute["id"])] = _text(value)
+    return extension_attributes
+
+
+@profiled("ea_lookup")
+def _classic_extension_attribute_values(device):
+    return {
+        str(extension_attribute["id"]): extension_attribute.get("value") or ""
+        for extension_attribute in device.get("extension_attributes") or []
+    }
+
+
+def from_mobile_device_detail(detail):
+    # A Jamf Pro /v2/mobile-devices/{id}/detail record
+    extension_attributes = _mobile_extension_attribute_values(detail)
+    hardware = detail.get("hardware") or {}
+    return DeviceRecord(
+        detail["id"],
+        name=detail.get("name"),
+        site=_site_name(detail.get("site")),
+        model_identifier=hardware.get("modelIdentifier"),
+        managed=detail.get("managed"),
+        report_date=detail.get("lastInventoryUpdateTimestamp"),
+        extension_attributes=extension_attributes,
+    )
+
+
+def from_classic(device):
+    # A Classic API computer or mobile device record, e.g. classic.get_computer(...)["computer"]
+    general = device.get("general") or device
+    managed = (general.get("remote_management") or {}).get("managed", general.get("managed"))
+    extension_attributes = _classic_extension_attribute_values(device)
+    return DeviceRecord(
+        general["id"],
+        name=general.get("name"),
+        site=_site_name(general.get("site")),
+        model_identifier=general.get("model_identifier") or (device.get("hardware") or {}).get("model_identifier"),
+        managed=managed,
+        report_date=general.get("report_date") or general.get("last_inventory_update"),
+        extension_attributes=extension_attributes,
+    )
+
+
+def from_listing(item):
+    # An entry in a Classic API computer, mobile device or group listing
+    return DeviceRecord(
+        item["id"],
+        name=item.get("name"),
+        model_identifier=item.get("model_identifier"),
+        managed=item.get("managed"),
+        report_date=item.get("report_date_utc"),
+    )
+
+
+def from_search_result(result, site_key, extension_attributes):
+    # An advanced search result, whose display fields are keyed by field name
+    # extension_attributes maps each Extension Attribute's definition ID to its key in the result
+    return DeviceRecord(
+        result["id"],
+        name=result.get("name"),
+        site=_text(result.get(site_key)),
+        extension_attributes={
+            definition_id: _text(result.get(key)) for definition_id, key in extension_attributes.items()
+        },
+    )
+
+
+def inventory_sections(fields, extension_attribute_sections=()):
+    # The fewest Jamf Pro API inventory sections that hold the given DeviceRecord fields
+    # Extension Attributes are listed in the section they are displayed in, so pass the sections they are in
+    sections = []
+    for section in [FIELD_SECTIONS[field] for field in fields] + list(extension_attribute_sections):
+        if section is not None and section not in sections:
+            sections.append(section)
+    # Jamf returns the General section when no section is asked for
+    return sections or ["GENERAL"]
+
+
+def get_computer(pro, computer_id, fields, extension_attribute_sections=()):
+    # Read one computer with only the sections holding the given fields, as a DeviceRecord
+    # Returns None if Jamf has no inventory for the computer
+    record = pro.get_computer_inventory(id=computer_id, section=inventory_sections(fields, extension_attribute_sections))
+    return None if record is None else from_inventory(record)
+
+
+def iter_computer_records(pro, fields, extension_attribute_sections=(), page_size=DEFAULT_PAGE_SIZE, filter=None):
+    # Read every computer a page at a time with only the sections holding the given fields, as DeviceRecords
+    sections = inventory_sections(fields, extension_attribute_sections)
+    return map(from_inventory, iter_computer_inventory(pro, section=sections, page_size=page_size, filter=filter))
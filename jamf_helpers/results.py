@@ -0,0 +1,177 @@
+"""
+Collects what happened to each device and writes it out on a background thread.
+
+Every device's outcome goes to a compact JSON lines results file, one line per device with its ID, outcome
+(unchanged, updated or error) and output lines, so a run over 100,000 devices can be searched or loaded after
+the fact. The output lines are still printed to the job log, in the same order as the devices, but batched.
+
+The GitHub Actions step summary gets one aggregated Markdown section written when the run ends, instead of a line
+appended for every error: how many devices ended up unchanged, updated or in error, the errors grouped by message
+with a few example device IDs, and the first of the per-device summary lines. It is kept under SUMMARY_MAX_BYTES
+so it stays readable and well inside GitHub's 1 MiB step summary limit however large the fleet is.
+
+Set JAMF_RESULTS to choose the results file path (default <script name>.results.jsonl), or to an empty string to
+skip it. When the script runs as one shard of a sweep, the shard is added to the file name (see shard.py).
+"""
+
+from collections import Counter, OrderedDict
+from jamf_helpers.shard import sharded_path
+import json
+import os
+import queue
+import re
+import sys
+import threading
+
+# Largest size of the step summary section, in bytes
+SUMMARY_MAX_BYTES = 64 * 1024
+# Error messages to show in the summary, most common first, and device IDs to show for each
+ERROR_GROUPS_SHOWN = 20
+EXAMPLE_IDS = 10
+# Per-device summary lines to show, the rest are only in the results file
+SUMMARY_LINES_SHOWN = 50
+# Devices written to the results file and log at a time
+BATCH_SIZE = 1000
+
+_CLOSE = object()
+_ID_SEGMENT = re.compile(r"/\d+(?=[/?\s]|$)")
+
+
+def results_path(script):
+    # Default results file for a script, e.g. Action-Jamf_Pro_API-UnmanageComputers.results.jsonl
+    stem = os.path.splitext(os.path.basename(script))[0]
+    return sharded_path(os.environ.get("JAMF_RESULTS", f"{stem}.results.jsonl"))
+
+
+def error_group(message):
+    # Group errors that only differ by the device they happened to, e.g. the device ID in a URL
+    return _ID_SEGMENT.sub("/{id}", str(message)).strip()
+
+
+class ResultSink:
+    """
+    Takes each device's outcome from any thread and writes the results file and log on a background thread.
+    close() waits for everything to be written and adds the summary to the GitHub step summary.
+
+    :param script: Name of the script, for the file name and summary title
+    :param path: Results file path, None or an empty string to not write one
+    :param summary_path: File to add the Markdown summary to, None to not write one
+    :param echo: Stream to print the output lines to, None to not print them
+    """
+
+    def __init__(self, script, path=None, summary_path=None, echo=sys.stdout):
+        self.script = script
+        self.path = path
+        self.summary_path = summary_path
+        self.echo = echo
+        self.outcomes = Counter()
+        # {error message: [count, [example device IDs]]}, in the order they first happened
+        self.errors = OrderedDict()
+        self.summary_lines = []
+        self.hidden_summary_lines = 0
+        self._queue = queue.SimpleQueue()
+        self._file = open(path, "w") if path else None
+        self._writer = threading.Thread(target=self._write, daemon=True)
+        self._writer.start()
+
+    def record(self, device_id, outcome, lines=(), summary=(), error=None):
+        # Add one device's outcome, safe to call from any thread
+        # lines are printed to the log, summary lines go to the step summary, error is grouped in the summary
+        self._queue.put((device_id, outcome, [str(line) for line in lines], list(summary), error))
+
+    def _write(self):
+        while True:
+            batch = [self._queue.get()]
+            # Take whatever else is waiting, so the file and log are written a batch at a time
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            done = batch[-1] is _CLOSE
+            self._write_batch([entry for entry in batch if entry is not _CLOSE])
+            if done:
+                return
+
+    def _write_batch(self, batch):
+        records, output = [], []
+        for device_id, outcome, lines, summary, error in batch:
+            self.outcomes[outcome] += 1
+            if error is not None:
+                group = self.errors.setdefault(error_group(error), [0, []])
+                group[0] += 1
+                if len(group[1]) < EXAMPLE_IDS:
+                    group[1].append(device_id)
+            for line in summary:
+                if len(self.summary_lines) < SUMMARY_LINES_SHOWN:
+                    self.summary_lines.append(line)
+                else:
+                    self.hidden_summary_lines += 1
+            output.extend(lines)
+            if self._file:
+                record = {"id": device_id, "outcome": outcome}
+                if lines:
+                    record["lines"] = lines
+                records.append(json.dumps(record, separators=(",", ":"), default=str))
+        if self._file and records:
+            self._file.write("\n".join(records) + "\n")
+            self._file.flush()
+        if self.echo and output:
+            self.echo.write("\n".join(output) + "\n")
+            self.echo.flush()
+
+    def close(self):
+        # Wait for every result to be written, then add the summary to the step summary
+        self._queue.put(_CLOSE)
+        self._writer.join()
+        if self._file:
+            self._file.close()
+        if self.summary_path and self.outcomes:
+            with open(self.summary_path, "a") as f:
+                f.write(self.summary())
+
+    def summary(self):
+        # Markdown summary of the run, cut off at SUMMARY_MAX_BYTES
+        name = os.path.basename(self.script)
+        lines = [
+            "",
+            f"### {name}",
+            "",
+            "| Unchanged | Updated | Errors |",
+            "| ---: | ---: | ---: |",
+            f"| {self.outcomes['unchanged']} | {self.outcomes['updated']} | {self.outcomes['error']} |",
+        ]
+        if self.errors:
+            groups = sorted(self.errors.items(), key=lambda item: item[1][0], reverse=True)
+            lines += ["", "| Errors | Message | Example JSS IDs |", "| ---: | --- | --- |"]
+            for message, (count, examples) in groups[:ERROR_GROUPS_SHOWN]:
+                message = message.replace("|", "\\|").replace("\n", " ")[:300]
+                lines.append(f"| {count} | `{message}` | {', '.join(str(device_id) for device_id in examples)} |")
+            if len(groups) > ERROR_GROUPS_SHOWN:
+                lines.append(f"| {sum(group[0] for _, group in groups[ERROR_GROUPS_SHOWN:])} | {len(groups) - ERROR_GROUPS_SHOWN} other messages | |")
+        if self.summary_lines:
+            lines += [""] + [f"- {line}" for line in self.summary_lines]
+        if self.hidden_summary_lines:
+            lines.append(f"{self.hidden_summary_lines} more lines in {self.path or 'the job log'}")
+        text = "\n".join(lines) + "\n"
+        if len(text.encode()) > SUMMARY_MAX_BYTES:
+            text = text.encode()[:SUMMARY_MAX_BYTES].decode(errors="ignore").rsplit("\n", 1)[0]
+            text += f"\n\nSummary cut off at {SUMMARY_MAX_BYTES // 1024} KB, see {self.path or 'the job log'}\n"
+        return text
+
+
+def result_sink(script):
+    # The sink for a script run, writing the default results file and the GitHub step summary if there is one
+    return ResultSink(script, path=results_path(script), summary_path=os.environ.get("GITHUB_STEP_SUMMARY"))
+
+
+def report_results(results, sink):
+    # Hand each device's result to the sink in order, along with any error that wasn't handled for that device
+    for item, result, err in results:
+        if err is not None:
+            sink.record(
+                item["id"], "error", [f"Error for ID: {item['id']}", str(err)],
+                [f"🔥 Unexpected error on device `{item['id']}` – `{err}`"], error=err,
+            )
+            continue
+        sink.record(result.device_id, result.status, result.lines, result.summary, result.error_message)
@@ -0,0 +1,131 @@
+"""
+Works out several computed computer Extension Attributes in one pass over the fleet.
+
+Each computed xEA is a rule: a function from a DeviceRecord to the value the xEA should have, registered with
+the @rule decorator along with the DeviceRecord fields it reads. The engine reads the inventory once with the
+sections every enabled rule needs, evaluates every rule on each computer, and plans one Change per xEA whose
+value differs, so the script sends one update per computer carrying every changed xEA.
+
+A rule is enabled by setting its Extension Attribute ID, and optionally its name for the output, in
+JAMF_xEA_ID_<RULE> and JAMF_xEA_NAME_<RULE>, e.g. JAMF_xEA_ID_SITE=101. Adding another computed xEA is a new
+@rule function here, and costs no extra reads from Jamf as long as its fields are already being read.
+
+Extension Attributes show up in the section of the inventory they are displayed in, so each rule also names the
+section its own Extension Attribute is displayed in.
+
+The scripts that update a single xEA (Action-Jamf_Pro_API-Update_xEA-Jamf-Site.py and
+Action-Jamf_Pro_API-Update_xEA-macOS_Latest_Supported.py) use the same rules through single_rule(), and every
+computer script writes its changes with apply_changes().
+"""
+
+from collections import namedtuple
+from jamf_helpers.compatibility import latest_supported_macos
+from jamf_helpers.plan import Change, extension_attribute_field, extension_attribute_id
+from jamf_helpers.workers import DeviceResult
+import os
+import requests
+
+# A registered rule, compute(device) returns the value the xEA should have
+RuleType = namedtuple("RuleType", ["name", "compute", "fields", "section"])
+# A rule enabled for an Extension Attribute
+Rule = namedtuple("Rule", ["name", "definition_id", "label", "compute", "fields", "section"])
+
+RULE_TYPES = {}
+
+
+def rule(name, fields, section):
+    # Register a function as the rule called name, reading the given DeviceRecord fields
+    # section is the inventory section the rule's Extension Attribute is displayed in, e.g. "GENERAL"
+    def register(compute):
+        RULE_TYPES[name] = RuleType(name, compute, list(fields), section)
+        return compute
+    return register
+
+
+@rule("SITE", fields=["name", "site"], section="GENERAL")
+def jamf_site(device):
+    # Jamf doesn't allow site as a smart group criteria, so copy it into an xEA
+    return device.site
+
+
+@rule("MACOS_LATEST_SUPPORTED", fields=["name", "model_identifier"], section="OPERATING_SYSTEM")
+def macos_latest_supported(device):
+    # The latest macOS this Mac's Model Identifier supports, see compatibility.py
+    return latest_supported_macos(device.model_identifier)
+
+
+def configured_rules(environ=os.environ, prefix="JAMF_xEA"):
+    # Every registered rule whose Extension Attribute ID is set, in the order they were registered
+    # prefix picks the environment variables, e.g. JAMF_MOBILE_xEA for JAMF_MOBILE_xEA_ID_SITE
+    rules = []
+    for name, rule_type in RULE_TYPES.items():
+        definition_id = environ.get(f"{prefix}_ID_{name}")
+        if definition_id:
+            label = environ.get(f"{prefix}_NAME_{name}") or f"xEA {definition_id}"
+            rules.append(Rule(name, str(definition_id), label, rule_type.compute, rule_type.fields, rule_type.section))
+    return rules
+
+
+def single_rule(name, definition_id, label=None):
+    # The registered rule called name enabled for one Extension Attribute, for the scripts that set their own
+    # environment variables instead of JAMF_xEA_ID_<RULE>
+    rule_type = RULE_TYPES[name]
+    label = label or f"xEA {definition_id}"
+    return Rule(name, str(definition_id), label, rule_type.compute, rule_type.fields, rule_type.section)
+
+
+def fields_for(rules):
+    # The DeviceRecord fields every rule reads, and the sections their Extension Attributes are in
+    # Reading the inventory with these gives every rule what it needs, see records.inventory_sections()
+    fields = [field for enabled in rules for field in enabled.fields]
+    return fields, [enabled.section for enabled in rules]
+
+
+def plan_rules(rules, device):
+    # Evaluate every rule on one computer, returns a Change for each xEA whose value needs to change
+    changes = []
+    for enabled in rules:
+        value = enabled.compute(device)
+        if value is None:
+            continue
+        current = device.extension_attribute(enabled.definition_id)
+        if value != current:
+            changes.append(Change(device.id, device.name, extension_attribute_field(enabled.definition_id), current, value))
+    return changes
+
+
+def computer_update(changes):
+    # Jamf Pro API body setting every changed computer xEA in one update
+    return {
+        "extensionAttributes": [
+            {
+                "definitionId": extension_attribute_id(change.field),
+                "values": [f"{change.new}"],
+            }
+            for change in changes
+        ]
+    }
+
+
+def apply_changes(pro, snapshot, rules, device_id, changes):
+    # Send one update for a computer with every xEA that changed, returns what happened to it as a DeviceResult
+    # so output stays in order when computers are updated concurrently
+    result = DeviceResult(device_id)
+    if not changes:
+        return result
+    labels = {enabled.definition_id: enabled.label for enabled in rules}
+    try:
+        pro.update_computer_inventory(computer_update(changes), device_id)
+        for change in changes:
+            definition_id = extension_attribute_id(change.field)
+            # Keep the local inventory snapshot in step with what's now in Jamf
+            if snapshot is not None:
+                snapshot.set_extension_attribute("computer", device_id, definition_id, change.new)
+            # Format a text string of the results
+            xEA_name = labels.get(definition_id, f"xEA {definition_id}")
+            output=f"JSS ID: {device_id}, Computer Name: {change.name}, Extension Attribute: {xEA_name}, Value: {change.new}, {xEA_name} Previous Value: {change.old}"
+            result.updated(f"{output}")
+    # Jamf Pro API may throw an exception or error, try to handle it here
+    except requests.exceptions.HTTPError as err:
+        result.error(f"HTTP Error for ID: {device_id}", err.args[0])
+    return result
@@ -0,0 +1,137 @@
+"""
+Keeps a sweep inside a time budget, doing the devices most likely to need a change first.
+
+GitHub Actions kills a job at its timeout (120 minutes in these workflows), and a killed job doesn't get to write
+its results or metrics. Run a script with --time-budget MINUTES (or JAMF_TIME_BUDGET_MINUTES) set a little under the
+job timeout, and it:
+
+- Orders the devices by how likely they are to need a change: devices with a blank or missing value in one of the
+  script's Extension Attributes first, then the rest by inventory report date, newest first, so devices that
+  haven't reported since the last sweep (and are most likely unchanged) come last. Scripts only ask for this
+  (run(..., prioritize=True), see plan.py) when they read the devices with their Extension Attributes up front
+  (bulk inventory, snapshot or advanced search). Devices from a listing, read one request per device later, keep
+  the order Jamf listed them in and are streamed as before, since sorting them would mean waiting for the whole
+  listing first and every device would look blank.
+- Measures how fast devices are being finished, and stops starting new devices once the devices still in flight
+  would only just finish before the budget runs out, less a safety margin.
+- Finishes the devices in flight, and writes the journal, results and metrics as usual, then says how far it got.
+  Run the script again with --resume to carry on with the devices it didn't get to.
+
+The budget counts from when the script started, so reading the device list counts towards it. A SIGTERM, as sent
+when a job is cancelled, also stops the sweep cleanly instead of losing the journal and results.
+"""
+
+from datetime import datetime
+import signal
+import sys
+import time
+
+# When the script started, the time budget counts from here
+STARTED = time.monotonic()
+# Stop starting new devices this many seconds before the budget runs out, at most 5% of the budget
+STOP_MARGIN = 60
+
+
+def _timestamp(report_date):
+    # Seconds since the epoch of a Jamf report date in any of the formats the APIs use, None if it can't be read
+    if not report_date:
+        return None
+    try:
+        return datetime.fromisoformat(str(report_date).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def priority(device, definition_ids):
+    # Sort key putting the devices most likely to need a change first
+    blank = any(not device.extension_attribute(definition_id) for definition_id in definition_ids)
+    reported = _timestamp(device.report_date)
+    return (0 if blank else 1, -reported if reported is not None else float("inf"))
+
+
+def prioritized(devices, definition_ids=()):
+    # Every device, blank Extension Attributes first, then newest report date first
+    # Only for devices read with their Extension Attributes, the whole list is read into memory to sort it
+    # Python's sort is stable, so devices that tie stay in the order Jamf listed them in
+    return sorted(devices, key=lambda device: priority(device, definition_ids))
+
+
+class Deadline:
+    """
+    Decides when to stop starting new devices so the sweep finishes inside its time budget.
+
+    :param budget: Seconds the whole script may take
+    :param margin: Seconds to keep spare at the end, default STOP_MARGIN or 5% of the budget if less
+    :param started: time.monotonic() when the script started
+    """
+
+    def __init__(self, budget, margin=None, started=STARTED):
+        self.budget = budget
+        self.margin = min(STOP_MARGIN, budget * 0.05) if margin is None else margin
+        self.ends = started + budget
+        self.started_work = None
+        self.submitted = 0
+        self.finished = 0
+        self.stopped = False
+        self.left = 0
+
+    def remaining(self):
+        return self.ends - time.monotonic()
+
+    def seconds_per_device(self):
+        # How long the sweep has been taking per device, with every worker going, None until a device has finished
+        if not self.finished:
+            return None
+        return (time.monotonic() - self.started_work) / self.finished
+
+    def can_start(self):
+        # Start another device only if it and every device in flight should finish before the margin
+        per_device = self.seconds_per_device() or 0
+        in_flight = self.submitted - self.finished
+        return self.remaining() > self.margin + (in_flight + 1) * per_device
+
+    def take(self, devices):
+        # Hand out devices until the next one wouldn't finish in time
+        devices = iter(devices)
+        for device in devices:
+            if not self.can_start():
+                self.stopped = True
+                # Count the devices left for the next run, they are already in memory once sorted by priority
+                self.left = 1 + sum(1 for _ in devices)
+                return
+            if self.started_work is None:
+                self.started_work = time.monotonic()
+            self.submitted += 1
+            yield device
+
+    def track(self, results):
+        # Count each device as its result comes back
+        for result in results:
+            self.finished += 1
+            yield result
+
+    def report(self):
+        # What to print at the end of a sweep that ran out of time
+        rate = 60 / self.seconds_per_device() if self.finished else 0
+        return (
+            f"Stopped with {max(0, self.remaining()):.0f}s of the {self.budget / 60:g} minute time budget left, "
+            f"finished {self.finished} devices at {rate:.0f} per minute, {self.left} devices left. "
+            "Run again with --resume to carry on."
+        )
+
+
+def deadline_for(args):
+    # The Deadline for a script run with --time-budget, or None
+    minutes = getattr(args, "time_budget", None)
+    return Deadline(minutes * 60) if minutes else None
+
+
+def stop_on_sigterm():
+    # Turn a SIGTERM into SystemExit in the main thread, so the journal, results and metrics are still written
+    def stop(signum, frame):
+        sys.exit(128 + signum)
+    try:
+        signal.signal(signal.SIGTERM, stop)
+    except ValueError:
+        # Only the main thread can set signal handlers
+        pass
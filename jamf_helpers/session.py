@@ -0,0 +1,221 @@
+"""
+One authenticated, pooled HTTP session shared by the Classic and Pro clients.
+
+Building Classic(...) and Pro(...) separately authenticates twice and opens two connection pools. connect() gets
+one OAuth token for the API client and one requests.Session with a keep-alive connection pool sized for the
+workers, and hands back Classic and Pro clients that both use them.
+
+The token is refreshed before it expires (when less than REFRESH_MARGIN seconds or a fifth of its lifetime is
+left), under a lock so only one worker fetches a new token while the others wait for it. If Jamf still answers
+401, the token is refreshed and the request sent once more.
+
+Set JAMF_TOKEN_CACHE to a file path to keep the token on disk, so the next script in the same workflow job reuses
+it instead of authenticating again. The file is only readable by the current user and is keyed by the Jamf URL
+and client ID. Point it somewhere temporary like $RUNNER_TEMP, never at a path that gets cached or uploaded.
+
+Set JAMF_HTTP_CACHE to also keep slowly changing responses (static groups, listings, sites) on disk between the
+scripts in a job, see http_cache.py.
+"""
+
+from datetime import datetime, timedelta, timezone
+from jps_api_wrapper import request_builder
+from jps_api_wrapper.classic import Classic
+from jps_api_wrapper.pro import Pro
+from jamf_helpers.http_cache import caching_adapter
+from jamf_helpers.metrics import instrument
+from jamf_helpers import profiling
+from jamf_helpers.ratelimit import ThrottledClient
+from jamf_helpers.workers import worker_count
+from requests.auth import AuthBase
+import hashlib
+import json
+import logging
+import os
+import requests
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Refresh the token when less than this many seconds, or less than REFRESH_FRACTION of its lifetime, is left
+REFRESH_MARGIN = 60
+REFRESH_FRACTION = 0.2
+TOKEN_CACHE = os.environ.get("JAMF_TOKEN_CACHE")
+
+# Held while a client is built, since building one briefly swaps the wrapper's auth class
+_build_lock = threading.Lock()
+
+
+class _NoAuth(AuthBase):
+    # Used for the token request itself so it doesn't go through ClientCredentialsAuth
+    def __call__(self, r):
+        return r
+
+
+class ClientCredentialsAuth(AuthBase):
+    """
+    Bearer token auth for a Jamf API client, safe to share between worker threads and between clients.
+
+    :param base_url: Jamf Pro URL, e.g. https://example.jamfcloud.com
+    :param client_id: API client ID
+    :param client_secret: API client secret
+    :param cache_path: File to keep the token in between scripts, None to keep it in memory only
+    """
+
+    def __init__(self, base_url, client_id, client_secret, cache_path=TOKEN_CACHE):
+        self.base_url = base_url
+        self._client_id = client_id
+        self._client_secret = client_secret
+        self._cache_path = cache_path
+        # Identifies the Jamf URL and API client, for the token cache and the response cache
+        self.cache_key = hashlib.sha256(f"{base_url}|{client_id}".encode()).hexdigest()
+        self._token = None
+        self._expires = datetime.min.replace(tzinfo=timezone.utc)
+        self._lifetime = timedelta(0)
+        self._lock = threading.Lock()
+        # Session used to fetch tokens, connect() points this at the shared session so it reuses its connections
+        self.session = None
+
+    def _needs_refresh(self):
+        remaining = self._expires - datetime.now(timezone.utc)
+        # Never more than half the lifetime, or a short lived token would be refreshed on every call
+        margin = min(timedelta(seconds=REFRESH_MARGIN), self._lifetime / 2)
+        return remaining <= max(margin, self._lifetime * REFRESH_FRACTION)
+
+    def token(self, stale=None):
+        # Get a valid token, refreshing it first if it is about to expire
+        # If stale is given and is still the current token, it was rejected by Jamf and is replaced
+        with self._lock:
+            if self._token is None:
+                self._load_cache()
+            if self._token is None or self._token == stale or self._needs_refresh():
+                self._refresh()
+            return self._token
+
+    def _refresh(self):
+        session = self.session or requests
+        r = session.post(
+            f"{self.base_url}/api/oauth/token",
+            headers={"Accept": "application/json", "Content-Type": "application/x-www-form-urlencoded"},
+            data={
+                "grant_type": "client_credentials",
+                "client_id": self._client_id,
+                "client_secret": self._client_secret,
+            },
+            auth=_NoAuth(),
+        )
+        r.raise_for_status()
+        token_json = r.json()
+        self._token = token_json["access_token"]
+        self._lifetime = timedelta(seconds=token_json["expires_in"])
+        self._expires = datetime.now(timezone.utc) + self._lifetime
+        logger.info(f"Got a new Jamf API token, valid until {self._expires.isoformat()}")
+        self._save_cache()
+
+    def _load_cache(self):
+        if not self._cache_path or not os.path.exists(self._cache_path):
+            return
+        try:
+            with open(self._cache_path) as f:
+                cached = json.load(f)
+            if cached["key"] != self.cache_key:
+                return
+            self._token = cached["token"]
+            self._expires = datetime.fromisoformat(cached["expires"])
+            self._lifetime = timedelta(seconds=cached["lifetime"])
+        except (OSError, ValueError, KeyError):
+            # A damaged cache just means getting a new token
+            self._token = None
+
+    def _save_cache(self):
+        if not self._cache_path:
+            return
+        cached = {
+            "key": self.cache_key,
+            "token": self._token,
+            "expires": self._expires.isoformat(),
+            "lifetime": self._lifetime.total_seconds(),
+        }
+        # Write a temporary file readable only by the current user next to the cache, then move it into place,
+        # so another script reading the cache at the same time never sees a half written file
+        directory = os.path.dirname(os.path.abspath(self._cache_path))
+        fd, temporary = tempfile.mkstemp(dir=directory, prefix=".token-", suffix=".tmp")
+        try:
+            # mkstemp already creates the file as 0600, make sure of it whatever the umask
+            os.fchmod(fd, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump(cached, f)
+            os.replace(temporary, self._cache_path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def __call__(self, r):
+        token = self.token()
+        r.headers["Authorization"] = f"Bearer {token}"
+        r.register_hook("response", self._retry_unauthorized)
+        return r
+
+    def _retry_unauthorized(self, response, **kwargs):
+        # Jamf rejected the token (revoked, or expired early), get a new one and send the request once more
+        # The second attempt goes straight to the connection, so this hook never runs for it
+        if response.status_code != 401:
+            return response
+        rejected = response.request.headers["Authorization"][len("Bearer "):]
+        token = self.token(stale=rejected)
+        # Read and release the connection before sending the request again
+        response.content
+        response.close()
+        retry = response.request.copy()
+        retry.headers["Authorization"] = f"Bearer {token}"
+        retried = response.connection.send(retry, **kwargs)
+        retried.history.append(response)
+        retried.request = retry
+        return retried
+
+
+def shared_session(auth, pool_size=None):
+    # One keep-alive connection pool big enough for every worker to have a connection
+    pool_size = pool_size or max(10, worker_count())
+    session = requests.Session()
+    # Serves repeated GETs of slowly changing data from JAMF_HTTP_CACHE if it is set, kept apart per Jamf URL and client
+    adapter = caching_adapter(scope=auth.cache_key, pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.auth = auth
+    auth.session = session
+    # Record per-endpoint metrics for every request, see jamf_helpers/metrics.py
+    instrument(session)
+    # Time requests by phase when run with --profile, see jamf_helpers/profiling.py
+    profiling.instrument(session)
+    return session
+
+
+def _client(cls, base_url, session):
+    # Build a Classic or Pro client with its own constructor, so it sets up whatever state the wrapper needs,
+    # then swap in the shared session. The constructor would authenticate on its own, so while it runs the
+    # wrapper's auth class hands back the shared auth instead
+    with _build_lock:
+        wrapper_auth = request_builder.JamfAuth
+        request_builder.JamfAuth = lambda *args, **kwargs: session.auth
+        try:
+            client = cls(base_url, None, None, client=True)
+        finally:
+            request_builder.JamfAuth = wrapper_auth
+    client.session.close()
+    client.session = session
+    return client
+
+
+def connect(base_url, client_id, client_secret, throttled=True):
+    # Returns (classic, pro) clients sharing one token and one connection pool
+    # Both are wrapped in ThrottledClient unless throttled is False
+    auth = ClientCredentialsAuth(base_url, client_id, client_secret)
+    session = shared_session(auth)
+    # Authenticate now so bad credentials fail straight away, like Classic(...) and Pro(...) do
+    auth.token()
+    classic = _client(Classic, base_url, session)
+    pro = _client(Pro, base_url, session)
+    if throttled:
+        return ThrottledClient(classic), ThrottledClient(pro)
+    return classic, pro
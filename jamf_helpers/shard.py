@@ -0,0 +1,76 @@
+"""
+Splits a sweep over several processes or CI matrix jobs, each working on its own share of the devices.
+
+Run each job with --shard I/N (or JAMF_SHARD=I/N), I from 1 to N. A device belongs to the shard its JSS ID falls
+in modulo N, so every device is worked on by exactly one shard and the shards get about the same number of
+devices, whatever order Jamf lists them in. Every shard still reads the device list, only the per-device reads and
+updates are split.
+
+While a shard is active, the journal, plan file and metrics files get the shard in their name, e.g.
+Action-Jamf_Pro_API-UnmanageComputers.shard-3-of-8.journal.jsonl, so the shards never write the same file.
+Combine the files from every shard into one summary with: python3 -m jamf_helpers.merge_shards DIRECTORY...
+"""
+
+from collections import namedtuple
+import argparse
+import os
+import zlib
+
+Shard = namedtuple("Shard", ["index", "count"])
+
+_active = None
+
+
+def parse_shard(text):
+    # Parse "I/N" into a Shard, e.g. "3/8" is the third of eight shards
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard must look like 3/8, not {text!r}")
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard {text} is out of range, use 1/N to N/N")
+    return Shard(index, count)
+
+
+def activate(shard):
+    # Make shard the one this process works on, None for every device
+    global _active
+    _active = shard if shard is not None and shard.count > 1 else None
+
+
+def active_shard():
+    return _active
+
+
+def in_shard(device_id, shard):
+    # Decide which shard a device belongs to from its JSS ID alone, so every job agrees
+    try:
+        number = int(device_id)
+    except (TypeError, ValueError):
+        number = zlib.crc32(str(device_id).encode())
+    return number % shard.count == shard.index - 1
+
+
+def shard_devices(devices, shard=None):
+    # Only the devices in the shard, or every device if no shard is active
+    shard = shard or _active
+    if shard is None:
+        return devices
+    return (device for device in devices if in_shard(device["id"], shard))
+
+
+def shard_ids(ids, shard=None):
+    shard = shard or _active
+    if shard is None:
+        return list(ids)
+    return [device_id for device_id in ids if in_shard(device_id, shard)]
+
+
+def sharded_path(path, shard=None):
+    # Put the shard in a file name, e.g. change_plan.jsonl becomes change_plan.shard-3-of-8.jsonl
+    shard = shard or _active
+    if shard is None or not path:
+        return path
+    directory, name = os.path.split(path)
+    stem, dot, extension = name.partition(".")
+    return os.path.join(directory, f"{stem}.shard-{shard.index}-of-{shard.count}{dot}{extension}")
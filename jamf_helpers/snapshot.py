@@ -0,0 +1,220 @@
+"""
+A local SQLite snapshot of computer inventory, kept up to date with incremental syncs.
+
+Only a few percent of computers change between runs, so instead of re-reading the whole fleet every time, the
+snapshot remembers the newest inventory report date it has seen and the next sync only asks Jamf for computers
+that have reported since then. The xEA scripts then work out their changes from the snapshot, and only call
+Jamf to write the values that actually changed.
+
+Changing a computer's site in the Jamf UI doesn't update its report date, so the snapshot does a full sync
+when it is older than JAMF_SNAPSHOT_MAX_AGE_HOURS (default one week) to pick up anything an incremental sync missed.
+
+The unmanage scripts keep the last managed state they saw for each device in the same file (device_state), so a
+repeat run over a static group skips the members already known to be unmanaged and only reads the new ones.
+Those are checked again once their state is older than JAMF_SNAPSHOT_MAX_AGE_HOURS, in case one was re-enrolled.
+"""
+
+from datetime import datetime, timedelta, timezone
+from jamf_helpers.inventory import DEFAULT_PAGE_SIZE, iter_computer_inventory
+from jamf_helpers.listing import iter_computers
+from jamf_helpers.records import DeviceRecord, from_inventory
+import json
+import os
+import sqlite3
+import threading
+
+# Everything the xEA scripts need: site and Extension Attributes from General, Model Identifier from Hardware,
+# and the Extension Attributes displayed in the Operating System section
+SYNC_SECTIONS = ["GENERAL", "HARDWARE", "OPERATING_SYSTEM", "EXTENSION_ATTRIBUTES"]
+# Do a full sync when the last full sync is older than this
+MAX_AGE = timedelta(hours=float(os.environ.get("JAMF_SNAPSHOT_MAX_AGE_HOURS", 24 * 7)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS devices (
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT,
+    site TEXT,
+    model_identifier TEXT,
+    managed INTEGER,
+    report_date TEXT,
+    extension_attributes TEXT NOT NULL DEFAULT '{}',
+    PRIMARY KEY (kind, id)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    kind TEXT PRIMARY KEY,
+    last_report_date TEXT,
+    last_full_sync TEXT
+);
+CREATE TABLE IF NOT EXISTS device_state (
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    managed INTEGER,
+    report_date TEXT,
+    checked TEXT NOT NULL,
+    PRIMARY KEY (kind, id)
+);
+"""
+
+
+class InventorySnapshot:
+    """
+    SQLite store holding each device's ID, name, site, Model Identifier, managed state, report date and
+    Extension Attribute values. Safe to share between worker threads.
+
+    :param path: Path of the SQLite database file, it is created if it doesn't exist
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def sync_state(self, kind):
+        # Returns (newest report date seen, time of the last full sync) for a kind of device
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_report_date, last_full_sync FROM sync_state WHERE kind = ?", (kind,)
+            ).fetchone()
+        return (row["last_report_date"], row["last_full_sync"]) if row else (None, None)
+
+    def save_sync_state(self, kind, last_report_date, last_full_sync):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (kind, last_report_date, last_full_sync) VALUES (?, ?, ?)",
+                (kind, last_report_date, last_full_sync),
+            )
+
+    def upsert(self, kind, devices):
+        # Add or replace devices, each a DeviceRecord
+        rows = [
+            (
+                kind,
+                str(device.id),
+                device.name,
+                device.site,
+                device.model_identifier,
+                None if device.managed is None else int(bool(device.managed)),
+                device.report_date,
+                json.dumps(device.extension_attributes or {}),
+            )
+            for device in devices
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO devices VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def prune(self, kind, keep_ids):
+        # Remove devices that no longer exist in Jamf
+        keep_ids = {str(device_id) for device_id in keep_ids}
+        with self._lock, self._conn:
+            existing = [row["id"] for row in self._conn.execute("SELECT id FROM devices WHERE kind = ?", (kind,))]
+            removed = [(kind, device_id) for device_id in existing if device_id not in keep_ids]
+            self._conn.executemany("DELETE FROM devices WHERE kind = ? AND id = ?", removed)
+        return len(removed)
+
+    def devices(self, kind):
+        # Returns every device of a kind as a list of DeviceRecords, ordered by ID
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM devices WHERE kind = ? ORDER BY CAST(id AS INTEGER)", (kind,)
+            ).fetchall()
+        return [
+            DeviceRecord(
+                row["id"],
+                name=row["name"],
+                site=row["site"],
+                model_identifier=row["model_identifier"],
+                managed=None if row["managed"] is None else bool(row["managed"]),
+                report_date=row["report_date"],
+                extension_attributes=json.loads(row["extension_attributes"]),
+            )
+            for row in rows
+        ]
+
+    def save_state(self, kind, device_id, managed, report_date=None):
+        # Remember a device's managed state as just read from, or written to, Jamf
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO device_state VALUES (?, ?, ?, ?, ?)",
+                (
+                    kind,
+                    str(device_id),
+                    None if managed is None else int(bool(managed)),
+                    report_date,
+                    datetime.now(timezone.utc).isoformat(),
+                ),
+            )
+
+    def known_unmanaged(self, kind, max_age=MAX_AGE):
+        # IDs of devices last seen unmanaged, as long as that was less than max_age ago
+        checked_after = (datetime.now(timezone.utc) - max_age).isoformat()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM device_state WHERE kind = ? AND managed = 0 AND checked > ?", (kind, checked_after)
+            ).fetchall()
+        return {row["id"] for row in rows}
+
+    def set_extension_attribute(self, kind, device_id, definition_id, value):
+        # Record an Extension Attribute value after it has been written to Jamf
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT extension_attributes FROM devices WHERE kind = ? AND id = ?", (kind, str(device_id))
+            ).fetchone()
+            if row is None:
+                return
+            extension_attributes = json.loads(row["extension_attributes"])
+            extension_attributes[str(definition_id)] = value
+            self._conn.execute(
+                "UPDATE devices SET extension_attributes = ? WHERE kind = ? AND id = ?",
+                (json.dumps(extension_attributes), kind, str(device_id)),
+            )
+
+
+def without_known(devices, known_ids, skipped):
+    # Leave out devices whose ID is in known_ids, counting them in skipped
+    for device in devices:
+        if str(device.id) in known_ids:
+            skipped.append(device.id)
+        else:
+            yield device
+
+
+def sync_computers(snapshot, pro, classic=None, page_size=DEFAULT_PAGE_SIZE, full=False):
+    # Bring the snapshot up to date with Jamf, only reading computers whose report date changed since the last sync
+    # If classic is given, computers deleted from Jamf are removed from the snapshot with one extra request
+    # Returns the number of computers read from Jamf
+    last_report_date, last_full_sync = snapshot.sync_state("computer")
+    now = datetime.now(timezone.utc)
+    if last_full_sync is None or now - datetime.fromisoformat(last_full_sync) > MAX_AGE:
+        full = True
+
+    # Ask for computers that reported at or after the newest report date we've already seen
+    # Using >= means a computer that reported in the same second isn't missed, at the cost of re-reading a few
+    filter = None if full or not last_report_date else f'general.reportDate>="{last_report_date}"'
+    seen_ids = []
+    batch = []
+    newest = None if full else last_report_date
+    for record in iter_computer_inventory(pro, section=SYNC_SECTIONS, page_size=page_size, filter=filter):
+        device = from_inventory(record)
+        seen_ids.append(device.id)
+        batch.append(device)
+        if device.report_date and (newest is None or device.report_date > newest):
+            newest = device.report_date
+        if len(batch) >= page_size:
+            snapshot.upsert("computer", batch)
+            batch = []
+    snapshot.upsert("computer", batch)
+
+    if full:
+        snapshot.prune("computer", seen_ids)
+    elif classic is not None:
+        snapshot.prune("computer", [computer.id for computer in iter_computers(classic)])
+
+    snapshot.save_sync_state("computer", newest, now.isoformat() if full else last_full_sync)
+    return len(seen_ids)
@@ -0,0 +1,128 @@
+"""
+Turns Jamf Pro webhook events into debounced batches of devices to update.
+
+A Mac or mobile device can send several inventory reports in a few minutes (enrollment, then a policy, then a
+recon), and each one fires a webhook. The Debouncer collects the devices named in the events and only hands a
+device on once no new event for it has arrived for JAMF_WEBHOOK_DEBOUNCE_SECONDS (default 30), so a burst of
+events for one device becomes one read and at most one update. A device that keeps sending events is still handed
+on once JAMF_WEBHOOK_MAX_DELAY_SECONDS (default 300) has passed since its first event. Devices that are due at
+the same time are handed on together as one batch.
+
+The Jamf Pro webhook payloads look like (see the samples folder):
+    {"webhook": {"webhookEvent": "ComputerInventoryCompleted", ...}, "event": {"computer": {"jssID": 12, ...}}}
+    {"webhook": {"webhookEvent": "MobileDeviceInventoryCompleted", ...}, "event": {"jssID": 34, ...}}
+"""
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEBOUNCE_SECONDS = float(os.environ.get("JAMF_WEBHOOK_DEBOUNCE_SECONDS", 30))
+MAX_DELAY_SECONDS = float(os.environ.get("JAMF_WEBHOOK_MAX_DELAY_SECONDS", 300))
+
+# The webhook events that can change a computed Extension Attribute, and the kind of device they are about
+EVENTS = {
+    "ComputerAdded": "computer",
+    "ComputerInventoryCompleted": "computer",
+    "MobileDeviceEnrolled": "mobile_device",
+    "MobileDeviceInventoryCompleted": "mobile_device",
+}
+
+
+def device_from_event(payload):
+    # Returns (kind, JSS ID) of the device a webhook payload is about, or None for events that aren't handled
+    # Raises ValueError if the payload doesn't look like a Jamf Pro webhook
+    try:
+        event_name = payload["webhook"]["webhookEvent"]
+        event = payload["event"]
+    except (KeyError, TypeError):
+        raise ValueError("not a Jamf Pro webhook payload")
+    if not isinstance(event, dict):
+        raise ValueError("not a Jamf Pro webhook payload, event isn't an object")
+    kind = EVENTS.get(event_name)
+    if kind is None:
+        return None
+    # Computer inventory events nest the computer, the other events have the device at the top of the event
+    device = event.get("computer") or event
+    if not isinstance(device, dict) or device.get("jssID") is None:
+        raise ValueError(f"{event_name} event has no jssID")
+    try:
+        return kind, int(device["jssID"])
+    except (TypeError, ValueError):
+        raise ValueError(f"{event_name} event has a jssID that isn't a number: {device['jssID']!r}")
+
+
+class Debouncer:
+    """
+    Collects devices from events and calls handle(batch) on a background thread with the list of (kind, JSS ID)
+    that have gone quiet, each device once however many events it had.
+
+    :param handle: Function called with each batch
+    :param delay: Seconds without a new event before a device is handed on
+    :param max_delay: Most seconds a device waits after its first event
+    """
+
+    def __init__(self, handle, delay=DEBOUNCE_SECONDS, max_delay=MAX_DELAY_SECONDS):
+        self.handle = handle
+        self.delay = delay
+        self.max_delay = max_delay
+        self.events = 0
+        self.handed_on = 0
+        # {(kind, JSS ID): (time of first event, time due)}
+        self._pending = {}
+        self._closing = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, device):
+        # Note an event for a device, pushing back when it is handed on
+        with self._condition:
+            now = time.monotonic()
+            first = self._pending[device][0] if device in self._pending else now
+            self._pending[device] = (first, min(now + self.delay, first + self.max_delay))
+            self.events += 1
+            self._condition.notify()
+
+    def pending(self):
+        with self._condition:
+            return len(self._pending)
+
+    def _next_batch(self):
+        # Wait until some devices are due, or until closing, then take them out of the pending devices
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if self._closing:
+                    due = list(self._pending)
+                else:
+                    due = [device for device, (_, due_at) in self._pending.items() if due_at <= now]
+                if due or self._closing:
+                    for device in due:
+                        del self._pending[device]
+                    return due
+                wait = min(due_at for _, due_at in self._pending.values()) - now if self._pending else None
+                self._condition.wait(wait)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self.handed_on += len(batch)
+                try:
+                    self.handle(batch)
+                except Exception:
+                    # Keep receiving events, the devices get another chance with their next event
+                    logger.exception(f"Failed to handle a batch of {len(batch)} devices")
+            elif self._closing:
+                return
+
+    def close(self):
+        # Hand on every pending device now and wait for the last batch to finish
+        with self._condition:
+            self._closing = True
+            self._condition.notify()
+        self._thread.join()
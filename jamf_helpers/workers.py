@@ -0,0 +1,74 @@
+"""
+A small worker pool for running the per-device steps of the Action scripts concurrently.
+
+Each device is handed to a function running on a thread pool, so the network wait for one device's GET and
+PATCH/PUT overlaps with the others. Results are handed back in the same order the devices went in, so the output
+of a run reads the same no matter how many workers are used. See results.py for how they are written out.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+# Number of devices to work on at once, can be changed with the JAMF_WORKERS environment variable
+DEFAULT_WORKERS = 4
+
+
+def worker_count():
+    # Get the number of workers from the environment, always use at least one
+    return max(1, int(os.environ.get("JAMF_WORKERS", DEFAULT_WORKERS)))
+
+
+def run_concurrently(func, items, workers=None):
+    # Run func(item) for every item on a pool of worker threads
+    # Yields (item, result, error) in the same order as items, error is any exception func didn't handle itself
+    # so one bad device doesn't stop the rest of the run
+    workers = workers or worker_count()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append((item, executor.submit(func, item)))
+            # Only keep a bounded number of devices in flight, items can be a generator over the whole fleet
+            if len(pending) >= workers * 2:
+                yield _collect(*pending.popleft())
+        while pending:
+            yield _collect(*pending.popleft())
+
+
+def _collect(item, future):
+    # Wait for a device to finish and hand back its result or error
+    try:
+        return item, future.result(), None
+    except Exception as err:
+        return item, None, err
+
+
+class DeviceResult:
+    """
+    What happened to one device, handed back from a worker so the main thread can report it in order.
+
+    :param device_id: JSS ID of the device
+    """
+
+    def __init__(self, device_id):
+        self.device_id = device_id
+        # unchanged, updated or error
+        self.status = "unchanged"
+        # Lines to print for this device
+        self.lines = []
+        # Lines to add to the GitHub summary for this device
+        self.summary = []
+        # The error, grouped with the same errors on other devices in the GitHub summary
+        self.error_message = None
+
+    def updated(self, line):
+        self.status = "updated"
+        self.lines.append(line)
+
+    def error(self, *lines, summary=None):
+        self.status = "error"
+        self.lines.extend(lines)
+        self.error_message = lines[-1] if lines else None
+        if summary:
+            self.summary.append(summary)
+
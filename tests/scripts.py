@@ -0,0 +1,15 @@
+# Loads the Action scripts as modules, their file names aren't valid module names
+import importlib.util
+import os
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+
+
+def load_script(filename, monkeypatch, **environ):
+    # Import a script with the given environment variables set, without running its main()
+    for name, value in environ.items():
+        monkeypatch.setenv(name, value)
+    spec = importlib.util.spec_from_file_location(filename.replace("-", "_")[:-3], os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
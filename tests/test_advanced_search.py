@@ -0,0 +1,84 @@
+from jamf_helpers.advanced_search import result_key, search_devices, search_results
+from jps_api_wrapper.request_builder import NotFound
+import xml.etree.ElementTree as ET
+
+EXTENSION_ATTRIBUTES = {"9": "Jamf Site"}
+
+
+class FakeClassic:
+    # Keeps advanced searches by name and answers them with the given results, the way the Classic API shapes them
+    def __init__(self, results_key, results):
+        self.results_key = results_key
+        self.results = results
+        self.searches = {}
+        self.writes = []
+
+    def _get(self, root, name):
+        if name not in self.searches:
+            raise NotFound("Not Found")
+        search = {
+            "id": 1,
+            "name": name,
+            "view_as": "Standard Web Page",
+            "criteria": [],
+            "display_fields": [{"name": field} for field in self.searches[name]],
+            self.results_key: self.results,
+        }
+        return {root: search}
+
+    def _save(self, data, id):
+        root = ET.fromstring(data)
+        self.writes.append(root.tag)
+        self.searches[root.findtext("name")] = [field.findtext("name") for field in root.iterfind("display_fields/display_field")]
+
+    def get_advanced_computer_search(self, name):
+        return self._get("advanced_computer_search", name)
+
+    def get_advanced_mobile_device_search(self, name):
+        return self._get("advanced_mobile_device_search", name)
+
+    create_advanced_computer_search = update_advanced_computer_search = _save
+    create_advanced_mobile_device_search = update_advanced_mobile_device_search = _save
+
+
+def test_computer_results():
+    classic = FakeClassic("computers", [
+        {"id": 1, "name": "MAC-1", "Site": "Main", "Jamf_Site": "Old"},
+        {"id": 2, "name": "MAC-2", "Site": "None", "Jamf_Site": ""},
+    ])
+    devices = search_results(classic, "computer", "xEA inputs", EXTENSION_ATTRIBUTES)
+    assert classic.writes == ["advanced_computer_search"]
+    assert classic.searches["xEA inputs"] == ["Site", "Jamf Site"]
+    assert [(device.id, device.name, device.site, device.extension_attributes) for device in devices] == [
+        (1, "MAC-1", "Main", {"9": "Old"}),
+        (2, "MAC-2", "None", {"9": ""}),
+    ]
+
+
+def test_mobile_device_results():
+    classic = FakeClassic("mobile_devices", [{"id": 5, "name": "iPad", "Site": "Main", "Jamf_Site": "Main"}])
+    devices = search_results(classic, "mobile_device", "xEA inputs", EXTENSION_ATTRIBUTES)
+    assert classic.writes == ["advanced_mobile_device_search"]
+    assert [(device.id, device.site, device.extension_attributes) for device in devices] == [(5, "Main", {"9": "Main"})]
+
+
+def test_existing_search_is_reused_and_extended():
+    classic = FakeClassic("computers", [])
+    classic.searches["xEA inputs"] = ["Site", "Jamf Site"]
+    assert search_results(classic, "computer", "xEA inputs", EXTENSION_ATTRIBUTES) == []
+    assert classic.writes == []
+    search_results(classic, "computer", "xEA inputs", {"9": "Jamf Site", "10": "macOS Latest"})
+    assert classic.writes == ["advanced_computer_search"]
+
+
+def test_results_are_the_only_other_list():
+    search = {"criteria": [], "display_fields": [{"name": "Site"}], "results": [{"id": 1}]}
+    assert search_devices(search, "computer") == [{"id": 1}]
+    assert search_devices({"criteria": [], "display_fields": []}, "computer") == []
+
+
+def test_result_key_matches_the_keys_jamf_sent():
+    assert result_key("Jamf Site") == "Jamf_Site"
+    assert result_key("Jamf Site", ["id", "Jamf_Site"]) == "Jamf_Site"
+    assert result_key("macOS (Latest)", ["id", "macOS_Latest_"]) == "macOS_Latest_"
+    assert result_key("Jamf Site", ["id", "jamf_site"]) == "jamf_site"
@@ -0,0 +1,55 @@
+import xml.etree.ElementTree as ET
+
+from jamf_helpers.coalesce import PendingUpdate
+
+
+class FakeClassic:
+    def __init__(self):
+        self.calls = []
+
+    def update_computer(self, id, data):
+        self.calls.append(("computer", id, data))
+
+    def update_mobile_device(self, id, data):
+        self.calls.append(("mobile_device", id, data))
+
+
+def test_every_change_goes_in_one_document():
+    update = PendingUpdate("computer")
+    update.set("general/remote_management/managed", False)
+    update.set("general/remote_management/management_username", None)
+    update.set_extension_attribute(9, "2024-01-01")
+    root = ET.fromstring(update.to_xml())
+    assert root.tag == "computer"
+    # Fields sharing a parent are nested under one element
+    assert len(root.findall("general")) == 1
+    assert root.findtext("general/remote_management/managed") == "false"
+    assert root.findtext("general/remote_management/management_username") == ""
+    assert root.findtext("extension_attributes/extension_attribute/id") == "9"
+    assert root.findtext("extension_attributes/extension_attribute/value") == "2024-01-01"
+
+
+def test_values_are_escaped():
+    update = PendingUpdate("computer")
+    update.set_extension_attribute(1, "R&D <Lab>")
+    assert ET.fromstring(update.to_xml()).findtext("extension_attributes/extension_attribute/value") == "R&D <Lab>"
+
+
+def test_send_uses_one_put_for_the_device_kind():
+    classic = FakeClassic()
+    computer = PendingUpdate("computer")
+    computer.set("general/remote_management/managed", False)
+    computer.set_extension_attribute(9, "today")
+    computer.send(classic, 5)
+    mobile_device = PendingUpdate("mobile_device")
+    mobile_device.set("general/managed", False)
+    mobile_device.send(classic, 6)
+    assert [(kind, device_id) for kind, device_id, _ in classic.calls] == [("computer", 5), ("mobile_device", 6)]
+
+
+def test_nothing_is_sent_without_changes():
+    classic = FakeClassic()
+    update = PendingUpdate("computer")
+    assert not update
+    assert update.send(classic, 5) is None
+    assert classic.calls == []
@@ -0,0 +1,70 @@
+from jamf_helpers import commands
+from jamf_helpers.commands import send_chunk
+from jps_api_wrapper.request_builder import RequestTimedOut
+import pytest
+import requests
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f"{status} Error", response=response)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(commands, "backoff", lambda attempt, wait=None: 0)
+
+
+class FakeClassic:
+    # Raises errors from a list in turn, then accepts the command, or rejects chunks over max_ids with a 414
+    def __init__(self, errors=(), max_ids=None):
+        self.errors = list(errors)
+        self.max_ids = max_ids
+        self.sent = []
+
+    def create_mobile_device_command(self, command, ids):
+        if self.max_ids is not None and len(ids) > self.max_ids:
+            raise http_error(414)
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append(list(ids))
+
+
+def test_chunk_is_sent():
+    classic = FakeClassic()
+    assert send_chunk(classic, "UnmanageDevice", [1, 2, 3]) == ([1, 2, 3], [], [])
+
+
+@pytest.mark.parametrize("error", [http_error(429), http_error(503), RequestTimedOut("502"), requests.exceptions.ConnectionError()])
+def test_throttling_and_server_errors_are_retried(error):
+    classic = FakeClassic([error, error])
+    assert send_chunk(classic, "UnmanageDevice", [1, 2]) == ([1, 2], [], [])
+    assert classic.sent == [[1, 2]]
+
+
+def test_client_error_is_not_retried():
+    classic = FakeClassic([http_error(404)])
+    sent, failed, errors = send_chunk(classic, "UnmanageDevice", [1, 2])
+    assert sent == [] and failed == [1, 2] and len(errors) == 1
+    assert classic.sent == []
+
+
+def test_retries_give_up_after_the_limit():
+    classic = FakeClassic([http_error(503)] * 10)
+    sent, failed, errors = send_chunk(classic, "UnmanageDevice", [1, 2], retries=2)
+    assert sent == [] and failed == [1, 2]
+    assert len(classic.errors) == 7
+
+
+def test_chunk_with_url_too_long_is_split():
+    classic = FakeClassic(max_ids=2)
+    sent, failed, errors = send_chunk(classic, "UnmanageDevice", [1, 2, 3, 4, 5])
+    assert sent == [1, 2, 3, 4, 5] and failed == [] and errors == []
+    assert all(len(ids) <= 2 for ids in classic.sent)
+
+
+def test_single_device_with_url_too_long_fails():
+    classic = FakeClassic(max_ids=0)
+    sent, failed, errors = send_chunk(classic, "UnmanageDevice", [1])
+    assert sent == [] and failed == [1]
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from jamf_helpers import compatibility
+from jamf_helpers.compatibility import FALLBACK, MISSING, latest_supported_macos, load_rules
+
+
+@pytest.mark.parametrize("model, expected", [
+    ("MacBookPro18,1", "macOS 15 Sequoia"),
+    ("Mac14,2", "macOS 15 Sequoia"),
+    ("iMac18,3", "macOS 13 Ventura"),
+    ("MacBookPro13,1", "macOS 12 Monterey"),
+    ("MacBookAir6,2", "macOS 11 Big Sur"),
+    ("VirtualMac2,1", "Virtual Mac"),
+    ("MacBookPro8,1", FALLBACK),
+])
+def test_latest_supported_macos(model, expected):
+    assert latest_supported_macos(model) == expected
+
+
+def test_missing_model():
+    assert latest_supported_macos(None) == MISSING
+
+
+def test_results_are_cached_per_model():
+    latest_supported_macos.cache_clear()
+    latest_supported_macos("Mac14,2")
+    latest_supported_macos("Mac14,2")
+    assert latest_supported_macos.cache_info().hits == 1
+
+
+def test_rules_file_is_ordered_newest_first(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({
+        "version": 7,
+        "missing": "Missing",
+        "fallback": "Older",
+        "rules": [{"name": "New", "pattern": "^Mac2\\d,"}, {"name": "Old", "pattern": "^Mac"}],
+    }))
+    version, rules, missing, fallback = load_rules(str(path))
+    assert (version, missing, fallback) == (7, "Missing", "Older")
+    assert [name for name, _ in rules] == ["New", "Old"]
+    assert rules[0][1].search("Mac21,1")
+
+
+def test_shipped_rules_load():
+    assert compatibility.RULES_VERSION >= 1
+    assert compatibility.RULES[0][0].startswith("macOS")
@@ -0,0 +1,144 @@
+from jamf_helpers import http_cache
+from jamf_helpers.http_cache import CachingAdapter, ResponseCache, ttl_for
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+import io
+import pytest
+import requests
+
+JAMF = "https://jamf.example.com"
+LISTING = f"{JAMF}/JSSResource/mobiledevices"
+
+
+class FakeJamf:
+    # Stands in for the network under the caching adapter, answering every request with the next body
+    def __init__(self):
+        self.requests = []
+        self.version = 0
+        self.etag = None
+
+    def send(self, adapter, request, stream=False, **kwargs):
+        self.requests.append(request)
+        if self.etag and request.headers.get("If-None-Match") == self.etag:
+            return self.response(request, 304, b"")
+        self.version += 1
+        headers = {"Content-Type": "application/xml"}
+        if self.etag:
+            headers["ETag"] = self.etag
+        return self.response(request, 200, f"<mobile_devices>{self.version}</mobile_devices>".encode(), headers)
+
+    def response(self, request, status, body, headers=None):
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers or {})
+        response.raw = HTTPResponse(body=io.BytesIO(body), status=status, preload_content=False)
+        response.request = request
+        response.url = request.url
+        return response
+
+
+@pytest.fixture
+def jamf(monkeypatch):
+    fake = FakeJamf()
+    monkeypatch.setattr(HTTPAdapter, "send", lambda adapter, request, **kwargs: fake.send(adapter, request, **kwargs))
+    monkeypatch.setattr(http_cache, "TTL_OVERRIDE", None)
+    return fake
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    yield cache
+    cache.close()
+
+
+def get(adapter, url, **headers):
+    request = requests.Request("GET", url, headers={"Accept": "application/xml", **headers}).prepare()
+    response = adapter.send(request)
+    return response.content
+
+
+def post(adapter, url):
+    return adapter.send(requests.Request("POST", url, data="<command/>").prepare())
+
+
+def test_only_slowly_changing_endpoints_are_cached():
+    assert ttl_for(LISTING) == 15 * 60
+    assert ttl_for(f"{JAMF}/JSSResource/mobiledevicegroups/id/1") == 15 * 60
+    assert ttl_for(f"{JAMF}/JSSResource/sites") == 6 * 60 * 60
+    assert ttl_for(f"{JAMF}/JSSResource/mobiledevices/id/5") is None
+    assert ttl_for(f"{JAMF}/api/v2/mobile-devices/5/detail") is None
+
+
+def test_repeated_get_is_served_from_the_cache(jamf, cache):
+    adapter = CachingAdapter(cache)
+    first = get(adapter, LISTING)
+    assert get(adapter, LISTING) == first
+    assert len(jamf.requests) == 1
+
+
+def test_no_cache_request_goes_to_jamf_and_refreshes_the_cache(jamf, cache):
+    adapter = CachingAdapter(cache)
+    get(adapter, LISTING)
+    fresh = get(adapter, LISTING, **{"Cache-Control": "no-cache"})
+    assert len(jamf.requests) == 2
+    # The fresh response replaced the cached one
+    assert get(adapter, LISTING) == fresh
+    assert len(jamf.requests) == 2
+
+
+def test_write_drops_the_cached_collection(jamf, cache):
+    adapter = CachingAdapter(cache)
+    get(adapter, LISTING)
+    post(adapter, f"{JAMF}/JSSResource/mobiledevices/id/5")
+    get(adapter, LISTING)
+    assert [request.method for request in jamf.requests] == ["GET", "POST", "GET"]
+
+
+def test_mdm_command_drops_the_cached_device_listing(jamf, cache):
+    adapter = CachingAdapter(cache)
+    get(adapter, LISTING)
+    get(adapter, f"{JAMF}/JSSResource/computers")
+    post(adapter, f"{JAMF}/JSSResource/mobiledevicecommands/command/UnmanageDevice/id/1,2")
+    get(adapter, LISTING)
+    get(adapter, f"{JAMF}/JSSResource/computers")
+    # The mobile device listing was read again, the computer listing is still cached
+    assert [request.url for request in jamf.requests].count(LISTING) == 2
+    assert len(jamf.requests) == 4
+
+
+def test_failed_write_keeps_the_cache(jamf, cache, monkeypatch):
+    adapter = CachingAdapter(cache)
+    first = get(adapter, LISTING)
+    monkeypatch.setattr(HTTPAdapter, "send", lambda adapter, request, **kwargs: jamf.response(request, 500, b""))
+    post(adapter, f"{JAMF}/JSSResource/mobiledevices/id/5")
+    # Served from the cache, Jamf would have answered 500 again
+    assert get(adapter, LISTING) == first
+
+
+def test_clients_with_different_scopes_do_not_share_responses(jamf, cache):
+    get(CachingAdapter(cache, scope="client-a"), LISTING)
+    get(CachingAdapter(cache, scope="client-b"), LISTING)
+    get(CachingAdapter(cache, scope="client-a"), LISTING)
+    assert len(jamf.requests) == 2
+
+
+def test_expired_response_is_revalidated_with_its_etag(jamf, cache, monkeypatch):
+    monkeypatch.setattr(http_cache, "TTL_OVERRIDE", "0")
+    jamf.etag = '"v1"'
+    adapter = CachingAdapter(cache)
+    first = get(adapter, LISTING)
+    assert get(adapter, LISTING) == first
+    assert jamf.requests[1].headers["If-None-Match"] == '"v1"'
+    assert jamf.version == 1
+
+
+def test_least_recently_used_responses_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_bytes=25)
+    cache.put("a", f"{JAMF}/a", {}, b"x" * 10, 0)
+    cache.put("b", f"{JAMF}/b", {}, b"x" * 10, 0)
+    cache.get("a")
+    cache.put("c", f"{JAMF}/c", {}, b"x" * 10, 0)
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.get("b") is None
+    cache.close()
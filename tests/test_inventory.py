@@ -0,0 +1,83 @@
+from jamf_helpers.inventory import (
+    all_extension_attribute_values,
+    extension_attribute_value,
+    iter_computer_inventory,
+    iter_computer_inventory_pages,
+)
+from jamf_helpers.records import DeviceRecord
+from tests.scripts import load_script
+
+
+class FakePro:
+    # Serves computers-inventory pages from a list of records, recording the pages asked for
+    def __init__(self, count, missing=()):
+        self.records = [{"id": str(device_id), "general": {"name": f"MAC-{device_id}"}} for device_id in range(1, count + 1)]
+        self.missing = set(missing)
+        self.calls = []
+
+    def get_computer_inventories(self, section, page, page_size, sort, filter=None):
+        self.calls.append({"section": section, "page": page, "page_size": page_size, "sort": sort})
+        start = page * page_size
+        return {"totalCount": len(self.records), "results": self.records[start:start + page_size]}
+
+    def get_computer_inventory(self, id, section):
+        return None if int(id) in self.missing else {"id": str(id), "general": {"name": f"MAC-{id}", "site": {"name": "Main"}}}
+
+
+def test_pages_are_read_until_the_total_count():
+    pro = FakePro(5)
+    pages = list(iter_computer_inventory_pages(pro, page_size=2))
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [call["page"] for call in pro.calls] == [0, 1, 2]
+    # Sorted by ID so the pages don't shift underneath the sweep
+    assert all(call["sort"] == ["id:asc"] for call in pro.calls)
+
+
+def test_exact_multiple_of_page_size_stops_without_an_empty_page():
+    pro = FakePro(4)
+    assert [record["id"] for record in iter_computer_inventory(pro, page_size=2)] == ["1", "2", "3", "4"]
+    assert len(pro.calls) == 2
+
+
+def test_empty_inventory_costs_one_request():
+    pro = FakePro(0)
+    assert list(iter_computer_inventory(pro)) == []
+    assert len(pro.calls) == 1
+
+
+def test_sections_are_passed_as_a_list():
+    pro = FakePro(1)
+    list(iter_computer_inventory(pro, section=("GENERAL", "HARDWARE")))
+    assert pro.calls[0]["section"] == ["GENERAL", "HARDWARE"]
+    list(iter_computer_inventory(pro))
+    assert pro.calls[1]["section"] == ["GENERAL"]
+
+
+def test_extension_attribute_value_flattens_lists():
+    extension_attributes = [
+        {"definitionId": "5", "values": ["Main Campus"]},
+        {"definitionId": "6", "values": ["a", "b"]},
+        {"definitionId": "7", "values": None},
+    ]
+    assert extension_attribute_value(extension_attributes, 5) == "Main Campus"
+    assert extension_attribute_value(extension_attributes, "6") == "a, b"
+    assert extension_attribute_value(extension_attributes, 7) == ""
+    assert extension_attribute_value(extension_attributes, 8) == ""
+
+
+def test_extension_attributes_are_found_in_any_section():
+    record = {
+        "id": "1",
+        "extensionAttributes": [{"definitionId": "1", "values": ["top"]}],
+        "general": {"extensionAttributes": [{"definitionId": "2", "values": ["general"]}]},
+        "operatingSystem": {"extensionAttributes": [{"definitionId": "3", "values": []}]},
+    }
+    assert all_extension_attribute_values(record) == {"1": "top", "2": "general", "3": ""}
+
+
+def test_site_script_skips_a_computer_without_inventory(monkeypatch):
+    script = load_script("Action-Jamf_Pro_API-Update_xEA-Jamf-Site.py", monkeypatch, JAMF_xEA_ID="9", JAMF_xEA_NAME="Jamf Site")
+    pro = FakePro(0, missing=[3])
+    assert script.plan_computer(pro, DeviceRecord(3, name="MAC-3")) == []
+    changes = script.plan_computer(pro, DeviceRecord(4, name="MAC-4"))
+    assert [(change.field, change.new) for change in changes] == [("xEA:9", "Main")]
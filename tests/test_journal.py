@@ -0,0 +1,60 @@
+from jamf_helpers.journal import Journal, read_journal
+
+
+def test_resume_skips_finished_devices_and_retries_errors(tmp_path):
+    path = str(tmp_path / "sweep.journal.jsonl")
+    journal = Journal(path, "script.py")
+    journal.record(1, "updated")
+    journal.record(2, "unchanged")
+    journal.record(3, "error")
+    journal.close()
+
+    resumed = Journal(path, "script.py", resume=True)
+    assert resumed.done(1) and resumed.done("2")
+    assert not resumed.done(3)
+    assert not resumed.done(4)
+    assert resumed.sweep == journal.sweep
+    resumed.close()
+
+
+def test_without_resume_a_new_sweep_starts(tmp_path):
+    path = str(tmp_path / "sweep.journal.jsonl")
+    journal = Journal(path, "script.py")
+    journal.record(1, "updated")
+    journal.close()
+
+    fresh = Journal(path, "script.py")
+    assert not fresh.done(1)
+    fresh.close()
+    assert read_journal(path)[1] == {}
+
+
+def test_journal_from_another_script_is_not_resumed(tmp_path):
+    path = str(tmp_path / "sweep.journal.jsonl")
+    journal = Journal(path, "other.py")
+    journal.record(1, "updated")
+    journal.close()
+
+    resumed = Journal(path, "script.py", resume=True)
+    assert not resumed.done(1)
+    resumed.close()
+
+
+def test_cut_off_last_line_is_skipped_and_not_appended_to(tmp_path):
+    path = str(tmp_path / "sweep.journal.jsonl")
+    journal = Journal(path, "script.py")
+    journal.record(1, "updated")
+    journal.close()
+    # The job was killed while writing the next line
+    with open(path, "a") as f:
+        f.write('{"id": "2", "outc')
+
+    resumed = Journal(path, "script.py", resume=True)
+    assert resumed.done(1) and not resumed.done(2)
+    resumed.record(3, "updated")
+    resumed.close()
+
+    # The record written after the cut-off line survives the next resume
+    again = Journal(path, "script.py", resume=True)
+    assert again.done(1) and again.done(3)
+    again.close()
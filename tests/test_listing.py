@@ -0,0 +1,101 @@
+from jamf_helpers import listing
+from jamf_helpers.listing import iter_classic_list, iter_computers
+from jps_api_wrapper.request_builder import NotFound
+import pytest
+import requests
+import threading
+
+JAMF = "https://jamf.example.com"
+
+
+def computers_xml(count):
+    items = "".join(
+        f"<computer><id>{device_id}</id><name>MAC-{device_id}</name><managed>true</managed>"
+        f"<site><id>-1</id><name>None</name></site></computer>"
+        for device_id in range(1, count + 1)
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><computers><size>{count}</size>{items}</computers>'.encode()
+
+
+class ChunkedBody:
+    # A response body read a few bytes at a time, counting how much of it has been read
+    def __init__(self, body, chunk_bytes):
+        self.body = body
+        self.chunk_bytes = chunk_bytes
+        self.offset = 0
+        self.reads = 0
+        self.closed = threading.Event()
+
+    def read(self, amt=None, **kwargs):
+        self.reads += 1
+        data = self.body[self.offset:self.offset + self.chunk_bytes]
+        self.offset += len(data)
+        return data
+
+    def close(self):
+        self.closed.set()
+
+
+class FakeSession:
+    def __init__(self, status=200, body=b"", chunk_bytes=50):
+        self.status = status
+        self.raw = ChunkedBody(body, chunk_bytes)
+        self.requests = []
+
+    def get(self, url, headers=None, stream=False):
+        self.requests.append((url, headers, stream))
+        response = requests.Response()
+        response.status_code = self.status
+        response.raw = self.raw
+        response.url = url
+        return response
+
+
+class FakeClassic:
+    def __init__(self, session):
+        self.base_url = JAMF
+        self.session = session
+
+
+def test_items_are_parsed_across_chunk_boundaries():
+    session = FakeSession(body=computers_xml(3), chunk_bytes=7)
+    items = list(iter_classic_list(FakeClassic(session), "/JSSResource/computers", "computers", "computer"))
+    assert [item["id"] for item in items] == [1, 2, 3]
+    # Nested elements become dictionaries, ids are ints and true/false are bools
+    assert items[0] == {"id": 1, "name": "MAC-1", "managed": True, "site": {"id": -1, "name": "None"}}
+    url, headers, stream = session.requests[0]
+    assert url == f"{JAMF}/JSSResource/computers"
+    assert headers == {"Accept": "application/xml"} and stream
+
+
+def test_fresh_listing_skips_the_response_cache():
+    session = FakeSession(body=computers_xml(1))
+    list(iter_classic_list(FakeClassic(session), "/JSSResource/computers", "computers", "computer", fresh=True))
+    assert session.requests[0][1]["Cache-Control"] == "no-cache"
+
+
+def test_listing_devices_are_records():
+    session = FakeSession(body=computers_xml(2))
+    devices = list(iter_computers(FakeClassic(session)))
+    assert [(device.id, device.name) for device in devices] == [(1, "MAC-1"), (2, "MAC-2")]
+
+
+def test_error_status_is_raised_before_reading():
+    session = FakeSession(status=404, body=b"Not Found")
+    with pytest.raises(NotFound):
+        list(iter_classic_list(FakeClassic(session), "/JSSResource/computers", "computers", "computer"))
+
+
+def test_parser_waits_for_a_slow_consumer_and_stops_early(monkeypatch):
+    monkeypatch.setattr(listing, "MAX_QUEUED_BATCHES", 2)
+    monkeypatch.setattr(listing, "CHUNK_SIZE", 150)
+    session = FakeSession(body=computers_xml(1000), chunk_bytes=150)
+    items = iter_classic_list(FakeClassic(session), "/JSSResource/computers", "computers", "computer")
+    assert next(items)["id"] == 1
+    # Give the reader time to fill the queue, it must stop there instead of reading the whole listing
+    session.raw.closed.wait(0.3)
+    assert session.raw.offset < len(session.raw.body) / 10
+    items.close()
+    # Stopping early stops the reader and closes the response
+    assert session.raw.closed.wait(2)
+    assert session.raw.offset < len(session.raw.body)
@@ -0,0 +1,71 @@
+from jamf_helpers.metrics import Metrics, endpoint_name, instrument, percentile, prometheus_text, set_attempt
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+import io
+import pytest
+import requests
+
+JAMF = "https://jamf.example.com"
+
+
+@pytest.fixture
+def session(monkeypatch):
+    # A session whose every request is answered with a chunked 1000 byte body, without a Content-Length
+    def send(adapter, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = HTTPResponse(body=io.BytesIO(b"x" * 1000), status=200, preload_content=False)
+        response.request = request
+        response.url = request.url
+        response.headers["Transfer-Encoding"] = "chunked"
+        return response
+    monkeypatch.setattr(HTTPAdapter, "send", send)
+    metrics = Metrics()
+    session = requests.Session()
+    instrument(session, metrics)
+    session.metrics = metrics
+    yield session
+    set_attempt(0)
+
+
+def test_percentile_is_nearest_rank():
+    assert percentile(list(range(1, 11)), 0.50) == 5
+    assert percentile(list(range(1, 101)), 0.95) == 95
+    assert percentile(list(range(1, 101)), 0.99) == 99
+    assert percentile([3.0], 0.99) == 3.0
+    assert percentile([1, 2], 0.0) == 1
+    assert percentile([1, 2], 1.0) == 2
+    assert percentile([], 0.5) == 0.0
+
+
+def test_endpoint_name_hides_device_ids():
+    assert endpoint_name("GET", f"{JAMF}/api/v1/computers-inventory-detail/12") == "GET /api/v1/computers-inventory-detail/{id}"
+    assert endpoint_name("POST", f"{JAMF}/JSSResource/mobiledevicecommands/command/DeviceLock/id/1,2,3") == (
+        "POST /JSSResource/mobiledevicecommands/command/DeviceLock/id/{ids}"
+    )
+    assert endpoint_name("GET", f"{JAMF}/api/v1/computers-inventory?page=0") == "GET /api/v1/computers-inventory"
+
+
+def test_bytes_of_a_read_response(session):
+    session.get(f"{JAMF}/api/v1/computers-inventory-detail/1")
+    data = session.metrics.snapshot()[0]["GET /api/v1/computers-inventory-detail/{id}"]
+    assert (data["requests"], data["bytes"]) == (1, 1000)
+
+
+def test_bytes_of_a_streamed_response_are_counted_as_they_are_read(session):
+    response = session.get(f"{JAMF}/JSSResource/computers", stream=True)
+    # Nothing is read by the hook, the body is still there for the script to stream
+    assert session.metrics.snapshot()[0]["GET /JSSResource/computers"]["bytes"] == 0
+    assert sum(len(chunk) for chunk in response.iter_content(256)) == 1000
+    assert session.metrics.snapshot()[0]["GET /JSSResource/computers"]["bytes"] == 1000
+
+
+def test_retries_are_counted(session):
+    session.get(f"{JAMF}/api/v1/computers-inventory")
+    set_attempt(1)
+    session.get(f"{JAMF}/api/v1/computers-inventory")
+    endpoints, buckets = session.metrics.snapshot()
+    data = endpoints["GET /api/v1/computers-inventory"]
+    assert (data["requests"], data["retries"], data["statuses"]) == (2, 1, {"200": 2})
+    text = prometheus_text("Action-Test.py", endpoints, buckets)
+    assert 'jamf_api_requests_total{script="Action-Test.py",endpoint="GET /api/v1/computers-inventory",status="200"} 2' in text
@@ -0,0 +1,81 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from jamf_helpers import plan
+from jamf_helpers.plan import (
+    Change,
+    extension_attribute_field,
+    extension_attribute_id,
+    group_by_device,
+    info_field,
+    is_info,
+    read_plan,
+    write_plan,
+)
+
+SCRIPT = "Action-Test.py"
+
+
+@pytest.fixture(autouse=True)
+def no_signal_handler(monkeypatch):
+    # run() installs a SIGTERM handler, leave pytest's alone
+    monkeypatch.setattr(plan, "stop_on_sigterm", lambda: None)
+
+
+def test_plan_round_trip(tmp_path):
+    path = tmp_path / "plan.jsonl"
+    changes = [
+        Change(1, "MAC-1", extension_attribute_field(9), "", "Main"),
+        Change(2, "MAC-2", "managed", True, False),
+    ]
+    assert write_plan(path, SCRIPT, iter(changes)) == 2
+    header = json.loads(path.read_text().splitlines()[0])
+    assert (header["plan"], header["script"]) == (plan.PLAN_VERSION, SCRIPT)
+    assert read_plan(path, SCRIPT) == changes
+
+
+def test_plan_from_another_script_is_refused(tmp_path):
+    path = tmp_path / "plan.jsonl"
+    write_plan(path, "Action-Other.py", [])
+    with pytest.raises(ValueError, match="Action-Other.py"):
+        read_plan(path, SCRIPT)
+
+
+def test_changes_are_grouped_per_device_in_plan_order():
+    changes = [
+        Change(2, "MAC-2", "xEA:9", "", "a"),
+        Change(1, "MAC-1", "xEA:9", "", "b"),
+        Change("2", "MAC-2", "xEA:10", "", "c"),
+    ]
+    devices = group_by_device(changes)
+    assert [device["id"] for device in devices] == [2, 1]
+    assert [change.field for change in devices[0]["changes"]] == ["xEA:9", "xEA:10"]
+
+
+def test_field_names():
+    assert extension_attribute_id(extension_attribute_field(9)) == "9"
+    assert extension_attribute_id("managed") is None
+    assert is_info(info_field("site"))
+    assert not is_info("xEA:9")
+
+
+def test_plan_mode_only_reads(tmp_path, capsys):
+    path = tmp_path / "plan.jsonl"
+    args = SimpleNamespace(mode="plan", plan_file=str(path), time_budget=None)
+    devices = [{"id": 1}, {"id": 2}]
+
+    def plan_device(device):
+        if device["id"] == 2:
+            raise RuntimeError("502 Bad Gateway")
+        return [Change(device["id"], "MAC-1", "xEA:9", "", "Main")]
+
+    def apply_device(device_id, changes):
+        raise AssertionError("plan mode must not write")
+
+    plan.run(args, SCRIPT, devices, plan_device, apply_device)
+    assert read_plan(path, SCRIPT) == [Change(1, "MAC-1", "xEA:9", "", "Main")]
+    output = capsys.readouterr().out
+    assert "Planned - JSS ID: 1" in output
+    assert "Error for ID: 2" in output
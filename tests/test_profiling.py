@@ -0,0 +1,78 @@
+from jamf_helpers import profiling
+from jamf_helpers.profiling import phase, profiled
+import pytest
+import tracemalloc
+
+
+@pytest.fixture
+def profile(monkeypatch):
+    # Profile only this test, and leave tracemalloc as it was
+    monkeypatch.setattr(profiling, "_profile", None)
+    yield lambda **kwargs: profiling.enable(**kwargs)
+    tracemalloc.stop()
+
+
+@profiled("classify")
+def classify(model):
+    return model.upper()
+
+
+def test_disabled_profiling_records_nothing(monkeypatch):
+    monkeypatch.setattr(profiling, "_profile", None)
+    assert not profiling.enabled()
+    with phase("fetch"):
+        pass
+    assert classify("mac") == "MAC"
+    profiling.write_profile("Action-Test.py")
+
+
+def test_phases_are_counted(profile):
+    result = profile(memory=False)
+    assert profiling.enabled()
+    for _ in range(3):
+        classify("mac")
+    with phase("fetch"):
+        with phase("decode"):
+            pass
+    assert result.phases["classify"][0] == 3
+    assert result.phases["fetch"][0] == result.phases["decode"][0] == 1
+    # Nested phases are included in the phase around them
+    assert result.phases["fetch"][1] >= result.phases["decode"][1]
+
+
+def test_table_lists_phases_in_order(profile):
+    result = profile()
+    with phase("write"):
+        pass
+    with phase("auth"):
+        pass
+    table = result.table()
+    assert "Memory change MB" in table
+    rows = [line.split("|")[1].strip() for line in table.splitlines() if line.startswith("| ") and "Phase" not in line and "---" not in line]
+    assert rows == ["auth", "write"]
+
+
+def test_session_requests_are_timed_by_kind(profile):
+    result = profile(memory=False)
+
+    class Session:
+        def request(self, method, url, *args, **kwargs):
+            return method
+
+    session = Session()
+    profiling.instrument(session)
+    session.request("POST", "https://jamf.example.com/api/oauth/token")
+    session.request("GET", "https://jamf.example.com/api/v1/computers-inventory")
+    session.request("PATCH", "https://jamf.example.com/api/v1/computers-inventory-detail/1")
+    assert {name: calls for name, (calls, *_) in result.phases.items()} == {"auth": 1, "fetch": 1, "write": 1}
+
+
+def test_write_profile_adds_to_the_step_summary(profile, tmp_path, monkeypatch, capsys):
+    profile(memory=False)
+    summary = tmp_path / "summary.md"
+    monkeypatch.setenv("GITHUB_STEP_SUMMARY", str(summary))
+    with phase("listing"):
+        pass
+    profiling.write_profile("Action-Test.py")
+    assert "| listing | 1 |" in summary.read_text()
+    assert "### Profile" in capsys.readouterr().out
@@ -0,0 +1,157 @@
+from jamf_helpers import ratelimit
+from jamf_helpers.ratelimit import AdaptiveLimiter, ThrottledClient, status_code
+from jps_api_wrapper.request_builder import RequestTimedOut
+import pytest
+import requests
+import time
+
+
+def http_error(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.exceptions.HTTPError(f"{status} Error", response=response)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    # Retry straight away so the tests don't sleep
+    monkeypatch.setattr(ratelimit, "backoff", lambda attempt, wait=None: 0)
+
+
+def test_limit_starts_at_initial_and_grows_to_maximum():
+    limiter = AdaptiveLimiter(maximum=6, initial=2)
+    assert limiter.limit == 2
+    for _ in range(100):
+        limiter.acquire()
+        limiter.release(latency=0.01)
+    assert limiter.limit == 6
+
+
+def test_throttled_call_halves_the_limit_once_per_second():
+    limiter = AdaptiveLimiter(maximum=8, initial=8)
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 4
+    # A burst of throttled calls only counts once
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 4
+
+
+def test_limit_never_drops_below_minimum():
+    limiter = AdaptiveLimiter(maximum=8, minimum=2, initial=2)
+    limiter._last_decrease = -10
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 2
+
+
+def test_slow_response_counts_as_throttling():
+    limiter = AdaptiveLimiter(maximum=8, initial=8)
+    limiter.acquire()
+    limiter.release(latency=0.05)
+    limiter.acquire()
+    limiter.release(latency=ratelimit.SLOW_LATENCY * 2)
+    assert limiter.limit == 4
+
+
+def test_jitter_on_fast_responses_is_not_throttling():
+    limiter = AdaptiveLimiter(maximum=8, initial=8)
+    limiter.acquire()
+    limiter.release(latency=0.01)
+    limiter.acquire()
+    # Well over LATENCY_FACTOR times the baseline, but still fast
+    limiter.release(latency=0.2)
+    assert limiter.limit == 8
+
+
+def test_retry_after_pauses_every_call():
+    limiter = AdaptiveLimiter(maximum=4, initial=4)
+    limiter.acquire()
+    limiter.release(throttled=True, retry_after=0.2)
+    started = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - started >= 0.15
+    limiter.release(latency=0.01)
+
+
+def test_status_code_maps_request_timed_out_to_502():
+    assert status_code(RequestTimedOut("timed out")) == 502
+    assert status_code(http_error(429)) == 429
+    assert status_code(ValueError()) is None
+
+
+def test_retry_after_header_is_read_in_seconds():
+    assert ratelimit.retry_after(http_error(429, {"Retry-After": "3"})) == 3.0
+    assert ratelimit.retry_after(http_error(429)) is None
+
+
+class FakeClient:
+    # Fails the first `failures` calls of each method with the given error
+    def __init__(self, error, failures):
+        self.error = error
+        self.failures = failures
+        self.calls = 0
+
+    def get_computer(self, id):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return {"id": id}
+
+    def create_mobile_device_command(self, command, ids):
+        self.calls += 1
+        raise self.error
+
+
+def test_idempotent_call_is_retried_when_throttled():
+    client = FakeClient(http_error(429), failures=2)
+    throttled = ThrottledClient(client, limiter=AdaptiveLimiter(maximum=4))
+    assert throttled.get_computer(id=5) == {"id": 5}
+    assert client.calls == 3
+
+
+def test_request_timed_out_is_retried():
+    client = FakeClient(RequestTimedOut("502"), failures=1)
+    throttled = ThrottledClient(client, limiter=AdaptiveLimiter(maximum=4))
+    assert throttled.get_computer(id=5) == {"id": 5}
+    assert client.calls == 2
+
+
+def test_client_error_is_not_retried():
+    client = FakeClient(http_error(404), failures=1)
+    throttled = ThrottledClient(client, limiter=AdaptiveLimiter(maximum=4))
+    with pytest.raises(requests.exceptions.HTTPError):
+        throttled.get_computer(id=5)
+    assert client.calls == 1
+
+
+def test_non_idempotent_call_is_only_attempted_once():
+    client = FakeClient(http_error(429), failures=1)
+    throttled = ThrottledClient(client, limiter=AdaptiveLimiter(maximum=4))
+    with pytest.raises(requests.exceptions.HTTPError):
+        throttled.create_mobile_device_command("UnmanageDevice", [1])
+    assert client.calls == 1
+
+
+def test_retries_give_up_after_the_limit():
+    client = FakeClient(http_error(503), failures=100)
+    throttled = ThrottledClient(client, limiter=AdaptiveLimiter(maximum=4), retries=2)
+    with pytest.raises(requests.exceptions.HTTPError):
+        throttled.get_computer(id=5)
+    assert client.calls == 3
+
+
+def test_throttled_wraps_any_call():
+    calls = []
+
+    def listing():
+        calls.append(1)
+        if len(calls) == 1:
+            raise http_error(429)
+        return "listing"
+
+    throttled = ThrottledClient(FakeClient(None, 0), limiter=AdaptiveLimiter(maximum=4))
+    assert throttled.throttled("get_listing", listing)() == "listing"
+    assert len(calls) == 2
@@ -0,0 +1,94 @@
+from jamf_helpers.records import (
+    DeviceRecord,
+    from_classic,
+    from_inventory,
+    from_listing,
+    from_mobile_device_detail,
+    from_search_result,
+    inventory_sections,
+    iter_computer_records,
+)
+import pytest
+
+
+def test_inventory_record():
+    device = from_inventory({
+        "id": "7",
+        "general": {
+            "name": "MAC-7",
+            "site": {"id": "1", "name": "Main"},
+            "reportDate": "2024-01-01T00:00:00Z",
+            "remoteManagement": {"managed": True},
+            "extensionAttributes": [{"definitionId": "9", "values": ["Main"]}],
+        },
+        "hardware": {"modelIdentifier": "Mac14,2"},
+    })
+    assert (device.id, device.name, device.site, device.model_identifier, device.managed, device.report_date) == (
+        "7", "MAC-7", "Main", "Mac14,2", True, "2024-01-01T00:00:00Z"
+    )
+    assert device.extension_attribute(9) == "Main"
+
+
+def test_mobile_device_detail():
+    device = from_mobile_device_detail({
+        "id": "3",
+        "name": "iPad",
+        "site": {"name": "Main"},
+        "managed": False,
+        "extensionAttributes": [{"id": 4, "value": ["a", "b"]}, {"id": 5, "value": None}],
+    })
+    assert (device.id, device.site, device.managed) == ("3", "Main", False)
+    assert device.extension_attributes == {"4": "a, b", "5": ""}
+
+
+@pytest.mark.parametrize("record", [
+    {"general": {"id": 1, "name": "MAC-1", "site": {"name": "Main"}, "remote_management": {"managed": True}},
+     "hardware": {"model_identifier": "Mac14,2"}, "extension_attributes": [{"id": 9, "value": "Main"}]},
+    {"general": {"id": 1, "name": "MAC-1", "site": {"name": "Main"}, "managed": True, "model_identifier": "Mac14,2"},
+     "extension_attributes": [{"id": 9, "value": "Main"}]},
+])
+def test_classic_computer_and_mobile_device(record):
+    device = from_classic(record)
+    assert (device.id, device.name, device.site, device.managed, device.model_identifier) == (1, "MAC-1", "Main", True, "Mac14,2")
+    assert device.extension_attribute("9") == "Main"
+
+
+def test_listing_and_search_result():
+    device = from_listing({"id": 2, "name": "MAC-2", "managed": False, "report_date_utc": "2024-01-01"})
+    assert (device.id, device.managed, device.report_date, device.site) == (2, False, "2024-01-01", None)
+    device = from_search_result({"id": 2, "name": "MAC-2", "Site": "Main", "Jamf_Site": None}, "Site", {"9": "Jamf_Site"})
+    assert (device.site, device.extension_attribute(9)) == ("Main", "")
+
+
+def test_record_reads_like_a_dictionary():
+    device = DeviceRecord(1, name="MAC-1")
+    assert device["id"] == 1
+    assert device.get("site") is None
+    assert device.get("missing", "default") == "default"
+    with pytest.raises(KeyError):
+        device["missing"]
+    # Devices without Extension Attributes don't carry a dictionary
+    assert device.extension_attributes is None
+    assert device.extension_attribute(9) == ""
+
+
+def test_repeated_values_are_shared():
+    first = DeviceRecord(1, site="".join(["Main ", "Campus"]))
+    second = DeviceRecord(2, site="".join(["Main ", "Campus"]))
+    assert first.site is second.site
+
+
+def test_only_the_sections_holding_the_fields_are_read():
+    assert inventory_sections(["id"]) == ["GENERAL"]
+    assert inventory_sections(["name", "site"]) == ["GENERAL"]
+    assert inventory_sections(["name", "model_identifier"], ["OPERATING_SYSTEM"]) == ["GENERAL", "HARDWARE", "OPERATING_SYSTEM"]
+
+
+def test_computer_records_are_read_a_page_at_a_time():
+    class FakePro:
+        def get_computer_inventories(self, section, page, page_size, sort, filter=None):
+            self.section = section
+            return {"totalCount": 1, "results": [{"id": "1", "general": {"name": "MAC-1"}}]}
+    pro = FakePro()
+    assert [device.name for device in iter_computer_records(pro, ["name", "model_identifier"])] == ["MAC-1"]
+    assert pro.section == ["GENERAL", "HARDWARE"]
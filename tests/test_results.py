@@ -0,0 +1,75 @@
+from jamf_helpers import results
+from jamf_helpers.results import ResultSink, error_group, report_results
+from jamf_helpers.workers import DeviceResult
+import io
+import json
+
+
+def sink_in(tmp_path, **kwargs):
+    echo = io.StringIO()
+    sink = ResultSink(
+        "Action-Test.py", path=str(tmp_path / "results.jsonl"), summary_path=str(tmp_path / "summary.md"), echo=echo, **kwargs
+    )
+    return sink, echo
+
+
+def test_results_file_and_log_keep_the_device_order(tmp_path):
+    sink, echo = sink_in(tmp_path)
+    sink.record(2, "updated", ["JSS ID: 2 updated"])
+    sink.record(1, "unchanged")
+    sink.record(3, "error", ["HTTP Error for ID: 3"], error="500 Server Error")
+    sink.close()
+    lines = [json.loads(line) for line in (tmp_path / "results.jsonl").read_text().splitlines()]
+    assert lines == [
+        {"id": 2, "outcome": "updated", "lines": ["JSS ID: 2 updated"]},
+        {"id": 1, "outcome": "unchanged"},
+        {"id": 3, "outcome": "error", "lines": ["HTTP Error for ID: 3"]},
+    ]
+    assert echo.getvalue() == "JSS ID: 2 updated\nHTTP Error for ID: 3\n"
+    assert "| 1 | 1 | 1 |" in (tmp_path / "summary.md").read_text()
+
+
+def test_errors_are_grouped_by_message(tmp_path):
+    sink, _ = sink_in(tmp_path)
+    for device_id in range(1, 16):
+        sink.record(device_id, "error", error=f"404 Client Error: Not Found for url: https://jamf.example.com/api/v1/computers/{device_id}")
+    sink.record(20, "error", error="500 Server Error")
+    sink.close()
+    summary = (tmp_path / "summary.md").read_text()
+    assert "| 15 | `404 Client Error: Not Found for url: https://jamf.example.com/api/v1/computers/{id}` | 1, 2, 3, 4, 5, 6, 7, 8, 9, 10 |" in summary
+    assert "| 1 | `500 Server Error` | 20 |" in summary
+
+
+def test_error_group():
+    assert error_group("GET /JSSResource/computers/id/12 failed") == "GET /JSSResource/computers/id/{id} failed"
+    assert error_group(ValueError(" bad ")) == "bad"
+
+
+def test_summary_is_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(results, "SUMMARY_MAX_BYTES", 2000)
+    sink, _ = sink_in(tmp_path)
+    for device_id in range(200):
+        sink.record(device_id, "error", summary=[f"❌ Skipped device `{device_id}` " + "x" * 50])
+    sink.close()
+    summary = (tmp_path / "summary.md").read_text()
+    assert len(summary.encode()) < 2200
+    assert "Summary cut off at 1 KB" in summary
+
+
+def test_nothing_is_written_without_a_path(tmp_path):
+    sink = ResultSink("Action-Test.py", echo=None)
+    sink.record(1, "updated", ["line"])
+    sink.close()
+    assert sink.outcomes == {"updated": 1}
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_report_results_records_unhandled_errors(tmp_path):
+    sink, echo = sink_in(tmp_path)
+    updated = DeviceResult(1)
+    updated.updated("JSS ID: 1 updated")
+    report_results([({"id": 1}, updated, None), ({"id": 2}, None, RuntimeError("boom"))], sink)
+    sink.close()
+    assert sink.outcomes == {"updated": 1, "error": 1}
+    assert echo.getvalue() == "JSS ID: 1 updated\nError for ID: 2\nboom\n"
+    assert "🔥 Unexpected error on device `2` – `boom`" in (tmp_path / "summary.md").read_text()
@@ -0,0 +1,89 @@
+from jamf_helpers.records import DeviceRecord
+from jamf_helpers.rules import (
+    apply_changes,
+    computer_update,
+    configured_rules,
+    fields_for,
+    plan_rules,
+    single_rule,
+)
+from jamf_helpers.snapshot import InventorySnapshot
+from tests.scripts import load_script
+import requests
+
+
+class FakePro:
+    def __init__(self, error=None):
+        self.updates = []
+        self.error = error
+
+    def update_computer_inventory(self, body, id):
+        if self.error:
+            raise self.error
+        self.updates.append((id, body))
+
+
+def test_rules_are_enabled_by_their_environment_variables():
+    environ = {"JAMF_xEA_ID_SITE": "9", "JAMF_xEA_NAME_SITE": "Jamf Site", "JAMF_xEA_ID_MACOS_LATEST_SUPPORTED": "10"}
+    rules = configured_rules(environ)
+    assert [(rule.name, rule.definition_id, rule.label) for rule in rules] == [
+        ("SITE", "9", "Jamf Site"),
+        ("MACOS_LATEST_SUPPORTED", "10", "xEA 10"),
+    ]
+    assert configured_rules({"JAMF_MOBILE_xEA_ID_SITE": "4"}, prefix="JAMF_MOBILE_xEA")[0].definition_id == "4"
+    assert configured_rules({}) == []
+
+
+def test_fields_and_sections_for_every_rule():
+    rules = [single_rule("SITE", 9), single_rule("MACOS_LATEST_SUPPORTED", 10)]
+    fields, sections = fields_for(rules)
+    assert fields == ["name", "site", "name", "model_identifier"]
+    assert sections == ["GENERAL", "OPERATING_SYSTEM"]
+
+
+def test_only_values_that_changed_are_planned():
+    rules = [single_rule("SITE", 9), single_rule("MACOS_LATEST_SUPPORTED", 10)]
+    device = DeviceRecord(1, name="MAC-1", site="Main", model_identifier="Mac14,2", extension_attributes={"9": "Main"})
+    changes = plan_rules(rules, device)
+    assert [(change.field, change.old, change.new) for change in changes] == [("xEA:10", "", "macOS 15 Sequoia")]
+    # A rule with no value for a device leaves its xEA alone
+    assert plan_rules([single_rule("SITE", 9)], DeviceRecord(2, extension_attributes={"9": "Main"})) == []
+
+
+def test_one_update_per_computer(tmp_path):
+    rules = [single_rule("SITE", 9, "Jamf Site"), single_rule("MACOS_LATEST_SUPPORTED", 10, "macOS Latest")]
+    device = DeviceRecord(1, name="MAC-1", site="Main", model_identifier="Mac14,2")
+    changes = plan_rules(rules, device)
+    assert computer_update(changes) == {
+        "extensionAttributes": [
+            {"definitionId": "9", "values": ["Main"]},
+            {"definitionId": "10", "values": ["macOS 15 Sequoia"]},
+        ]
+    }
+    pro = FakePro()
+    snapshot = InventorySnapshot(str(tmp_path / "snapshot.db"))
+    snapshot.upsert("computer", [device])
+    result = apply_changes(pro, snapshot, rules, 1, changes)
+    assert len(pro.updates) == 1
+    assert result.status == "updated"
+    assert result.lines[0] == "JSS ID: 1, Computer Name: MAC-1, Extension Attribute: Jamf Site, Value: Main, Jamf Site Previous Value: "
+    assert snapshot.devices("computer")[0].extension_attributes == {"9": "Main", "10": "macOS 15 Sequoia"}
+    snapshot.close()
+
+
+def test_apply_without_changes_or_with_an_error():
+    pro = FakePro(error=requests.exceptions.HTTPError("500 Server Error"))
+    assert apply_changes(pro, None, [], 1, []).status == "unchanged"
+    changes = plan_rules([single_rule("SITE", 9)], DeviceRecord(1, site="Main"))
+    result = apply_changes(pro, None, [], 1, changes)
+    assert (result.status, result.error_message) == ("error", "500 Server Error")
+
+
+def test_single_xEA_scripts_use_the_rules(monkeypatch):
+    site = load_script("Action-Jamf_Pro_API-Update_xEA-Jamf-Site.py", monkeypatch, JAMF_xEA_ID="9", JAMF_xEA_NAME="Jamf Site")
+    device = DeviceRecord(1, name="MAC-1", site="Main", model_identifier="Mac14,2", extension_attributes={"9": "Old"})
+    assert [(change.field, change.new) for change in site.plan_record(device)] == [("xEA:9", "Main")]
+    assert (site.FIELDS, site.xEA_SECTIONS) == (["name", "site"], ["GENERAL"])
+
+    macos = load_script("Action-Jamf_Pro_API-Update_xEA-macOS_Latest_Supported.py", monkeypatch, JSS_xEA_ID="10", JSS_xEA_NAME="macOS Latest")
+    assert [(change.field, change.new) for change in macos.plan_record(device)] == [("xEA:10", "macOS 15 Sequoia")]
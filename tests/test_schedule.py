@@ -0,0 +1,83 @@
+from jamf_helpers import plan, schedule
+from jamf_helpers.plan import Change, read_plan
+from jamf_helpers.records import DeviceRecord
+from jamf_helpers.schedule import Deadline, deadline_for, prioritized, priority
+from types import SimpleNamespace
+import pytest
+
+SCRIPT = "Action-Test.py"
+
+
+@pytest.fixture(autouse=True)
+def no_signal_handler(monkeypatch):
+    monkeypatch.setattr(plan, "stop_on_sigterm", lambda: None)
+
+
+def test_blank_extension_attributes_first_then_newest_report():
+    devices = [
+        # A blank xEA is stored as no Extension Attributes at all
+        DeviceRecord(1, report_date="2024-01-01T00:00:00Z", extension_attributes={}),
+        DeviceRecord(2, report_date="2024-03-01T00:00:00Z", extension_attributes={"9": "Main"}),
+        DeviceRecord(3, report_date="2024-02-01T00:00:00.000Z", extension_attributes={"9": "Main"}),
+        DeviceRecord(4, report_date=None, extension_attributes={"9": "Main"}),
+        DeviceRecord(5, report_date="2024-05-01T00:00:00Z", extension_attributes={"9": ""}),
+    ]
+    assert [device.id for device in prioritized(devices, ["9"])] == [5, 1, 2, 3, 4]
+
+
+def test_ties_keep_the_listed_order():
+    devices = [DeviceRecord(device_id, extension_attributes={"9": "Main"}) for device_id in (3, 1, 2)]
+    assert [device.id for device in prioritized(devices, ["9"])] == [3, 1, 2]
+    assert priority(devices[0], ["9"]) == (1, float("inf"))
+
+
+def devices_from_a_listing():
+    for device_id in range(1, 6):
+        yield DeviceRecord(device_id, name=f"MAC-{device_id}")
+
+
+def plan_with_budget(tmp_path, devices, **kwargs):
+    args = SimpleNamespace(mode="plan", plan_file=str(tmp_path / "plan.jsonl"), time_budget=60)
+    plan_device = lambda device: [Change(device.id, device.name, "xEA:9", device.extension_attribute(9), "Main")]
+    plan.run(args, SCRIPT, devices, plan_device, None, ["9"], **kwargs)
+    return [change.device_id for change in read_plan(args.plan_file, SCRIPT)]
+
+
+def test_devices_read_with_their_extension_attributes_are_sorted(tmp_path):
+    devices = [
+        DeviceRecord(1, extension_attributes={}),
+        DeviceRecord(2, extension_attributes={"9": "Main"}),
+        DeviceRecord(3, extension_attributes={}),
+    ]
+    assert plan_with_budget(tmp_path, list(reversed(devices)), prioritize=True) == [3, 1, 2]
+
+
+def test_devices_from_a_listing_keep_streaming(tmp_path, monkeypatch):
+    sorted_devices = []
+    monkeypatch.setattr(plan, "prioritized", lambda devices, ids: sorted_devices.append(True) or devices)
+    assert plan_with_budget(tmp_path, devices_from_a_listing()) == [1, 2, 3, 4, 5]
+    assert sorted_devices == []
+
+
+def test_deadline_stops_before_the_budget_runs_out(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(schedule.time, "monotonic", lambda: now[0])
+    deadline = Deadline(100, margin=10, started=1000.0)
+    taken = []
+    for device in deadline.take(range(10)):
+        taken.append(device)
+        # Every device takes 20 seconds
+        now[0] += 20
+        list(deadline.track([device]))
+    # After 4 devices 20s are left, one more would end inside the 10s margin
+    assert taken == [0, 1, 2, 3]
+    assert deadline.stopped and deadline.left == 6
+    assert "6 devices left" in deadline.report()
+
+
+def test_deadline_only_with_a_time_budget():
+    assert deadline_for(SimpleNamespace(time_budget=None)) is None
+    assert deadline_for(SimpleNamespace()) is None
+    assert deadline_for(SimpleNamespace(time_budget=2)).budget == 120
+    # The margin is at most 5% of a short budget
+    assert Deadline(100).margin == 5
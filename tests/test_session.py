@@ -0,0 +1,94 @@
+from jps_api_wrapper import request_builder
+from jps_api_wrapper.classic import Classic
+from jps_api_wrapper.pro import Pro
+from jamf_helpers.session import ClientCredentialsAuth, _client, shared_session
+import json
+import os
+import stat
+
+JAMF = "https://jamf.example.com"
+
+
+class TokenServer:
+    # Stands in for the session the auth fetches tokens with, handing out a new token for every request
+    def __init__(self, expires_in=1200):
+        self.expires_in = expires_in
+        self.issued = 0
+
+    def post(self, url, **kwargs):
+        self.issued += 1
+        return TokenResponse({"access_token": f"token-{self.issued}", "expires_in": self.expires_in})
+
+
+class TokenResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+def auth_with(server, cache_path=None, client_id="client"):
+    auth = ClientCredentialsAuth(JAMF, client_id, "secret", cache_path=cache_path)
+    auth.session = server
+    return auth
+
+
+def test_token_is_reused_until_it_is_close_to_expiry():
+    server = TokenServer()
+    auth = auth_with(server)
+    assert auth.token() == auth.token() == "token-1"
+    # A rejected token is replaced, but only if it is still the current one
+    assert auth.token(stale="token-1") == "token-2"
+    assert auth.token(stale="token-1") == "token-2"
+
+
+def test_short_lived_tokens_are_refreshed_every_time():
+    server = TokenServer(expires_in=0)
+    auth = auth_with(server)
+    auth.token()
+    auth.token()
+    assert server.issued == 2
+
+
+def test_token_cache_is_private_and_shared_between_scripts(tmp_path):
+    path = str(tmp_path / "token.json")
+    server = TokenServer()
+    auth_with(server, path).token()
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    # No temporary files are left behind next to the cache
+    assert os.listdir(tmp_path) == ["token.json"]
+    # The next script reads the token from the cache instead of authenticating again
+    assert auth_with(server, path).token() == "token-1"
+    assert server.issued == 1
+
+
+def test_token_cache_for_another_client_is_ignored(tmp_path):
+    path = str(tmp_path / "token.json")
+    server = TokenServer()
+    auth_with(server, path).token()
+    assert auth_with(server, path, client_id="other").token() == "token-2"
+    with open(path) as f:
+        assert json.load(f)["token"] == "token-2"
+
+
+def test_damaged_token_cache_means_a_new_token(tmp_path):
+    path = tmp_path / "token.json"
+    path.write_text("{not json")
+    assert auth_with(TokenServer(), str(path)).token() == "token-1"
+
+
+def test_clients_share_the_session_without_authenticating():
+    server = TokenServer()
+    auth = auth_with(server)
+    session = shared_session(auth)
+    wrapper_auth = request_builder.JamfAuth
+    classic = _client(Classic, JAMF, session)
+    pro = _client(Pro, JAMF, session)
+    assert classic.session is pro.session is session
+    assert session.auth is auth
+    assert request_builder.JamfAuth is wrapper_auth
+    assert server.issued == 0
@@ -0,0 +1,107 @@
+from jamf_helpers import shard
+from jamf_helpers.journal import Journal
+from jamf_helpers.merge_shards import estimated_percentile, find_files, merge_journals, merge_reports
+from jamf_helpers.metrics import BUCKETS
+from jamf_helpers.shard import Shard, in_shard, parse_shard, shard_devices, shard_ids, sharded_path
+import argparse
+import json
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def no_active_shard():
+    yield
+    shard.activate(None)
+
+
+def test_every_device_is_in_exactly_one_shard():
+    shards = [Shard(index, 4) for index in range(1, 5)]
+    for device_id in list(range(1, 200)) + ["abc", "12"]:
+        assert sum(in_shard(device_id, each) for each in shards) == 1
+    counts = [len(shard_ids(range(1, 1001), each)) for each in shards]
+    assert counts == [250, 250, 250, 250]
+
+
+def test_shard_devices_and_ids_follow_the_active_shard():
+    devices = [{"id": device_id} for device_id in range(1, 7)]
+    assert shard_devices(devices) is devices
+    shard.activate(Shard(2, 3))
+    assert [device["id"] for device in shard_devices(devices)] == [1, 4]
+    assert shard_ids(["1", "2", "4"]) == ["1", "4"]
+    # One shard of one is the same as no shard
+    shard.activate(Shard(1, 1))
+    assert shard.active_shard() is None
+
+
+def test_parse_shard():
+    assert parse_shard("3/8") == Shard(3, 8)
+    for text in ("0/8", "9/8", "3", "a/b", "1/0"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_shard(text)
+
+
+def test_sharded_path():
+    assert sharded_path("change_plan.jsonl") == "change_plan.jsonl"
+    assert sharded_path("out/change_plan.jsonl", Shard(3, 8)) == "out/change_plan.shard-3-of-8.jsonl"
+    assert sharded_path("Action-Test.journal.jsonl", Shard(1, 2)) == "Action-Test.shard-1-of-2.journal.jsonl"
+    assert sharded_path("", Shard(1, 2)) == ""
+
+
+def test_journals_from_every_shard_are_added_up(tmp_path):
+    for index, outcomes in ((1, {1: "updated", 3: "error"}), (2, {2: "unchanged", 4: "updated"})):
+        journal = Journal(str(tmp_path / f"Action-Test.shard-{index}-of-2.journal.jsonl"), "Action-Test.py")
+        for device_id, outcome in outcomes.items():
+            journal.record(device_id, outcome)
+        journal.close()
+    journals, reports = find_files([str(tmp_path)])
+    assert len(journals) == 2 and reports == []
+    merged = merge_journals(journals)["Action-Test.py"]
+    assert merged["shards"] == 2
+    assert merged["outcomes"] == {"updated": 2, "unchanged": 1, "error": 1}
+    assert merged["errors"] == ["3"]
+
+
+def report(shard_name, requests, bucket_counts, wall_seconds):
+    return {
+        "script": "Action-Test.py",
+        "shard": shard_name,
+        "started": 100.0,
+        "wall_seconds": wall_seconds,
+        "requests": requests,
+        "endpoints": {
+            "GET /JSSResource/computers/id/{id}": {
+                "requests": requests,
+                "statuses": {"200": requests},
+                "retries": 1,
+                "bytes": 10 * requests,
+                "latency_seconds": {"total": 0.1 * requests, "p50": 0.1, "p95": 0.1, "p99": 0.1, "max": 0.2},
+            }
+        },
+        "buckets": {"GET /JSSResource/computers/id/{id}": bucket_counts},
+    }
+
+
+def test_reports_from_every_shard_are_added_up(tmp_path):
+    paths = []
+    for index, (requests, counts, wall) in enumerate([(10, [0, 0, 5] + [10] * 7, 30.0), (20, [0, 0, 10] + [20] * 7, 50.0)], 1):
+        path = tmp_path / f"Action-Test.shard-{index}-of-2.metrics.json"
+        path.write_text(json.dumps(report(f"{index}/2", requests, counts, wall)))
+        paths.append(str(path))
+    merged = merge_reports(paths)["Action-Test.py"]
+    assert merged["shards"] == ["1/2", "2/2"]
+    assert merged["requests"] == 30
+    assert merged["wall_seconds"] == 50.0
+    endpoint = merged["endpoints"]["GET /JSSResource/computers/id/{id}"]
+    assert (endpoint["retries"], endpoint["bytes"], endpoint["statuses"]) == (2, 300, {"200": 30})
+    # Half the requests took up to 0.1s, the rest up to 0.25s but never more than the slowest seen
+    assert endpoint["latency_seconds"]["p50"] == 0.1
+    assert endpoint["latency_seconds"]["p95"] == 0.2
+
+
+def test_estimated_percentile():
+    counts = [0, 50, 90, 100] + [100] * (len(BUCKETS) - 4)
+    assert estimated_percentile(counts, 100, 0.5, 10.0) == BUCKETS[1]
+    assert estimated_percentile(counts, 100, 0.95, 10.0) == BUCKETS[3]
+    assert estimated_percentile(counts, 0, 0.5, 10.0) == 0.0
+    # Slower than the last bucket
+    assert estimated_percentile([0] * len(BUCKETS), 10, 0.5, 42.0) == 42.0
@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+import pytest
+
+from jamf_helpers.records import DeviceRecord
+from jamf_helpers.snapshot import InventorySnapshot, sync_computers, without_known
+
+
+def inventory_record(device_id, report_date, site="Main", ea="old"):
+    return {
+        "id": str(device_id),
+        "general": {"name": f"MAC-{device_id}", "site": {"name": site}, "reportDate": report_date},
+        "hardware": {"modelIdentifier": "Mac14,2"},
+        "extensionAttributes": [{"definitionId": "9", "values": [ea]}],
+    }
+
+
+class FakePro:
+    # Serves computers-inventory, applying the reportDate filter the incremental sync sends
+    def __init__(self, records):
+        self.records = records
+        self.filters = []
+
+    def get_computer_inventories(self, section, page, page_size, sort, filter=None):
+        self.filters.append(filter)
+        records = self.records
+        if filter:
+            since = filter.split(">=")[1].strip('"')
+            records = [record for record in records if record["general"]["reportDate"] >= since]
+        return {"totalCount": len(records), "results": records[page * page_size:(page + 1) * page_size]}
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    snapshot = InventorySnapshot(str(tmp_path / "snapshot.db"))
+    yield snapshot
+    snapshot.close()
+
+
+def test_first_sync_is_full_and_later_syncs_are_incremental(snapshot):
+    pro = FakePro([inventory_record(1, "2024-01-01T00:00:00Z"), inventory_record(2, "2024-01-02T00:00:00Z")])
+    assert sync_computers(snapshot, pro) == 2
+    assert pro.filters == [None]
+    device = snapshot.devices("computer")[0]
+    assert (device.id, device.name, device.site, device.model_identifier) == ("1", "MAC-1", "Main", "Mac14,2")
+    assert device.extension_attributes == {"9": "old"}
+
+    # Only the computer that reported since the last sync is read again
+    pro.records.append(inventory_record(3, "2024-01-03T00:00:00Z"))
+    assert sync_computers(snapshot, pro) == 2
+    assert pro.filters[-1] == 'general.reportDate>="2024-01-02T00:00:00Z"'
+    assert [device.id for device in snapshot.devices("computer")] == ["1", "2", "3"]
+
+
+def test_full_sync_removes_deleted_computers(snapshot):
+    pro = FakePro([inventory_record(1, "2024-01-01T00:00:00Z"), inventory_record(2, "2024-01-01T00:00:00Z")])
+    sync_computers(snapshot, pro)
+    pro.records.pop(0)
+    sync_computers(snapshot, pro, full=True)
+    assert [device.id for device in snapshot.devices("computer")] == ["2"]
+
+
+def test_devices_are_ordered_by_numeric_id(snapshot):
+    snapshot.upsert("computer", [DeviceRecord(10), DeviceRecord(9), DeviceRecord(100)])
+    assert [device.id for device in snapshot.devices("computer")] == ["9", "10", "100"]
+
+
+def test_set_extension_attribute_updates_a_stored_device(snapshot):
+    snapshot.upsert("computer", [DeviceRecord(1, extension_attributes={"9": "old"})])
+    snapshot.set_extension_attribute("computer", 1, 9, "new")
+    # A device that isn't in the snapshot is ignored
+    snapshot.set_extension_attribute("computer", 2, 9, "new")
+    assert [device.extension_attributes for device in snapshot.devices("computer")] == [{"9": "new"}]
+
+
+def test_known_unmanaged_devices_are_skipped(snapshot):
+    snapshot.save_state("computer", 1, False)
+    snapshot.save_state("computer", 2, True)
+    snapshot.save_state("mobile_device", 3, False)
+    assert snapshot.known_unmanaged("computer") == {"1"}
+    # Once the state is older than max_age the device is checked again
+    assert snapshot.known_unmanaged("computer", max_age=timedelta(0)) == set()
+
+    skipped = []
+    devices = [DeviceRecord(1), DeviceRecord(2)]
+    assert [device.id for device in without_known(devices, {"1"}, skipped)] == [2]
+    assert skipped == [1]
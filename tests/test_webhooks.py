@@ -0,0 +1,100 @@
+from jamf_helpers.webhooks import Debouncer, device_from_event
+import json
+import os
+import pytest
+import threading
+import time
+
+SAMPLES = os.path.join(os.path.dirname(__file__), os.pardir, "samples", "webhooks")
+
+
+def sample(name):
+    with open(os.path.join(SAMPLES, f"{name}.json")) as f:
+        return json.load(f)
+
+
+def test_device_from_sample_payloads():
+    assert device_from_event(sample("ComputerInventoryCompleted")) == ("computer", 1)
+    assert device_from_event(sample("ComputerAdded")) == ("computer", 2)
+    assert device_from_event(sample("MobileDeviceInventoryCompleted")) == ("mobile_device", 1)
+
+
+def test_other_events_are_ignored():
+    assert device_from_event({"webhook": {"webhookEvent": "RestAPIOperation"}, "event": {}}) is None
+
+
+@pytest.mark.parametrize("payload", [
+    [1],
+    "ComputerAdded",
+    {"webhook": {}},
+    {"webhook": {"webhookEvent": "ComputerAdded"}},
+    {"webhook": {"webhookEvent": "ComputerAdded"}, "event": [1]},
+    {"webhook": {"webhookEvent": "ComputerAdded"}, "event": "1"},
+    {"webhook": {"webhookEvent": "ComputerAdded"}, "event": {}},
+    {"webhook": {"webhookEvent": "ComputerAdded"}, "event": {"jssID": "twelve"}},
+    {"webhook": {"webhookEvent": "ComputerInventoryCompleted"}, "event": {"computer": "1"}},
+    {"webhook": {"webhookEvent": "ComputerInventoryCompleted"}, "event": {"computer": {"jssID": [1]}}},
+])
+def test_malformed_payloads_raise_value_error(payload):
+    with pytest.raises(ValueError):
+        device_from_event(payload)
+
+
+class Recorder:
+    def __init__(self):
+        self.batches = []
+        self.handed_on = threading.Event()
+
+    def __call__(self, batch):
+        self.batches.append(batch)
+        self.handed_on.set()
+
+
+def test_burst_of_events_for_one_device_is_handed_on_once():
+    recorder = Recorder()
+    debouncer = Debouncer(recorder, delay=0.1, max_delay=10)
+    for _ in range(5):
+        debouncer.add(("computer", 1))
+    debouncer.add(("mobile_device", 1))
+    assert recorder.handed_on.wait(2)
+    debouncer.close()
+    assert sorted(device for batch in recorder.batches for device in batch) == [("computer", 1), ("mobile_device", 1)]
+    assert debouncer.events == 6 and debouncer.handed_on == 2
+
+
+def test_device_that_keeps_sending_events_is_handed_on_after_max_delay():
+    recorder = Recorder()
+    debouncer = Debouncer(recorder, delay=0.2, max_delay=0.3)
+    started = time.monotonic()
+    while not recorder.handed_on.is_set() and time.monotonic() - started < 2:
+        debouncer.add(("computer", 1))
+        time.sleep(0.05)
+    debouncer.close()
+    assert recorder.batches[0] == [("computer", 1)]
+    assert time.monotonic() - started < 1
+
+
+def test_close_hands_on_every_pending_device():
+    recorder = Recorder()
+    debouncer = Debouncer(recorder, delay=60, max_delay=60)
+    debouncer.add(("computer", 1))
+    debouncer.add(("computer", 2))
+    assert debouncer.pending() == 2
+    debouncer.close()
+    assert sorted(recorder.batches[0]) == [("computer", 1), ("computer", 2)]
+
+
+def test_failing_batch_does_not_stop_the_debouncer():
+    handled = []
+
+    def handle(batch):
+        handled.append(batch)
+        if len(handled) == 1:
+            raise RuntimeError("Jamf is down")
+
+    debouncer = Debouncer(handle, delay=0.05, max_delay=1)
+    debouncer.add(("computer", 1))
+    time.sleep(0.3)
+    debouncer.add(("computer", 2))
+    debouncer.close()
+    assert handled == [[("computer", 1)], [("computer", 2)]]
@@ -0,0 +1,57 @@
+import time
+
+from jamf_helpers.workers import DeviceResult, run_concurrently, worker_count
+
+
+def test_results_come_back_in_input_order():
+    def slow_for_low_ids(item):
+        # Earlier items finish last, the output order must not change
+        time.sleep((10 - item) / 1000)
+        return item * 2
+    results = list(run_concurrently(slow_for_low_ids, range(10), workers=4))
+    assert [(item, result, error) for item, result, error in results] == [(item, item * 2, None) for item in range(10)]
+
+
+def test_an_exception_is_handed_back_without_stopping_the_run():
+    def fail_on_three(item):
+        if item == 3:
+            raise ValueError("bad device")
+        return item
+    results = list(run_concurrently(fail_on_three, range(5), workers=2))
+    assert [result for _, result, _ in results] == [0, 1, 2, None, 4]
+    item, _, error = results[3]
+    assert item == 3 and isinstance(error, ValueError)
+
+
+def test_items_are_pulled_lazily():
+    # Only about two items per worker are taken from the generator ahead of the results being read
+    pulled = []
+
+    def items():
+        for item in range(100):
+            pulled.append(item)
+            yield item
+
+    results = run_concurrently(lambda item: item, items(), workers=2)
+    next(results)
+    assert len(pulled) <= 5
+    assert len(list(results)) == 99
+
+
+def test_worker_count_comes_from_the_environment(monkeypatch):
+    monkeypatch.setenv("JAMF_WORKERS", "8")
+    assert worker_count() == 8
+    monkeypatch.setenv("JAMF_WORKERS", "0")
+    assert worker_count() == 1
+
+
+def test_device_result_tracks_status():
+    result = DeviceResult(7)
+    assert result.status == "unchanged" and result.lines == []
+    result.updated("JSS ID: 7")
+    assert result.status == "updated"
+    result.error("HTTP Error for ID: 7", "502 Bad Gateway", summary="🔥 device 7")
+    assert result.status == "error"
+    assert result.error_message == "502 Bad Gateway"
+    assert result.lines == ["JSS ID: 7", "HTTP Error for ID: 7", "502 Bad Gateway"]
+    assert result.summary == ["🔥 device 7"]